@@ -0,0 +1,97 @@
+"""
+Booking contention on a single event.
+
+Many threads try to book seats of one capacity-limited event at once
+through POST /api/v1/booking/<event_id>. The run reports attempts per
+second and latency, and checks that exactly ``capacity`` bookings were
+made and that seats_remaining reached zero, i.e. nothing was oversold.
+
+Usage:
+    python benchmarks/booking_contention.py [--threads 32] [--attempts 2000]
+        [--capacity 500] [--database postgresql://...]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+
+from flask_jwt_extended import create_access_token
+from bookingapp import create_app, db
+from bookingapp.config import DebugConfig
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+from bookingapp.models.user import User
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main(args):
+    database = args.database or f'sqlite:///{tempfile.NamedTemporaryFile(suffix=".db", delete=False).name}'
+
+    class BenchConfig(DebugConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = database
+        DB_POOL_SIZE = args.threads
+        DB_RETRY_ATTEMPTS = args.retries
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+
+    with app.app_context():
+        users = [User(first_name=f'Bench{i}', last_name='User', email=f'bench{i}@example.com', password='x')
+                 for i in range(args.threads)]
+        db.session.add_all(users)
+        db.session.flush()
+        event = Event('On-sale', 'Arena', datetime.now() + timedelta(days=30), 'Contention benchmark',
+                      users[0].id, capacity=args.capacity)
+        db.session.add(event)
+        db.session.commit()
+        event_id = event.id
+        headers = [{'Authorization': 'Bearer ' + create_access_token(identity=user.id)} for user in users]
+
+    def book(index):
+        start = time.perf_counter()
+        response = client.post(f'/api/v1/booking/{event_id}', headers=headers[index % len(headers)])
+        return response.status_code, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(book, range(args.attempts)))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    latencies = [latency * 1000 for _, latency in results]
+    with app.app_context():
+        booked = Booking.query.filter_by(event_id=event_id).count()
+        remaining = db.session.get(Event, event_id).seats_remaining
+
+    print(f'{args.attempts} attempts from {args.threads} threads in {elapsed:.2f}s '
+          f'({args.attempts / elapsed:.0f} attempts/s)')
+    print(f'status codes: {dict(sorted(statuses.items()))}')
+    print(f'latency p50={statistics.median(latencies):.1f}ms p99={percentile(latencies, 99):.1f}ms')
+    print(f'bookings={booked} seats_remaining={remaining} capacity={args.capacity}')
+    oversold = booked > args.capacity or booked != statuses[201] or (remaining or 0) < 0
+    print('OVERSOLD' if oversold else 'OK: no oversell')
+    return 1 if oversold else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=2000)
+    parser.add_argument('--capacity', type=int, default=500)
+    parser.add_argument('--retries', type=int, default=10)
+    parser.add_argument('--database', help='SQLAlchemy URL, defaults to a temporary SQLite file')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""
+Compare gunicorn profiles under concurrent HTTP load.
+
+Starts gunicorn once per config file against a throwaway SQLite database,
+drives it with keep-alive clients for a fixed duration and reports
+throughput and latency percentiles.
+
+Usage:
+    python benchmarks/load_test.py [--clients 64] [--duration 15] [--path /cron]
+        [--configs gunicorn-cfg.py gunicorn-async-cfg.py]
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(env):
+    """Create the tables and one user, which /cron reads"""
+    script = (
+        "from bookingapp import create_app, db\n"
+        "from bookingapp.config import ProductionConfig\n"
+        "from bookingapp.models.user import User\n"
+        "app = create_app(ProductionConfig)\n"
+        "with app.app_context():\n"
+        "    User(first_name='Load', last_name='Test', email='load@example.com', password='x').insert()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start')
+
+
+def drive(port, path, clients, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 500:
+                    errors[0] += 1
+                local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def run(config, args):
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{db_file.name}', DEBUG='False')
+    seed(env)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', config, '--bind', f'127.0.0.1:{port}',
+         '--access-logfile', os.devnull, '--log-level', 'warning', 'run:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        drive(port, args.path, min(4, args.clients), 2)  # warm up
+        latencies, errors = drive(port, args.path, args.clients, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+        os.unlink(db_file.name)
+
+    samples = [latency * 1000 for latency in latencies]
+    print(f'{config}: {len(samples) / args.duration:.0f} req/s, errors={errors}, '
+          f'p50={statistics.median(samples):.1f}ms p99={percentile(samples, 99):.1f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=int, default=15)
+    parser.add_argument('--path', default='/cron')
+    parser.add_argument('--configs', nargs='+', default=['gunicorn-cfg.py', 'gunicorn-async-cfg.py'])
+    args = parser.parse_args()
+
+    for config in args.configs:
+        run(config, args)
@@ -0,0 +1,85 @@
+"""
+Login latency under concurrent load.
+
+Runs a burst of concurrent logins alongside cheap requests against an
+in-process app and reports p50/p99 for both, once with hashing inline in
+the request threads and once with the hashing pool.
+
+Usage:
+    python benchmarks/login_benchmark.py [--threads 16] [--logins 200] [--workers 2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+
+from bookingapp import create_app, db
+from bookingapp.config import DebugConfig
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'Benchmark1'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(hash_workers, threads, logins):
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+
+    class BenchConfig(DebugConfig):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_file.name}'
+        PASSWORD_HASH_WORKERS = hash_workers
+        MAIL_SUPPRESS_SEND = True
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    client.post('/api/v1/auth/register', json={
+        'email': EMAIL, 'password': PASSWORD, 'first_name': 'Bench', 'last_name': 'Mark'})
+
+    def login():
+        start = time.perf_counter()
+        response = client.post('/api/v1/auth/login', json={'email': EMAIL, 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return 'login', time.perf_counter() - start
+
+    def cheap():
+        start = time.perf_counter()
+        client.get('/api/v1/auth/test')
+        return 'cheap', time.perf_counter() - start
+
+    jobs = [login if i % 2 == 0 else cheap for i in range(logins * 2)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda job: job(), jobs))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        db.engine.dispose()
+    os.unlink(db_file.name)
+
+    print(f'hash workers={hash_workers} threads={threads} wall={elapsed:.2f}s')
+    for kind in ('login', 'cheap'):
+        samples = [duration * 1000 for name, duration in results if name == kind]
+        print(f'  {kind:5} n={len(samples)} p50={statistics.median(samples):.1f}ms '
+              f'p99={percentile(samples, 99):.1f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    run(0, args.threads, args.logins)
+    run(args.workers, args.threads, args.logins)
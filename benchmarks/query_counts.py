@@ -0,0 +1,98 @@
+"""
+Check that the listing endpoints run a constant number of SQL queries.
+
+Seeds a throwaway SQLite database with a few rows and then with many,
+and counts the statements each listing endpoint runs on a cold request
+(from its Server-Timing header). A count that grows with the data is an
+N+1; the script then exits with status 1. tests/test_query_counts.py
+runs the same endpoints under pytest against the QUERY_BUDGET guard.
+
+Usage:
+    python benchmarks/query_counts.py [--small 5] [--large 100]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-with-enough-length')
+
+from flask_jwt_extended import create_access_token
+from bookingapp import create_app, db
+from bookingapp.config import DebugConfig
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+from bookingapp.models.user import User
+
+# Listing endpoints, formatted with the seeded event id
+ENDPOINTS = (
+    '/api/v1/booking/{event_id}',
+    '/api/v1/event/upcoming?per_page=20',
+    '/api/v1/event/search?q=concert&per_page=100',
+    '/api/v1/auth/users?per_page=100',
+    '/api/v1/auth/admins?per_page=100',
+)
+
+
+def query_counts(rows):
+    """Seed ``rows`` users, events and bookings and count each endpoint's queries"""
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+
+    class BenchConfig(DebugConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_file.name}'
+        CACHE_BACKEND = 'simple'
+        METRICS_DIR = tempfile.mkdtemp(prefix='bookingapp-metrics-')
+        METRICS_ENABLED = True
+        SERVER_TIMING = True
+        MAIL_SUPPRESS_SEND = True
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        admin = User(first_name='Admin', last_name='Bench', email='admin@example.com',
+                     password='x', is_admin=True)
+        admin.insert()
+        event = Event('Concert', 'Lagos', datetime.now() + timedelta(days=1), 'Seeded', admin.id)
+        event.insert()
+        users = [{'first_name': f'User{i}', 'last_name': 'Bench', 'email': f'user{i}@example.com',
+                  'password': 'x', 'avatar': ''} for i in range(rows)]
+        user_ids = User.bulk_insert(users)
+        Event.bulk_insert([{'event_name': f'Concert {i}', 'location': 'Abuja', 'creator_id': admin.id,
+                            'date_time': datetime.now() + timedelta(days=2, hours=i)} for i in range(rows)])
+        Booking.bulk_insert([{'user_id': user_id, 'event_id': event.id, 'booking_date': datetime.now()}
+                             for user_id in user_ids])
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity=admin.id)}
+        event_id = event.id
+
+    client = app.test_client()
+    counts = {}
+    for endpoint in ENDPOINTS:
+        response = client.get(endpoint.format(event_id=event_id), headers=headers)
+        assert response.status_code == 200, (endpoint, response.status_code, response.get_json())
+        match = re.search(r'desc="(\d+) queries"', response.headers.get('Server-Timing', ''))
+        counts[endpoint] = int(match.group(1))
+    os.unlink(db_file.name)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--small', type=int, default=5)
+    parser.add_argument('--large', type=int, default=100)
+    args = parser.parse_args()
+
+    small = query_counts(args.small)
+    large = query_counts(args.large)
+    failed = False
+    print(f"{'endpoint':<48}{args.small:>8}{args.large:>8}")
+    for endpoint in ENDPOINTS:
+        flag = '' if small[endpoint] == large[endpoint] else '  <-- grows with the rows'
+        failed = failed or bool(flag)
+        print(f'{endpoint:<48}{small[endpoint]:>8}{large[endpoint]:>8}{flag}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Measure how long a worker takes to import and build the app.
+
+Every run is a fresh interpreter, as for a gunicorn worker or a cold
+container, timing ``import bookingapp`` and ``create_app`` separately with
+LEAN_STARTUP off and on. The database is a throwaway SQLite file whose
+schema is created once beforehand, as migrations would on deploy.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "from bookingapp import create_app\n"
+    "from bookingapp.config import ProductionConfig\n"
+    "imported = time.perf_counter()\n"
+    "create_app(ProductionConfig)\n"
+    "done = time.perf_counter()\n"
+    "print(json.dumps({'import': imported - start, 'create_app': done - imported,\n"
+    "                  'modules': len(sys.modules)}))\n"
+)
+
+
+def probe(env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bookingapp-startup-')
+    env = dict(os.environ,
+               SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+               SWAGGER_CACHE=os.path.join(tmp, 'swagger.json'),
+               CACHE_BACKEND='simple')
+    # Create the schema and the Swagger cache once, outside the timings
+    probe(dict(env, LEAN_STARTUP='False'))
+
+    print(f"{'mode':<8}{'import ms':>12}{'create_app ms':>16}{'total ms':>12}{'modules':>10}")
+    for lean in ('False', 'True'):
+        samples = [probe(dict(env, LEAN_STARTUP=lean)) for _ in range(args.runs)]
+        imports = statistics.median(s['import'] for s in samples) * 1000
+        builds = statistics.median(s['create_app'] for s in samples) * 1000
+        modules = samples[-1]['modules']
+        mode = 'lean' if lean == 'True' else 'default'
+        print(f"{mode:<8}{imports:>12.1f}{builds:>16.1f}{imports + builds:>12.1f}{modules:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,20 +3,16 @@ from flask_cors import CORS
 from flask import Flask, jsonify
 from sqlalchemy.exc import OperationalError
 from bookingapp.config import Config
-from flasgger import Swagger
+from bookingapp.db_config.session import RoutingSession
 from flask_caching import Cache
-import yaml
 import os
 from flask_mail import Mail
 from flask_jwt_extended import JWTManager
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
-# Create an instance of Swagger
-swagger = Swagger()
-
 #Create an instance of the cach
 cache = Cache()
 
@@ -27,8 +23,12 @@ def create_app(config):
     app = Flask(__name__)
     app.config.from_object(config)
     #app.config.from_object(Config)
+
+    # Log through a background thread, with the request id on every record
+    from bookingapp.utils.log_config import configure_logging
+    configure_logging(app)
     if app.config["SQLALCHEMY_DATABASE_URI"]:
-        print("using db")
+        app.logger.info("Using database backend %s", app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0])
 
 
     # Initialize CORS
@@ -39,17 +39,54 @@ def create_app(config):
         return jsonify({"error": "Database connection error", "message": str(e)}), 500
 
 
-    # Load Swagger content from the file
-    with open("swagger_config.yaml", "r") as file:
-        swagger_config = yaml.load(file, Loader=yaml.FullLoader)
-    # Initialize Flasgger with the loaded Swagger configuration
-    Swagger(app, template=swagger_config)
+    # Initialize Flasgger with the Swagger template from the file. Lean
+    # startup defers flasgger until the docs are first requested.
+    from bookingapp.utils.docs import register_docs, register_lazy_docs
+    if app.config.get('LEAN_STARTUP'):
+        register_lazy_docs(app, "swagger_config.yaml")
+    else:
+        register_docs(app, "swagger_config.yaml")
 
-    #initialize the caching system
+    #initialize the caching system, picking the backend from CACHE_BACKEND
+    from bookingapp.caching.backends import cache_type_for
+    app.config['CACHE_TYPE'] = cache_type_for(app.config['CACHE_BACKEND'])
     cache.init_app(app)
 
-    # Initialize SQLAlchemy
+    # size the per-process cache of authenticated users and let other
+    # workers evict from it through the cache's invalidation bus, or one
+    # of its own for backends without a bus
+    from bookingapp.auth.user_cache import user_cache
+    from bookingapp.caching.backends import invalidation_bus
+    bus = getattr(app.extensions['cache'][cache], 'bus', None) or invalidation_bus(app.config)
+    user_cache.configure(app.config['AUTH_USER_CACHE_SIZE'], app.config['AUTH_USER_CACHE_TTL'], bus)
+
+    # Initialize SQLAlchemy, with the pool sized from DB_POOL_* unless
+    # SQLALCHEMY_ENGINE_OPTIONS sets the options explicitly
+    from bookingapp.db_config.pool import engine_options, watch_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    # register the read replicas as binds that read_only views query
+    replica_binds = {f'replica_{index}': uri for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS'])}
+    app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), **replica_binds}
+    app.config['SQLALCHEMY_REPLICA_BINDS'] = list(replica_binds)
+    # the read-your-writes window lives in the cache, so every worker must see it
+    from bookingapp.caching.backends import PER_PROCESS_BACKENDS
+    if replica_binds and app.config['CACHE_BACKEND'] in PER_PROCESS_BACKENDS:
+        raise ValueError(
+            f"SQLALCHEMY_REPLICA_URIS needs a shared CACHE_BACKEND (filesystem, redis or twolevel), "
+            f"not {app.config['CACHE_BACKEND']!r}: a user's next request may reach another worker "
+            f"that does not know they just wrote and reads a stale replica")
     db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            watch_engine(bind_key or 'default', engine)
+
+    # Record request latency, SQL statements and payload sizes
+    from bookingapp.metrics.middleware import request_metrics
+    request_metrics.init_app(app)
+    # and, in debug, warn about requests running too many queries (N+1)
+    from bookingapp.db_config.query_budget import query_budget_guard
+    query_budget_guard.init_app(app)
 
     # Secret key
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
@@ -74,6 +111,13 @@ def create_app(config):
     # Initialize Flask-Mail
     mail.init_app(app)  # Initialize Flask-Mail with your app
 
+    # Deliver emails from background workers instead of the request thread
+    from bookingapp.mailer.dispatch import mail_dispatcher
+    mail_dispatcher.init_app(app)
+    # Compile the email templates once instead of on every send
+    from bookingapp.mailer.rendering import mail_renderer
+    mail_renderer.init_app(app)
+
     # imports blueprints
     from bookingapp.errors.handlers import error
     from bookingapp.auth.authentication import auth_bp
@@ -94,8 +138,21 @@ def create_app(config):
     app.register_blueprint(event_bp)
 
 
-    # create db tables from models if not exists
+    # flask reconcile-event-counters repairs drifted booking counters
+    from bookingapp.event.counters import reconcile_event_counters_command
+    app.cli.add_command(reconcile_event_counters_command)
+
+    # create db tables from models if not exists. Lean startup leaves a
+    # database stamped by Alembic (flask db stamp/upgrade) to the migrations
+    # instead of inspecting every table on each worker boot; the migrations
+    # cannot build a fresh database, so an unstamped one still gets create_all.
     with app.app_context():
-        db.create_all()
+        lean = app.config.get('LEAN_STARTUP') and db.inspect(db.engine).has_table('alembic_version')
+        if not lean:
+            # on the primary only: the replicas are copies of it
+            db.create_all(bind_key=None)
+            # and the full-text search index of the events
+            from bookingapp.event.search import ensure_search_index
+            ensure_search_index()
 
     return app
\ No newline at end of file
@@ -1,9 +1,9 @@
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from flask import jsonify, url_for, render_template
+from flask import jsonify, url_for
 from functools import wraps
-from bookingapp.models.user import User
-from flask_mail import Message
-from bookingapp import mail
+from bookingapp.auth.user_cache import load_user
+from bookingapp.mailer.dispatch import mail_dispatcher
+from bookingapp.mailer.rendering import mail_renderer, APP_NAME
 import re
 
 
@@ -28,11 +28,11 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         try:
             current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
-            if not user or not user.is_active:
-                return jsonify({'Unauthorized access'}), 401
+            user = load_user(current_user_id)
         except Exception as e:
-            return jsonify({'Invalid token'}), 401
+            return jsonify({'message': 'Invalid token'}), 401
+        if not user or not user.is_active:
+            return jsonify({'message': 'Unauthorized access'}), 401
 
         return f(user, *args, **kwargs)
 
@@ -58,11 +58,11 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         try:
             current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
-            if not user or not user.is_active or not user.is_admin:
-                return jsonify({'Unauthorized access'}), 401
+            user = load_user(current_user_id)
         except Exception as e:
-            return jsonify({'Invalid token'}), 401
+            return jsonify({'message': 'Invalid token'}), 401
+        if not user or not user.is_active or not user.is_admin:
+            return jsonify({'message': 'Unauthorized access'}), 401
 
         return f(user, *args, **kwargs)
 
@@ -75,22 +75,18 @@ def send_otp_email(name, email, otp):
     try:
         # Create the message for the user
         msg_title = "Registration Confirmation - Booking App"
-        sender = "noreply@app.com"
-        msg = Message(msg_title, sender=sender, recipients=[email])
         msg_body = "Please use this verification code to confirm your registration"
-        msg.body = ""
-        msg.reply_to = "bookingapp@gmail.com"
         data = {
-            'app_name': "Booking App",
+            'app_name': APP_NAME,
             'title': msg_title,
             'body': msg_body,
             'name': name,
             'otp': otp
         }
-        msg.html = render_template("email_otp.html", data=data)
+        msg = mail_renderer.message(msg_title, email, "email_otp.html", data=data)
 
-        # Send the message
-        mail.send(msg)
+        # Queue the message, a background worker delivers it
+        mail_dispatcher.send(msg)
 
     except Exception as e:
         return {'msg': 'Email not sent', 'error': str(e)}, 500
@@ -1,17 +1,36 @@
 from flask import Blueprint, request, jsonify, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
 from bookingapp import db
 from bookingapp.models.user import User
 from functools import wraps
 from datetime import datetime, timedelta
 from random import randint
+from sqlalchemy.exc import IntegrityError
 from bookingapp.auth.auth_utils import login_required, admin_required, send_otp_email, validate_email, validate_password
+from bookingapp.auth.user_cache import invalidate_user
+from bookingapp.auth.hashing import hash_password, verify_password, needs_rehash
+from bookingapp.caching.responses import cached_response
+from bookingapp.db_config.config import query_keyset, query_total
+from bookingapp.db_config.routing import read_only
+from bookingapp.errors.handlers import CustomError
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, decode_token, get_jwt_identity, get_jwt, unset_jwt_cookies
 
 # Create a Blueprint for authentication routes
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/v1/auth')
 
 
+def _duplicate_email(error):
+    """True when an IntegrityError comes from the unique constraint on users.email"""
+    # Postgres (psycopg2) names the constraint, e.g. users_email_key
+    diag = getattr(error.orig, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None)
+    if constraint:
+        return 'email' in constraint
+    # SQLite: UNIQUE constraint failed: users.email
+    # MySQL: Duplicate entry '...' for key 'users.email'
+    message = str(error.orig).lower()
+    return ('unique' in message or 'duplicate' in message) and 'email' in message
+
+
 # Endpoint for user registration
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -33,39 +52,40 @@ def register():
 
 
     try:
-        # Check if the username is already taken
-        existing_user = User.query.filter_by(email=data['email']).first()
-        if existing_user:
-            return jsonify({'message': 'Email already exists'}), 400
-
         validation_result = validate_password(data['password'])
         if validation_result is not None:
                 return jsonify({'message': validation_result}), 400
 
 
-        # Create a new user
-        new_user = User(email=data['email'], first_name=data['first_name'], last_name=data['last_name'], password=generate_password_hash(data['password']))
-        new_user.insert()
-
-        # Generate and store the OTP with its expiry time
+        # Create the new user together with its OTP (valid for User.OTP_VALIDITY)
         otp = str(randint(1000, 9999))  # Generate a 4-digit OTP
-        otp_expiry = datetime.now() + timedelta(minutes=10)  # Set expiry time to 10 minutes from now
+        new_user = User(email=data['email'], first_name=data['first_name'], last_name=data['last_name'], password=hash_password(data['password']))
         new_user.otp = otp
-        new_user.otp_expiry = otp_expiry
-        new_user.insert()
+        new_user.otp_created_at = datetime.now()
+        # Read before the commit expires the object, saving a reload afterwards
+        user_id, created_at = new_user.id, new_user.createdAt
+        full_name = data['first_name'] + " " + data['last_name']
+
+        # Single commit; the unique constraint on users.email rejects taken emails
+        try:
+            new_user.insert()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not _duplicate_email(e):
+                raise
+            return jsonify({'message': 'Email already exists'}), 400
 
         # Send the OTP to the user's email (implement send_otp_email function)
-        full_name = new_user.first_name + " " + new_user.last_name
-        send_otp_email(full_name, new_user.email, otp)
+        send_otp_email(full_name, data['email'], otp)
 
-        access_token = create_access_token(identity=new_user.id, expires_delta=timedelta(hours=1))   # Access token expires in 1 hour
-        refresh_token = create_refresh_token(identity=new_user.id, expires_delta=timedelta(days=90))  # Refresh token expires in 24 hours
+        access_token = create_access_token(identity=user_id, expires_delta=timedelta(hours=1))   # Access token expires in 1 hour
+        refresh_token = create_refresh_token(identity=user_id, expires_delta=timedelta(days=90))  # Refresh token expires in 24 hours
 
         # get user data
         userData = {
             "accessToken": access_token,
             "refreshToken": refresh_token,
-            "createdAt": new_user.createdAt,
+            "createdAt": created_at,
         }
         return jsonify({'message': 'User registered. OTP sent to email for verification.', 'userData': userData}), 201
     except Exception as e:
@@ -128,16 +148,15 @@ def resend_otp():
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
-    if user.email_confirmed:
+    if user.is_verified:
         return jsonify({'message': 'Email already confirmed'}), 400
 
     # Generate a new OTP
     new_otp = str(randint(1000, 9999))  # Generate a new 6-digit OTP
 
-    # Update the user's OTP in the database
+    # Update the user's OTP in the database, it expires after User.OTP_VALIDITY
     user.otp = new_otp
-    otp_expiry = datetime.now() + timedelta(minutes=10)  # Set expiry time to 10 minutes from now
-    user.otp_expiry = otp_expiry
+    user.otp_created_at = datetime.now()
     user.update()
 
     # Resend the OTP to the user's email (implement send_otp_email function)
@@ -180,9 +199,14 @@ def login():
     data['email'] = data['email'].lower()
 
     user = User.query.filter_by(email=data['email']).first()
-    if not user or not check_password_hash(user.password, data['password']):
+    if not user or not verify_password(user.password, data['password']):
         return jsonify({'message': 'Invalid email or password'}), 401
 
+    # Upgrade the stored hash when PASSWORD_HASH_METHOD has changed
+    if needs_rehash(user.password):
+        user.password = hash_password(data['password'])
+        db.session.commit()
+
     # Generate and return an authentication token for the user
     access_token = create_access_token(identity=user.id, expires_delta=timedelta(hours=1))   # Access token expires in 1 hour
     refresh_token = create_refresh_token(identity=user.id, expires_delta=timedelta(days=90))  # Refresh token expires in 24 hours
@@ -222,10 +246,10 @@ def logout():
 
 # Endpoint for user profile
 @auth_bp.route('/profile', methods=['GET'])
+@read_only
 @jwt_required()
 def profile():
     user = get_jwt_identity()
-    print(user)
     user = User.query.get(user)
     return jsonify(user.format())
 
@@ -241,28 +265,72 @@ def update_profile(user):
     if 'last_name' in data:
         user.last_name = data['last_name']
     if 'password' in data:
-        user.password = generate_password_hash(data['password'])
+        user.password = hash_password(data['password'])
     db.session.commit()
+    invalidate_user(user.id)
     return jsonify(user.format()), 200
 
 # Endpoint for user profile deletion
 @auth_bp.route('/profile', methods=['DELETE'])
 @admin_required
 def delete_profile(user):
+    user_id = user.id
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id)
     return jsonify({'message': 'Profile deleted successfully'}), 200
 
+# Parse a boolean filter from the query string
+def _bool_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise CustomError('Bad Request', 400, f'{name} must be true or false')
+
+
+# Shared listing for the admin user endpoints.
+# Selects only the listed columns one keyset page at a time and counts separately,
+# so no User objects are built and the table is never loaded whole.
+def _list_users(**filters):
+    for name in ('is_active', 'is_admin', 'is_verified'):
+        value = _bool_arg(name)
+        if value is not None and name not in filters:
+            filters[name] = value
+
+    count_mode = request.args.get('count', 'exact')
+    if count_mode not in ('exact', 'estimate', 'none'):
+        raise CustomError('Bad Request', 400, 'count must be exact, estimate or none')
+
+    page = query_keyset(
+        User,
+        cursor=request.args.get('cursor'),
+        per_page=request.args.get('per_page'),
+        columns=User.listing_columns(),
+        **filters
+    )
+    return jsonify({
+        'data': page['items'],
+        'total': query_total(User, count_mode, **filters),
+        'per_page': page['per_page'],
+        'next_cursor': page['next_cursor'],
+    }), 200
+
 # Endpoint to get all users
+# Accepts is_active, is_admin and is_verified query filters in any combination
 @auth_bp.route('/users', methods=['GET'])
+@read_only
 @admin_required
 def get_users(user):
-    users = User.query.all()
-    total = len(users)
-    return jsonify([user.format() for user in users], "total_users:", total), 200
+    return _list_users()
 
 # Endpoint to get a user by ID
 @auth_bp.route('/users/<user_id>', methods=['GET'])
+@read_only
+@cached_response(tags=['user:{user_id}'])
 def get_user(user_id):
     user = User.query.get(user_id)
     if not user:
@@ -285,8 +353,9 @@ def update_user(user_id):
     if 'username' in data:
         user.username = data['username']
     if 'password' in data:
-        user.password = generate_password_hash(data['password'])
+        user.password = hash_password(data['password'])
     db.session.commit()
+    invalidate_user(user.id)
     return jsonify(user.format()), 200
 
 # Endpoint to delete a user by ID
@@ -298,6 +367,7 @@ def delete_user(user_id):
         return jsonify({'message': 'User not found'}), 404
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id)
     return jsonify({'message': 'User deleted successfully'}), 200
 
 
@@ -310,6 +380,7 @@ def make_admin(user, user_id):
         return jsonify({'message': 'User not found'}), 404
     user.is_admin = True
     db.session.commit()
+    invalidate_user(user.id)
     return jsonify(user.format()), 200
 
 # Endpoint to remove admin privileges from a user
@@ -321,6 +392,7 @@ def remove_admin(user, user_id):
         return jsonify({'message': 'User not found'}), 404
     user.is_admin = False
     db.session.commit()
+    invalidate_user(user.id)
     return jsonify(user.format()), 200
 
 # Endpoint to deactivate a user
@@ -332,6 +404,7 @@ def deactivate_user(user, user_id):
         return jsonify({'message': 'User not found'}), 404
     user.is_active = False
     db.session.commit()
+    invalidate_user(user.id)
     return jsonify(user.format()), 200
 
 # Endpoint to activate a user
@@ -343,47 +416,43 @@ def activate_user(user, user_id):
         return jsonify({'message': 'User not found'}), 404
     user.is_active = True
     db.session.commit()
+    invalidate_user(user.id)
     return jsonify(user.format()), 200
 
 # Endpoint to get all admins
 @auth_bp.route('/admins', methods=['GET'])
+@read_only
 @admin_required
 def get_admins(user):
-    admins = User.query.filter_by(is_admin=True).all()
-    total = len(admins)
-    return jsonify([admin.format() for admin in admins], "total_admins:", total), 200
+    return _list_users(is_admin=True)
 
 # Endpoint to get all active users
 @auth_bp.route('/users/active', methods=['GET'])
+@read_only
 @admin_required
 def get_active_users(user):
-    active_users = User.query.filter_by(is_active=True).all()
-    total = len(active_users)
-    return jsonify([user.format() for user in active_users], "total_active_users:", total), 200
+    return _list_users(is_active=True)
 
 # Endpoint to get all inactive users
 @auth_bp.route('/users/inactive', methods=['GET'])
+@read_only
 @admin_required
 def get_inactive_users(user):
-    inactive_users = User.query.filter_by(is_active=False).all()
-    total = len(inactive_users)
-    return jsonify([user.format() for user in inactive_users], "total_inactive_users:", total), 200
+    return _list_users(is_active=False)
 
 # Endpoint to get all verified users
 @auth_bp.route('/users/verified', methods=['GET'])
+@read_only
 @admin_required
 def get_verified_users(user):
-    verified_users = User.query.filter_by(email_confirmed=True).all()
-    total = len(verified_users)
-    return jsonify([user.format() for user in verified_users], "total_verified_users:", total), 200
+    return _list_users(is_verified=True)
 
 # Endpoint to get all unverified users
 @auth_bp.route('/users/unverified', methods=['GET'])
+@read_only
 @admin_required
 def get_unverified_users(user):
-    unverified_users = User.query.filter_by(is_verified=False).all()
-    total = len(unverified_users)
-    return jsonify([user.format() for user in unverified_users], "total_unverified_users:", total), 200
+    return _list_users(is_verified=False)
 
 # Route to test the server
 @auth_bp.route('/test', methods=['GET'])
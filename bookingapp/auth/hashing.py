@@ -0,0 +1,113 @@
+"""
+Password hashing off the request thread
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from threading import BoundedSemaphore, Lock
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from bookingapp.errors.handlers import CustomError
+import bcrypt
+import multiprocessing
+import os
+
+
+_lock = Lock()
+_pool = None
+_slots = None
+_pid = None
+
+
+def _executor():
+    """Return this process's hashing pool, or None to hash inline"""
+    global _pool, _slots, _pid
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 2)
+    if workers <= 0:
+        return None
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                # forkserver children start small instead of copying the app
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                _slots = BoundedSemaphore(workers + current_app.config.get('PASSWORD_HASH_QUEUE', 16))
+                _pid = os.getpid()
+    return _pool
+
+
+def _run(func, *args):
+    """Run a hashing function in the pool, bounded by PASSWORD_HASH_QUEUE.
+
+    When every slot is taken the request fails fast with a 503 instead of
+    queueing behind a login storm.
+    """
+    pool = _executor()
+    if pool is None:
+        return func(*args)
+    timeout = current_app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+    slots = _slots
+    if not slots.acquire(timeout=timeout):
+        raise CustomError('Service Unavailable', 503, 'Too many concurrent logins, please retry')
+    try:
+        future = pool.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot is held until the job is done, even when the request gave
+    # up on it, so timed out hashes still count against the queue
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise CustomError('Service Unavailable', 503, 'Password check timed out, please retry')
+
+
+def hash_password(password):
+    """Hash a user password with PASSWORD_HASH_METHOD"""
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(pwhash, password):
+    """Check a user password against its stored hash"""
+    return _run(check_password_hash, pwhash, password)
+
+
+@lru_cache(maxsize=8)
+def _stored_method(method):
+    # What werkzeug writes before the first '$' for a PASSWORD_HASH_METHOD,
+    # with its defaults filled in, e.g. 'scrypt' -> 'scrypt:32768:8:1'.
+    # Hashing once per process keeps this right whatever those defaults are.
+    return _run(generate_password_hash, '', method).split('$', 1)[0]
+
+
+def needs_rehash(pwhash):
+    """True when a hash was made with other parameters than the configured ones"""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    return pwhash.split('$', 1)[0] != _stored_method(method)
+
+
+def hash_admin_password(password):
+    """Hash an admin password with bcrypt at BCRYPT_ROUNDS"""
+    salt = bcrypt.gensalt(rounds=current_app.config['BCRYPT_ROUNDS'])
+    return _run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_admin_password(pwhash, password):
+    """Check an admin password against its bcrypt hash"""
+    if isinstance(pwhash, str):
+        pwhash = pwhash.encode('utf-8')
+    return _run(bcrypt.checkpw, password.encode('utf-8'), pwhash)
+
+
+def admin_needs_rehash(pwhash):
+    """True when a bcrypt hash ($2b$<rounds>$...) uses other rounds than BCRYPT_ROUNDS"""
+    if isinstance(pwhash, bytes):
+        pwhash = pwhash.decode('utf-8')
+    try:
+        rounds = int(pwhash.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != current_app.config['BCRYPT_ROUNDS']
@@ -0,0 +1,126 @@
+"""
+Per-process cache of the users resolved by the auth decorators
+"""
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
+from bookingapp import db
+from bookingapp.caching.backends import CLEAR_ALL, InvalidationBus
+from bookingapp.metrics.middleware import record_cache
+from bookingapp.models.user import User
+import time
+
+
+class UserCache:
+    """Small LRU cache with a TTL, keyed by user id.
+
+    Entries are detached User snapshots that are never attached to a
+    session themselves; callers get a session-bound copy via merge().
+    Changes are announced to the other workers on ``bus``; the TTL only
+    bounds how long a lost announcement (e.g. while Redis is down) can
+    keep a stale user.
+    """
+
+    def __init__(self, maxsize=10000, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.bus = InvalidationBus()
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def configure(self, maxsize, ttl, bus):
+        """Apply the app's size and TTL settings and listen on its invalidation bus"""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.bus = bus
+            bus.subscribe(on_cache_invalidation)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, user_id):
+        """Return the cached snapshot, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def set(self, user_id, snapshot):
+        """Store a snapshot, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user so the next request reloads it from the database"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+# Prefix of the keys announced on the cache invalidation bus
+BUS_KEY_PREFIX = 'auth-user:'
+
+
+def _snapshot(user):
+    """Build a detached copy of a loaded user holding only its columns"""
+    snapshot = User.__mapper__.class_manager.new_instance()
+    for column in User.__mapper__.column_attrs:
+        setattr(snapshot, column.key, getattr(user, column.key))
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def load_user(user_id):
+    """Return the user for a token identity, attached to the current session.
+
+    A cached snapshot is merged without a SELECT; otherwise the user is
+    loaded from the database and cached for AUTH_USER_CACHE_TTL seconds.
+    """
+    if current_app.config.get('AUTH_USER_CACHE_TTL', 30) <= 0:
+        return db.session.get(User, user_id)
+
+    # Evictions published by other workers since the last request
+    user_cache.bus.listen()
+    snapshot = user_cache.get(user_id)
+    record_cache('user', snapshot is not None)
+    if snapshot is not None:
+        return db.session.merge(snapshot, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, _snapshot(user))
+    return user
+
+
+def invalidate_user(user_id):
+    """Forget a cached user after its row has been changed or deleted.
+
+    The other workers are told on the invalidation bus, so a password
+    change or deactivation takes effect on their next request too.
+    """
+    user_cache.invalidate(user_id)
+    user_cache.bus.publish(BUS_KEY_PREFIX + user_id)
+
+
+def on_cache_invalidation(key):
+    """Invalidation bus subscriber evicting users changed by other workers"""
+    if key == CLEAR_ALL:
+        user_cache.clear()
+    elif key and key.startswith(BUS_KEY_PREFIX):
+        user_cache.invalidate(key[len(BUS_KEY_PREFIX):])
@@ -1,9 +1,21 @@
 ## Endpoint Routes for Booking Blueprint
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
 from bookingapp import db
+from bookingapp.auth.auth_utils import login_required, admin_required
+from bookingapp.caching.responses import cached_response
+from bookingapp.db_config.routing import read_only
+from bookingapp.booking.schemas import BulkBookingSchema
 from bookingapp.utils.uuid_validation import IdSchema
 from uuid import UUID
+import csv
+import io
+import json
+
+# Rows fetched per round-trip when streaming an export
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FIELDS = ['id', 'user_id', 'event_id', 'booking_date', 'createdAt']
 
 # Create the booking blueprint
 booking_bp = Blueprint('booking', __name__, url_prefix='/api/v1/booking')
@@ -15,6 +27,8 @@ def test():
 
 # Route to Get all Bookings of an event
 @booking_bp.route('/<event_id>', methods=['GET'])
+@read_only
+@cached_response(tags=['event:{event_id}'])
 def get_bookings(event_id):
     """
     Retrieves the bookings for a specific event.
@@ -29,11 +43,10 @@ def get_bookings(event_id):
     """
     try:
         # Validate the event_id
-        schema = IdSchema()
-        event_id = schema.load({'id': event_id})
+        IdSchema(id=event_id)
 
         # Query the bookings
-        bookings = Booking.query.filter_by(event_id=event_id).all()
+        bookings = Booking.query.options(*Booking.loading('list')).filter_by(event_id=event_id).all()
 
         # Check if the bookings exist
         if bookings is None:
@@ -45,4 +58,118 @@ def get_bookings(event_id):
         # Return the bookings
         return jsonify({'message': 'Bookings found', 'data': formatted_bookings}), 200
     except Exception as e:
-        return jsonify({'message': 'An error occurred', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'An error occurred', 'error': str(e)}), 500
+
+
+# Route to book a seat of an event
+@booking_bp.route('/<event_id>', methods=['POST'])
+@login_required
+def create_booking(user, event_id):
+    """
+    Books one seat of an event for the current user.
+
+    Parameters:
+        event_id (str): The ID of the event.
+
+    Returns:
+        A JSON response with the booking and a 201 status code, or a JSON
+        error with a 404 (no such event), 409 (sold out) or 503 (too much
+        contention, retry) status code.
+    """
+    IdSchema(id=event_id)
+
+    booking = Booking.reserve(user.id, event_id)
+    return jsonify({'message': 'Booking created', 'data': booking.format()}), 201
+
+
+# Route to book seats of several events at once (group orders)
+@booking_bp.route('/bulk', methods=['POST'])
+@login_required
+def create_bookings(user):
+    """
+    Books seats of one or more events for the current user in one transaction.
+
+    Body:
+        {"items": [{"event_id": "<id>", "seats": 3}, ...]}
+
+    Returns:
+        A JSON response with one result per item ('booked', 'sold_out' or
+        'not_found'), with a 201 status code if every item was booked, 207
+        if only some were and 409 if none were. Invalid bodies get a 400.
+    """
+    data = BulkBookingSchema(**(request.get_json(silent=True) or {}))
+
+    results = Booking.reserve_many(user.id, [(item.event_id.hex, item.seats) for item in data.items])
+
+    booked = sum(result['status'] == 'booked' for result in results)
+    status = 201 if booked == len(results) else 207 if booked else 409
+    return jsonify({'message': f'{booked} of {len(results)} items booked', 'data': results}), status
+
+
+# Route to export all Bookings of an event
+@booking_bp.route('/<event_id>/export', methods=['GET'])
+@read_only
+@admin_required
+def export_bookings(user, event_id):
+    """
+    Streams every booking of an event as NDJSON (default) or CSV.
+
+    Rows are read from a server-side cursor EXPORT_CHUNK_SIZE at a time and
+    written out as they arrive, so memory use does not grow with the number
+    of bookings and the response is sent with chunked transfer encoding.
+
+    Parameters:
+        event_id (str): The ID of the event.
+        format (query): 'ndjson' or 'csv'.
+
+    Returns:
+        A streamed attachment, or a JSON error with a 400/404 status code.
+    """
+    IdSchema(id=event_id)
+
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+
+    if db.session.get(Event, event_id) is None:
+        return jsonify({'message': 'Event not found'}), 404
+
+    stmt = (
+        db.select(*[getattr(Booking, field) for field in EXPORT_FIELDS])
+        .where(Booking.event_id == event_id)
+        .order_by(Booking.createdAt, Booking.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+
+    def serialize(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def generate_ndjson():
+        for rows in db.session.execute(stmt).partitions():
+            yield ''.join(
+                json.dumps({field: serialize(value) for field, value in zip(EXPORT_FIELDS, row)}) + '\n'
+                for row in rows
+            )
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue()
+        for rows in db.session.execute(stmt).partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([serialize(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+
+    filename = f'bookings_{event_id}.{export_format}'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import List
+from uuid import UUID
+
+# Largest group order accepted in one request
+BULK_BOOKING_MAX_ITEMS = 100
+BULK_BOOKING_MAX_SEATS = 50
+
+
+class BulkBookingItem(BaseModel):
+    event_id: UUID
+    seats: int = Field(default=1, ge=1, le=BULK_BOOKING_MAX_SEATS)
+
+
+class BulkBookingSchema(BaseModel):
+    items: List[BulkBookingItem] = Field(min_length=1, max_length=BULK_BOOKING_MAX_ITEMS)
@@ -0,0 +1,352 @@
+"""
+Cache backends shared by the gunicorn workers
+"""
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.simplecache import SimpleCache
+from werkzeug.utils import import_string
+from threading import Lock
+from uuid import uuid4
+import json
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers run a single process
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# CACHE_BACKEND values and the Flask-Caching CACHE_TYPE each one selects
+CACHE_BACKENDS = {
+    "simple": "SimpleCache",
+    "filesystem": "FileSystemCache",
+    "redis": "RedisCache",
+    "twolevel": "bookingapp.caching.backends.TwoLevelCache",
+}
+
+# CACHE_FAR_TYPE values usable as the shared level of TwoLevelCache
+FAR_BACKENDS = {
+    "filesystem": "flask_caching.backends.filesystemcache.FileSystemCache",
+    "redis": "flask_caching.backends.rediscache.RedisCache",
+}
+
+# Backends that each worker keeps to itself
+PER_PROCESS_BACKENDS = {"simple"}
+
+# Key published to ask every worker to drop its whole near cache
+CLEAR_ALL = "*"
+
+
+def cache_type_for(backend):
+    """Return the Flask-Caching CACHE_TYPE for a CACHE_BACKEND name"""
+    try:
+        return CACHE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(
+            f"Invalid CACHE_BACKEND {backend!r}. Expected one of {sorted(CACHE_BACKENDS)}")
+
+
+class InvalidationBus:
+    """Fan-out of invalidated keys to the other workers.
+
+    This base class only notifies subscribers in the current process.
+    """
+
+    def __init__(self):
+        self._origin = None
+        self._origin_pid = None
+        self._subscribers = []
+
+    @property
+    def origin(self):
+        """Id of this process, used to skip the messages it sent itself"""
+        # Regenerated after a fork so that sibling workers do not share it
+        if self._origin_pid != os.getpid():
+            self._origin = uuid4().hex
+            self._origin_pid = os.getpid()
+        return self._origin
+
+    def subscribe(self, callback):
+        """Call ``callback(key)`` whenever a key is invalidated anywhere"""
+        self._subscribers.append(callback)
+
+    def publish(self, key):
+        """Announce that ``key`` changed"""
+        self._notify(key)
+
+    def listen(self):
+        """Deliver what other workers published; call before reading a cache"""
+
+    def _notify(self, key):
+        for callback in self._subscribers:
+            try:
+                callback(key)
+            except Exception:
+                logger.exception("Cache invalidation subscriber failed for %s", key)
+
+
+class FileInvalidationBus(InvalidationBus):
+    """Invalidation bus over an append-only file next to the filesystem cache.
+
+    Publishing appends one JSON line; every read first stats the file and
+    replays lines written by other workers since the last check. When the
+    file grows past ``max_size`` it is replaced by an empty one, and a
+    worker that sees a new file drops its whole near cache, which is
+    always safe. Each file starts with a random generation line, since a
+    new file can reuse the inode and outgrow the old offset before a
+    worker looks again. Appends and the replacement happen under a lock
+    on the file, so no line goes to a file that was already replaced.
+    """
+
+    def __init__(self, path, max_size=1024 * 1024):
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+        self._generation = None
+        self._offset = 0
+        self._seen = None
+        self._lock = Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as log:
+                self._generation = self._read_generation(log)
+                self._offset = log.seek(0, os.SEEK_END)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _read_generation(log):
+        # Leaves the file positioned after the generation line
+        log.seek(0)
+        try:
+            return json.loads(log.readline()).get("generation")
+        except (ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def _generation_line():
+        return json.dumps({"generation": uuid4().hex}) + "\n"
+
+    def _open_locked(self):
+        # Reopen until the locked file is still the one at self.path
+        while True:
+            log = open(self.path, "a", encoding="utf-8")
+            if fcntl is None:
+                return log
+            fcntl.flock(log, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(log.fileno()).st_ino:
+                    return log
+            except FileNotFoundError:
+                pass
+            log.close()
+
+    def publish(self, key):
+        self.poll()
+        self._notify(key)
+        line = json.dumps({"origin": self.origin, "key": key}) + "\n"
+        try:
+            with self._open_locked() as log:
+                if log.tell() == 0:
+                    log.write(self._generation_line())
+                log.write(line)
+                log.flush()
+                if log.tell() > self.max_size:
+                    fresh = f"{self.path}.{os.getpid()}.tmp"
+                    with open(fresh, "w", encoding="utf-8") as new_log:
+                        new_log.write(self._generation_line())
+                    os.replace(fresh, self.path)
+        except OSError:
+            logger.exception("Could not publish cache invalidation for %s", key)
+
+    def listen(self):
+        self.poll()
+
+    def poll(self):
+        """Replay invalidations written by other workers since the last call"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        # Unchanged since the last poll; the size alone can match a new file
+        seen = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if seen == self._seen:
+            return
+        with self._lock:
+            self._seen = seen
+            with open(self.path, "r", encoding="utf-8") as log:
+                generation = self._read_generation(log)
+                if generation != self._generation:
+                    # A new file: whatever the old one still held is lost
+                    if self._generation is not None:
+                        self._notify(CLEAR_ALL)
+                    self._generation = generation
+                    self._offset = log.tell()
+                log.seek(self._offset)
+                lines = log.readlines()
+                self._offset = log.tell()
+        for line in lines:
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                continue
+            if payload.get("origin") != self.origin:
+                self._notify(payload.get("key"))
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """Invalidation bus over Redis PUBLISH/SUBSCRIBE.
+
+    The listener thread is started lazily and restarted after a fork, since
+    threads do not survive gunicorn forking its workers.
+    """
+
+    def __init__(self, client, channel):
+        super().__init__()
+        self.client = client
+        self.channel = channel
+        self._pid = None
+        self._thread = None
+        self._lock = Lock()
+
+    def ensure_listening(self):
+        """Start the subscriber thread for this process if needed"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_message})
+            self._thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+            self._pid = os.getpid()
+
+    def listen(self):
+        self.ensure_listening()
+
+    def publish(self, key):
+        self.ensure_listening()
+        self._notify(key)
+        message = json.dumps({"origin": self.origin, "key": key})
+        try:
+            self.client.publish(self.channel, message)
+        except Exception:
+            logger.exception("Could not publish cache invalidation for %s", key)
+
+    def _on_message(self, message):
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") != self.origin:
+            self._notify(payload.get("key"))
+
+
+def invalidation_bus(config):
+    """Build the invalidation bus for the workers sharing a cache config.
+
+    Redis setups (CACHE_BACKEND redis, or twolevel over Redis) publish on
+    CACHE_INVALIDATION_CHANNEL; the others append to a file next to
+    CACHE_DIR, which reaches the workers of one host.
+    """
+    backend = config.get("CACHE_BACKEND")
+    if backend == "redis" or (backend == "twolevel" and config.get("CACHE_FAR_TYPE") == "redis"):
+        from redis import from_url as redis_from_url
+        return RedisInvalidationBus(
+            redis_from_url(config["CACHE_REDIS_URL"]),
+            config.get("CACHE_INVALIDATION_CHANNEL", "bookingapp:cache:invalidate"),
+        )
+    # Kept outside CACHE_DIR, whose files belong to FileSystemCache
+    log_path = config["CACHE_DIR"].rstrip(os.sep) + "-invalidations.log"
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    return FileInvalidationBus(log_path)
+
+
+class TwoLevelCache(BaseCache):
+    """In-process near cache in front of a cache shared by all workers.
+
+    Reads are served from the near level when possible and fall back to
+    the far level (filesystem or Redis), whose value is then kept locally
+    for ``near_timeout`` seconds. Writes go to both levels and publish the
+    key on the invalidation bus so the other workers drop their copy.
+    """
+
+    def __init__(self, far, bus=None, near_timeout=5, near_threshold=1000, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.far = far
+        self.near = SimpleCache(threshold=near_threshold, default_timeout=near_timeout)
+        self.near_timeout = near_timeout
+        self.bus = bus or InvalidationBus()
+        self.bus.subscribe(self._drop_near)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        far_type = config.get("CACHE_FAR_TYPE", "filesystem")
+        if far_type not in FAR_BACKENDS:
+            raise ValueError(
+                f"Invalid CACHE_FAR_TYPE {far_type!r}. Expected one of {sorted(FAR_BACKENDS)}")
+        far = import_string(FAR_BACKENDS[far_type]).factory(app, config, list(args), dict(kwargs))
+        return cls(
+            far,
+            bus=invalidation_bus(config),
+            near_timeout=config.get("CACHE_NEAR_TIMEOUT", 5),
+            near_threshold=config.get("CACHE_NEAR_THRESHOLD", 1000),
+            default_timeout=kwargs.get("default_timeout", 300),
+        )
+
+    def _drop_near(self, key):
+        if key == CLEAR_ALL:
+            self.near.clear()
+        else:
+            self.near.delete(key)
+
+    def _near_timeout(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return self.near_timeout if timeout == 0 else min(timeout, self.near_timeout)
+
+    def get(self, key):
+        self.bus.listen()
+        value = self.near.get(key)
+        if value is None:
+            value = self.far.get(key)
+            if value is not None:
+                self.near.set(key, value, timeout=self.near_timeout)
+        return value
+
+    def has(self, key):
+        self.bus.listen()
+        return self.near.has(key) or self.far.has(key)
+
+    def set(self, key, value, timeout=None):
+        result = self.far.set(key, value, timeout=timeout)
+        self.bus.publish(key)
+        self.near.set(key, value, timeout=self._near_timeout(timeout))
+        return result
+
+    def add(self, key, value, timeout=None):
+        added = self.far.add(key, value, timeout=timeout)
+        if added:
+            self.bus.publish(key)
+            self.near.set(key, value, timeout=self._near_timeout(timeout))
+        return added
+
+    def delete(self, key):
+        result = self.far.delete(key)
+        self.bus.publish(key)
+        return result
+
+    def clear(self):
+        result = self.far.clear()
+        self.bus.publish(CLEAR_ALL)
+        return result
+
+    def inc(self, key, delta=1):
+        value = self.far.inc(key, delta=delta)
+        self.bus.publish(key)
+        return value
+
+    def dec(self, key, delta=1):
+        value = self.far.dec(key, delta=delta)
+        self.bus.publish(key)
+        return value
@@ -0,0 +1,155 @@
+"""
+Response caching for read endpoints with tag based invalidation
+"""
+from flask import request, has_app_context, make_response
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from functools import wraps
+from itertools import chain
+from uuid import uuid4
+from bookingapp import cache
+from bookingapp.metrics.middleware import record_cache
+import hashlib
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Response headers worth replaying from the cache
+CACHED_HEADERS = ('Content-Type', 'Content-Disposition')
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _tag_tokens(tags):
+    """Return the current token of each tag, creating missing ones.
+
+    A cached response is stored under a key that includes the tokens of its
+    tags, so replacing a token makes every response carrying that tag
+    unreachable. Tokens are random rather than counters so that a token
+    lost to eviction can never come back with a value seen before.
+    """
+    keys = [_tag_key(tag) for tag in tags]
+    tokens = cache.get_many(*keys) if keys else []
+    for index, token in enumerate(tokens):
+        if token is None:
+            cache.add(keys[index], uuid4().hex, timeout=0)
+            # Another worker may have won the race to create it
+            tokens[index] = cache.get(keys[index])
+    return tokens
+
+
+def invalidate_tags(*tags):
+    """Invalidate every cached response carrying any of the given tags.
+
+    Tags without a token have never been used by a cached response, so
+    only the existing tokens are replaced. Bulk writes touching thousands
+    of rows then cost one read instead of a write per row.
+    """
+    keys = [_tag_key(tag) for tag in set(tags)]
+    if not keys:
+        return
+    for key, token in zip(keys, cache.get_many(*keys)):
+        if token is not None:
+            cache.set(key, uuid4().hex, timeout=0)
+
+
+def add_cache_tags(session, tags):
+    """Invalidate tags when the session's transaction commits.
+
+    For writes made with Core statements, which the ORM events below do
+    not see.
+    """
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+
+def _auth_scope(per_user):
+    """Describe who is asking: anonymous, any signed in user, or one user"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity is None:
+        return 'anon'
+    return f'user:{identity}' if per_user else 'auth'
+
+
+def cached_response(tags=(), timeout=None, per_user=False):
+    """Cache the successful responses of a read endpoint.
+
+    Args:
+        tags: Tag templates formatted with the view arguments, e.g.
+            ``'event:{event_id}'``. Writes to rows carrying a tag (see
+            ``BaseModel.cache_tags``) invalidate the cached responses.
+        timeout: Seconds to keep a response, defaults to CACHE_DEFAULT_TIMEOUT.
+        per_user: Key on the caller's identity instead of only on whether
+            the caller is signed in, for responses that depend on the user.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                view_tags = [tag.format(**kwargs) for tag in tags]
+                base = '|'.join([
+                    request.endpoint,
+                    request.path,
+                    '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True))),
+                    _auth_scope(per_user),
+                    *_tag_tokens(view_tags),
+                ])
+                key = 'response:' + hashlib.sha1(base.encode('utf-8')).hexdigest()
+                hit = cache.get(key)
+            except Exception:
+                logger.exception('Response cache unavailable for %s', request.path)
+                return f(*args, **kwargs)
+
+            record_cache('response', hit is not None)
+            if hit is not None:
+                body, status, headers = hit
+                response = make_response(body, status, headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                try:
+                    cache.set(key, (response.get_data(), response.status_code, headers), timeout=timeout)
+                except Exception:
+                    logger.exception('Could not cache response for %s', request.path)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+# Collect the tags of every row written in a transaction and invalidate them
+# once it commits. This covers BaseModel.insert/update/delete as well as
+# routes that change objects and call db.session.commit() themselves.
+@event.listens_for(Session, 'after_flush')
+def _collect_cache_tags(session, flush_context):
+    tags = session.info.setdefault('cache_tags', set())
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if hasattr(instance, 'cache_tags'):
+            tags.update(instance.cache_tags())
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_cache_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context():
+        try:
+            invalidate_tags(*tags)
+        except Exception:
+            logger.exception('Could not invalidate cache tags %s', sorted(tags))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_cache_tags(session):
+    session.info.pop('cache_tags', None)
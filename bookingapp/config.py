@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 
 load_dotenv(".env")
 
-import os, random, string
+import os, random, string, tempfile
 
 class Config(object):
 
@@ -27,8 +27,115 @@ class Config(object):
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+
+    # Transactions that lose a write race (e.g. on-sale bookings) are retried
+    DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', 5))
+    DB_RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF', 0.01))
+
+    # Comma separated read replicas used by read_only views; a user who
+    # wrote reads from the primary for DB_READ_YOUR_WRITES_WINDOW seconds,
+    # which needs a CACHE_BACKEND shared by the workers (not simple)
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri.strip()]
+    DB_READ_YOUR_WRITES_WINDOW = int(os.getenv('DB_READ_YOUR_WRITES_WINDOW', 5))
+
+    # Lean startup for production workers: no db.create_all() once the
+    # database is stamped by Alembic (run the migrations on deploy) and
+    # flasgger loaded on the first docs request
+    LEAN_STARTUP = os.getenv('LEAN_STARTUP', 'False') == 'True'
+    # JSON copy of swagger_config.yaml, refreshed when the YAML changes
+    SWAGGER_CACHE = os.getenv('SWAGGER_CACHE', os.path.join(tempfile.gettempdir(), 'bookingapp-swagger.json'))
+
+    # Request metrics on /metrics, off unless enabled: each worker writes
+    # its totals to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and
+    # /metrics adds them up. When METRICS_TOKEN or METRICS_ALLOWED_IPS is
+    # set, scrapers need the Bearer token or one of those addresses.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+    METRICS_DIR = os.getenv('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'bookingapp-metrics')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+    # Server-Timing response header with the time spent in the view and SQL
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'
+
+    # In debug, requests running more SQL statements than QUERY_BUDGET are
+    # logged (or fail with QUERY_BUDGET_RAISE); views can set their own
+    # budget with @query_budget(n)
+    QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', 20))
+    QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', 'False') == 'True'
+
+    # gunicorn's access and error logs (see gunicorn-cfg.py), served by
+    # /logs with LOG_FILE and streamed LOG_CHUNK_SIZE bytes at a time
+    ACCESS_LOG_PATH = os.getenv('ACCESS_LOG_PATH', 'access_log.log')
+    ERROR_LOG_PATH = os.getenv('ERROR_LOG_PATH', 'error_log.log')
+    LOG_CHUNK_SIZE = int(os.getenv('LOG_CHUNK_SIZE', 64 * 1024))
+
+    # Application logging, written by a background thread per worker.
+    # LOG_FORMAT is json or text. The file rotates at LOG_MAX_BYTES, or on
+    # the LOG_ROTATE_WHEN schedule (e.g. midnight) when that is set.
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+    LOG_TO_STDERR = os.getenv('LOG_TO_STDERR', 'True') == 'True'
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 50 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+    # Connection pool of each gunicorn worker, ignored for SQLite. Keep
+    # DB_POOL_SIZE near the worker's threads and workers * (size + overflow)
+    # under the server's max_connections. DB_NULLPOOL=True leaves pooling
+    # to an external PgBouncer.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    DB_NULLPOOL = os.getenv('DB_NULLPOOL', 'False') == 'True'
     CACHE_DEFAULT_TIMEOUT = 300
-    CACHE_TYPE = "SimpleCache"
+
+    # Cache backend: simple (per worker), filesystem or redis (shared by
+    # the workers) or twolevel (per worker near cache in front of a shared
+    # filesystem/redis far cache, see CACHE_FAR_TYPE)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'simple')
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bookingapp-cache'))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_FAR_TYPE = os.getenv('CACHE_FAR_TYPE', 'filesystem')
+    CACHE_NEAR_TIMEOUT = int(os.getenv('CACHE_NEAR_TIMEOUT', 5))
+    CACHE_NEAR_THRESHOLD = int(os.getenv('CACHE_NEAR_THRESHOLD', 1000))
+    CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'bookingapp:cache:invalidate')
+
+    # Users resolved by login_required/admin_required, cached per process.
+    # Changes reach the other workers on the cache invalidation bus (Redis,
+    # or a file next to CACHE_DIR); the TTL bounds how long a worker that
+    # missed one keeps serving the old user
+    AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+    AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 10000))
+
+    # Background mail delivery (MAIL_ASYNC=False sends in the request thread)
+    MAIL_ASYNC = os.getenv('MAIL_ASYNC', 'True') == 'True'
+    MAIL_WORKERS = int(os.getenv('MAIL_WORKERS', 2))
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 20))
+    MAIL_BATCH_WAIT = float(os.getenv('MAIL_BATCH_WAIT', 0.5))
+    MAIL_MAX_RETRIES = int(os.getenv('MAIL_MAX_RETRIES', 5))
+    MAIL_RETRY_DELAY = float(os.getenv('MAIL_RETRY_DELAY', 2))
+    # Jobs waiting for a worker; beyond this new mail is dropped and logged
+    MAIL_QUEUE_SIZE = int(os.getenv('MAIL_QUEUE_SIZE', 10000))
+
+    # Password hashing: cost parameters and the per-process pool running it
+    # (PASSWORD_HASH_WORKERS=0 hashes in the request thread)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Cached feed of the next upcoming events (landing page)
+    UPCOMING_FEED_SIZE = int(os.getenv('UPCOMING_FEED_SIZE', 100))
+    UPCOMING_FEED_TTL = int(os.getenv('UPCOMING_FEED_TTL', 60))
+
+    # Pagination
+    PAGINATION_PER_PAGE = int(os.getenv('PAGINATION_PER_PAGE', 10))
+    PAGINATION_MAX_PER_PAGE = int(os.getenv('PAGINATION_MAX_PER_PAGE', 100))
 
 class ProductionConfig(Config):
     DEBUG = False
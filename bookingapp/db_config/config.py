@@ -1,4 +1,11 @@
-from bookingapp import db  
+from bookingapp import db
+from bookingapp.errors.handlers import CustomError
+from flask import current_app
+from datetime import datetime
+import base64
+import binascii
+import json
+
 
 def query_one_filtered(table, **kwargs):
     """Query a single item from the table based on filters."""
@@ -20,13 +27,141 @@ def query_all(table):
     return db.session.query(table).all()
 
 
-def query_paginated(table, page):
+def get_per_page(per_page=None):
+    """Return the page size to use, capped at PAGINATION_MAX_PER_PAGE."""
+    default = current_app.config.get("PAGINATION_PER_PAGE", 10)
+    maximum = current_app.config.get("PAGINATION_MAX_PER_PAGE", 100)
+    try:
+        per_page = int(per_page) if per_page is not None else default
+    except (TypeError, ValueError):
+        raise CustomError("Bad Request", 400, "per_page must be an integer")
+    return max(1, min(per_page, maximum))
+
+
+def query_paginated(table, page, per_page=None, count=True):
     """Query paginated items from the table."""
-    per_page = 10
-    return db.session.query(table).order_by(table.createdAt.desc()).paginate(page, per_page, False)
+    return db.session.query(table).order_by(table.createdAt.desc()).paginate(
+        page=page, per_page=get_per_page(per_page), error_out=False, count=count)
 
 
-def query_paginate_filtered(table, page, **kwargs):
+def query_paginate_filtered(table, page, per_page=None, count=True, **kwargs):
     """Query paginated items from the table based on filters."""
-    per_page = 10
-    return db.session.query(table).filter_by(**kwargs).order_by(table.createdAt.desc()).paginate(page, per_page, False, 10)
\ No newline at end of file
+    return db.session.query(table).filter_by(**kwargs).order_by(table.createdAt.desc()).paginate(
+        page=page, per_page=get_per_page(per_page), error_out=False, count=count)
+
+
+def encode_cursor(values):
+    """Encode the sort key values of the last row into an opaque token."""
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor, size=2):
+    """Decode a token produced by encode_cursor() back into key values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("cursor has the wrong number of keys")
+        return [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError, UnicodeError, binascii.Error):
+        raise CustomError("Bad Request", 400, "Invalid pagination cursor")
+
+
+def count_filtered(table, filters=(), **kwargs):
+    """Return COUNT(*) of the rows in the table matching the filters."""
+    stmt = db.select(db.func.count()).select_from(table).filter_by(**kwargs).where(*filters)
+    return db.session.execute(stmt).scalar_one()
+
+
+def estimate_count(table):
+    """Return the planner's row estimate for a table, or None if unavailable.
+
+    Postgres keeps ``pg_class.reltuples`` up to date through ANALYZE, which
+    is good enough for admin totals and avoids scanning the whole table.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return None
+    stmt = db.text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name")
+    estimate = db.session.execute(stmt, {"name": table.__tablename__}).scalar()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def query_total(table, mode="exact", **kwargs):
+    """Return the total for a listing: 'exact', 'estimate' or 'none'.
+
+    Estimates only exist for the whole table, so a filtered listing falls
+    back to an exact COUNT(*).
+    """
+    if mode == "none":
+        return None
+    if mode == "estimate" and not kwargs:
+        estimate = estimate_count(table)
+        if estimate is not None:
+            return estimate
+    return count_filtered(table, **kwargs)
+
+
+def query_keyset(table, cursor=None, per_page=None, with_total=False, keys=None, descending=True, columns=None,
+                 filters=(), **kwargs):
+    """Query one page of items using keyset (cursor) pagination.
+
+    Rows are ordered on ``keys`` (``createdAt`` then ``id`` by default) and
+    the next page starts strictly after the last row returned, so the cost of
+    a page does not depend on how deep into the result set it is.
+
+    Args:
+        table: The model to query.
+        cursor: Token returned as ``next_cursor`` by the previous page.
+        per_page: Requested page size, capped at PAGINATION_MAX_PER_PAGE.
+        with_total: Also run a COUNT(*) for the filters (costly on big tables).
+        keys: Columns making up a unique sort key, most significant first.
+        descending: Walk the keys from newest to oldest.
+        columns: Only select these columns and return plain dicts instead of
+            ORM objects, which skips hydrating a model per row.
+        filters: Extra SQL expressions, e.g. ranges, that the rows must match.
+        **kwargs: Equality filters passed to ``filter_by``.
+
+    Returns:
+        dict: ``items``, ``next_cursor`` (None on the last page), ``per_page``
+        and, when requested, ``total``.
+    """
+    keys = keys or (table.createdAt, table.id)
+    per_page = get_per_page(per_page)
+
+    if columns:
+        # The sort keys are needed to build the next cursor
+        selected = list(columns) + [key for key in keys if not any(key is column for column in columns)]
+        query = db.session.query(*selected).select_from(table).filter_by(**kwargs)
+    else:
+        query = db.session.query(table).filter_by(**kwargs)
+    if filters:
+        query = query.filter(*filters)
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        row_key, last_key = db.tuple_(*keys), db.tuple_(*values)
+        query = query.filter(row_key < last_key if descending else row_key > last_key)
+
+    order = [key.desc() if descending else key.asc() for key in keys]
+    # Fetch one extra row to know whether another page exists
+    items = query.order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor([getattr(items[-1], key.key) for key in keys])
+    if columns:
+        names = [column.key for column in columns]
+        items = [{name: row._mapping[name] for name in names} for row in items]
+
+    page = {"items": items, "next_cursor": next_cursor, "per_page": per_page}
+    if with_total:
+        page["total"] = count_filtered(table, filters=filters, **kwargs)
+    return page
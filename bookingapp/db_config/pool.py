@@ -0,0 +1,174 @@
+"""
+Database connection pool settings and metrics
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+from collections import deque
+from threading import Lock
+import logging
+import os
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Checkout waits kept per pool for the percentiles
+WAIT_SAMPLES = 1000
+
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings.
+
+    SQLite is left to Flask-SQLAlchemy's defaults, which pick a pool that
+    suits file and in-memory databases. DB_NULLPOOL opens a connection per
+    checkout, for when PgBouncer in front of the database does the pooling.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    if config.get('DB_NULLPOOL'):
+        return {'poolclass': NullPool, 'pool_pre_ping': config.get('DB_POOL_PRE_PING', True)}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+
+
+class PoolMetrics:
+    """Counters of one engine's pool in the current process.
+
+    The counters restart after a fork, so a gunicorn worker only reports
+    its own connections and not the ones inherited from the master.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.started = time.monotonic()
+        self.checkouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def count(self, counter):
+        with self._lock:
+            self._check_pid()
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self._check_pid()
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.waits.append(seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self, pool):
+        """Return the counters together with the current state of ``pool``"""
+        with self._lock:
+            self._check_pid()
+            waits = sorted(self.waits)
+            wait_avg = self.wait_total / self.wait_count if self.wait_count else 0.0
+            wait_max = self.wait_max
+            uptime = max(time.monotonic() - self.started, 1e-9)
+            stats = {
+                'pool_class': type(pool).__name__,
+                'checkouts': self.checkouts,
+                'connects': self.connects,
+                'closes': self.closes,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                # New connections per minute; a warm pool stays close to 0
+                'churn_per_minute': round(self.connects / uptime * 60, 3),
+            }
+        if waits:
+            stats['wait_ms'] = {
+                'avg': round(wait_avg * 1000, 3),
+                'p50': round(waits[len(waits) // 2] * 1000, 3),
+                'p99': round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 3),
+                'max': round(wait_max * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update({
+                'size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': pool.overflow(),
+                # Share of the pool in use; at 1.0 the next checkout waits
+                'saturation': round(pool.checkedout() / capacity, 3) if capacity else None,
+            })
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection.
+
+    The time includes opening a new connection when the pool has none
+    idle, so a slow connect shows up here as well as a full pool.
+    """
+
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+                logger.warning('Connection pool %s exhausted: %s', self.metrics.name, self.metrics.snapshot(self))
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool, keep reporting to the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+_engines = {}
+
+
+def watch_engine(name, engine):
+    """Collect pool metrics for ``engine`` under ``name``"""
+    metrics = PoolMetrics(name)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = metrics
+
+    event.listen(engine, 'checkout', lambda *args: metrics.count('checkouts'))
+    event.listen(engine, 'connect', lambda *args: metrics.count('connects'))
+    event.listen(engine, 'close', lambda *args: metrics.count('closes'))
+    event.listen(engine, 'close_detached', lambda *args: metrics.count('closes'))
+    event.listen(engine, 'invalidate', lambda *args: metrics.count('invalidations'))
+    _engines[name] = (engine, metrics)
+
+
+def pool_stats():
+    """Return the metrics of every watched pool, keyed by bind name"""
+    return {name: metrics.snapshot(engine.pool) for name, (engine, metrics) in _engines.items()}
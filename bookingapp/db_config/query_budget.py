@@ -0,0 +1,85 @@
+"""
+Query count budget of a request, to catch N+1 queries while developing
+"""
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from bookingapp.errors.handlers import CustomError
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(limit):
+    """Give a view its own query budget instead of QUERY_BUDGET.
+
+    Usage:
+        @booking_bp.route('/report')
+        @query_budget(50)
+        def report():
+    """
+    def decorator(f):
+        f.query_budget = limit
+        return f
+
+    return decorator
+
+
+class QueryBudget:
+    """Flags requests that run more SQL statements than their budget.
+
+    Active in debug and testing only. Over budget, the request is logged
+    with its most repeated statement, which is usually the lazy load
+    behind an N+1. With QUERY_BUDGET_RAISE the statement that goes over
+    the budget raises instead, so the traceback points at the loop.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Hook into the app's requests in debug and testing"""
+        self.budget = app.config.get('QUERY_BUDGET', 20)
+        self.strict = app.config.get('QUERY_BUDGET_RAISE', False)
+        self.enabled = (app.debug or app.testing) and self.budget > 0
+        app.extensions['query_budget'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        view = current_app.view_functions.get(request.endpoint)
+        g.query_budget = getattr(view, 'query_budget', self.budget)
+        g.query_budget_strict = self.strict
+        g.query_statements = Counter()
+
+    def _finish(self, response):
+        statements = g.pop('query_statements', None)
+        if statements is None:
+            return response
+        count = sum(statements.values())
+        if count > g.query_budget:
+            statement, repeats = statements.most_common(1)[0]
+            logger.warning('%s %s ran %d queries (budget %d); most repeated, %d times: %s',
+                           request.method, request.path, count, g.query_budget, repeats, statement)
+        return response
+
+
+query_budget_guard = QueryBudget()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or 'query_statements' not in g:
+        return
+    g.query_statements[statement] += 1
+    count = sum(g.query_statements.values())
+    if g.query_budget_strict and count > g.query_budget:
+        raise CustomError('Query Budget Exceeded', 500,
+                          f'{request.endpoint} ran more than {g.query_budget} queries, '
+                          f'the last one {g.query_statements[statement]} times: {statement}')
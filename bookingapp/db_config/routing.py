@@ -0,0 +1,75 @@
+"""
+Read-only requests served by the replicas, with read-your-writes
+"""
+from flask import current_app, has_request_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from functools import wraps
+from bookingapp import db, cache
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def _window_key(identity):
+    return f'ryw:{identity}'
+
+
+def _current_identity():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def read_only(f):
+    """Serve the queries of a view from a replica.
+
+    Callers who wrote within the last DB_READ_YOUR_WRITES_WINDOW seconds
+    keep reading from the primary, so they see their own changes even when
+    the replicas lag behind. Without configured replicas this does nothing.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_app.config.get('SQLALCHEMY_REPLICA_BINDS'):
+            return f(*args, **kwargs)
+        identity = _current_identity()
+        try:
+            recent_write = identity is not None and cache.get(_window_key(identity)) is not None
+        except Exception:
+            logger.exception('Read-your-writes window unavailable, reading from the primary')
+            recent_write = True
+        if recent_write:
+            return f(*args, **kwargs)
+
+        # Kept until the session is removed at the end of the request, so
+        # that streamed responses read from the replica too
+        db.session.info['read_only'] = True
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+# Once a session has written, the rest of the request reads from the
+# primary, and the writer's next requests do too for the window.
+@event.listens_for(Session, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _open_read_your_writes_window(session):
+    if not session.info.get('wrote') or not has_request_context():
+        return
+    window = current_app.config.get('DB_READ_YOUR_WRITES_WINDOW', 5)
+    if window <= 0 or not current_app.config.get('SQLALCHEMY_REPLICA_BINDS'):
+        return
+    identity = _current_identity()
+    if identity is not None:
+        try:
+            cache.set(_window_key(identity), True, timeout=window)
+        except Exception:
+            logger.exception('Could not open the read-your-writes window of %s', identity)
@@ -0,0 +1,37 @@
+"""
+Session routing reads to replica binds
+"""
+from flask import current_app
+from flask_sqlalchemy.session import Session
+import random
+
+
+class RoutingSession(Session):
+    """Session sending the SELECTs of read-only requests to a replica.
+
+    Reads go to a replica only while ``info['read_only']`` is set (see
+    ``bookingapp.db_config.routing.read_only``) and only for tables on the
+    default bind. Writes, flushes, ``SELECT ... FOR UPDATE`` and every
+    query after this session has written go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not self._use_replica(clause) or engine is not self._db.engine:
+            return engine
+        return self._replica() or engine
+
+    def _use_replica(self, clause):
+        if not self.info.get('read_only') or self.info.get('wrote') or self._flushing:
+            return False
+        if clause is None:
+            return True
+        return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+    def _replica(self):
+        # One replica per session so that a request reads a single snapshot
+        if 'replica' not in self.info:
+            keys = current_app.config.get('SQLALCHEMY_REPLICA_BINDS', [])
+            self.info['replica'] = random.choice(keys) if keys else None
+        key = self.info['replica']
+        return self._db.engines[key] if key is not None else None
@@ -0,0 +1,48 @@
+"""
+Transactions retried when they lose a race with concurrent writers
+"""
+from flask import current_app
+from sqlalchemy.exc import DBAPIError
+from bookingapp import db
+from bookingapp.errors.handlers import CustomError
+import logging
+import random
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL serialization_failure and deadlock_detected
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+
+def is_retryable(error):
+    """True when a failed transaction can simply be run again"""
+    orig = getattr(error, 'orig', None)
+    code = getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)
+    if code in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite has a single writer and reports contention as a lock timeout
+    return 'database is locked' in str(orig)
+
+
+def run_with_retry(func, *args, **kwargs):
+    """Run ``func`` (which must commit) and retry it on write conflicts.
+
+    The session is rolled back before each retry, after a randomised
+    exponential backoff of DB_RETRY_BACKOFF seconds, up to
+    DB_RETRY_ATTEMPTS attempts. Other errors are raised at once.
+    """
+    attempts = current_app.config.get('DB_RETRY_ATTEMPTS', 5)
+    backoff = current_app.config.get('DB_RETRY_BACKOFF', 0.01)
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except DBAPIError as e:
+            db.session.rollback()
+            if not is_retryable(e):
+                raise
+            if attempt == attempts:
+                logger.warning('Giving up on %s after %d conflicting attempts', func.__name__, attempts)
+                raise CustomError('Service Unavailable', 503, 'Too many concurrent requests, please retry')
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
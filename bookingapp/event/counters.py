@@ -0,0 +1,97 @@
+"""
+Repair of the booking counters kept on events
+"""
+from bookingapp import db
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+import click
+
+# Revenue differences below this are float noise, not drift
+REVENUE_TOLERANCE = 0.005
+
+
+def _actual_totals():
+    return (
+        db.select(
+            Booking.event_id,
+            db.func.count().label('bookings'),
+            db.func.coalesce(db.func.sum(Booking.amount), 0).label('revenue'),
+        )
+        .group_by(Booking.event_id)
+        .subquery()
+    )
+
+
+def _seats_left(bookings):
+    """Seats an event has left after ``bookings``; NULL for events without a capacity"""
+    left = Event.capacity - bookings
+    return db.case((left < 0, 0), else_=left)
+
+
+def find_drift():
+    """Find the events whose stored counters differ from their bookings.
+
+    Returns:
+        list: (event_id, stored count, actual count, stored revenue,
+        actual revenue, stored seats remaining, actual seats remaining) rows.
+    """
+    totals = _actual_totals()
+    bookings = db.func.coalesce(totals.c.bookings, 0)
+    revenue = db.func.coalesce(totals.c.revenue, 0)
+    seats = _seats_left(bookings)
+    stmt = (
+        db.select(Event.id, Event.bookings_count, bookings, Event.revenue, revenue, Event.seats_remaining, seats)
+        .outerjoin(totals, totals.c.event_id == Event.id)
+        .where(db.or_(
+            Event.bookings_count != bookings,
+            db.func.abs(Event.revenue - revenue) > REVENUE_TOLERANCE,
+            Event.seats_remaining.is_distinct_from(seats),
+        ))
+    )
+    return db.session.execute(stmt).all()
+
+
+def reconcile_event(event_id):
+    """Recount one event's bookings, revenue and seats left from the bookings table.
+
+    The event row is locked first, so a booking in flight for it either
+    commits before the recount or waits for it; the repair cannot itself
+    lose a concurrent booking.
+    """
+    db.session.execute(db.select(Event.id).where(Event.id == event_id).with_for_update())
+    count = db.select(db.func.count()).where(Booking.event_id == event_id).scalar_subquery()
+    revenue = db.select(db.func.coalesce(db.func.sum(Booking.amount), 0)).where(
+        Booking.event_id == event_id).scalar_subquery()
+    db.session.execute(
+        db.update(Event)
+        .where(Event.id == event_id)
+        .values(bookings_count=count, revenue=revenue, seats_remaining=_seats_left(count))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def reconcile_event_counters(dry_run=False):
+    """Find events whose counters drifted and, unless dry_run, repair them.
+
+    Returns:
+        list: The drifted rows as reported by find_drift().
+    """
+    drifted = find_drift()
+    db.session.rollback()
+    if not dry_run:
+        for row in drifted:
+            reconcile_event(row[0])
+    return drifted
+
+
+@click.command('reconcile-event-counters')
+@click.option('--dry-run', is_flag=True, help='Only report the events whose counters drifted.')
+def reconcile_event_counters_command(dry_run):
+    """Recompute events.bookings_count, revenue and seats_remaining from the bookings."""
+    drifted = reconcile_event_counters(dry_run=dry_run)
+    for event_id, stored_count, count, stored_revenue, revenue, stored_seats, seats in drifted:
+        click.echo(f'{event_id}: bookings {stored_count} -> {count}, revenue {stored_revenue:.2f} -> {revenue:.2f}, '
+                   f'seats remaining {stored_seats} -> {seats}')
+    action = 'found' if dry_run else 'repaired'
+    click.echo(f'{len(drifted)} events {action} with drifted counters')
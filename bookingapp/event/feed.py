@@ -0,0 +1,214 @@
+"""
+Cached feed of the next upcoming events, behind the landing page
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from bookingapp import db, cache
+from bookingapp.db_config.config import get_per_page, encode_cursor, decode_cursor
+from bookingapp.errors.handlers import CustomError
+from bookingapp.metrics.middleware import record_cache
+from bookingapp.models.event import Event
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+FEED_KEY = 'feed:upcoming'
+FEED_LOCK_KEY = 'feed:upcoming:lock'
+# Set by a writer that could not patch the feed while another worker did
+FEED_DIRTY_KEY = 'feed:upcoming:dirty'
+# Seconds a worker may hold FEED_LOCK_KEY
+FEED_LOCK_TIMEOUT = 5
+# Set for UPCOMING_FEED_TTL seconds on an event whose seats were booked or
+# released: longer than any feed built before the change can live
+SEATS_CHANGED_PREFIX = 'feed:upcoming:seats:'
+
+
+def _row(instance):
+    return {column.key: getattr(instance, column.key) for column in Event.listing_columns()}
+
+
+def _sort_key(row):
+    return (row['date_time'], row['id'])
+
+
+def build_feed():
+    """Load the next UPCOMING_FEED_SIZE events and cache them.
+
+    ``complete`` tells whether the feed holds every upcoming event; if not,
+    it holds every upcoming event up to its last one.
+    """
+    size = current_app.config.get('UPCOMING_FEED_SIZE', 100)
+    stmt = (
+        db.select(*Event.listing_columns())
+        .where(Event.date_time >= datetime.now())
+        .order_by(Event.date_time, Event.id)
+        .limit(size + 1)
+    )
+    rows = [dict(row) for row in db.session.execute(stmt).mappings()]
+    feed = {'events': rows[:size], 'complete': len(rows) <= size, 'built_at': time.time()}
+    cache.set(FEED_KEY, feed, timeout=current_app.config.get('UPCOMING_FEED_TTL', 60))
+    return feed
+
+
+def upcoming_page(cursor=None, per_page=None):
+    """Serve a page of upcoming events from the feed.
+
+    Returns:
+        dict: A page shaped like query_keyset's, or None when the page
+        reaches past the end of an incomplete feed (or the cache fails)
+        and has to be read from the database instead.
+    """
+    per_page = get_per_page(per_page)
+    values = tuple(decode_cursor(cursor, 2)) if cursor else None
+    # Compared with (date_time, id) keys, which other types would break
+    if values is not None and not (isinstance(values[0], datetime) and isinstance(values[1], str)):
+        raise CustomError('Bad Request', 400, 'Invalid pagination cursor')
+    try:
+        feed = cache.get(FEED_KEY)
+        record_cache('feed', feed is not None)
+        feed = feed or build_feed()
+    except Exception:
+        logger.exception('Upcoming events feed unavailable')
+        return None
+
+    rows = feed['events']
+    start = bisect_left(rows, (datetime.now(), ''), key=_sort_key)
+    if values is not None:
+        start = max(start, bisect_right(rows, values, key=_sort_key))
+    items = rows[start:start + per_page + 1]
+    if len(items) <= per_page and not feed['complete']:
+        return None
+    try:
+        items = _with_current_seats(items)
+    except Exception:
+        logger.exception('Seat counts of the upcoming events feed unavailable')
+        return None
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(_sort_key(items[-1]))
+    return {'items': items, 'next_cursor': next_cursor, 'per_page': per_page}
+
+
+def _with_current_seats(rows):
+    """Replace the seat counts of the rows whose seats changed since the feed was built.
+
+    Bookings only mark their event (see add_seat_changes) instead of
+    rewriting the whole feed; the marked rows of a page are re-read with
+    one primary key lookup.
+    """
+    marks = cache.get_many(*(SEATS_CHANGED_PREFIX + row['id'] for row in rows)) if rows else []
+    changed = [row['id'] for row, mark in zip(rows, marks) if mark]
+    if not changed:
+        return rows
+    stmt = db.select(Event.id, Event.seats_remaining, Event.bookings_count).where(Event.id.in_(changed))
+    current = {row['id']: row for row in db.session.execute(stmt).mappings()}
+    return [dict(row, seats_remaining=current[row['id']]['seats_remaining'],
+                 bookings_count=current[row['id']]['bookings_count'])
+            if row['id'] in current else row for row in rows]
+
+
+def apply_changes(changed, deleted):
+    """Patch the cached feed with the events a transaction wrote.
+
+    Workers patch the feed one at a time; when another worker holds the
+    lock the feed is dropped instead and rebuilt by the next read. The
+    dropping worker also marks the feed dirty, since the lock holder may
+    be about to write back a copy read before the drop: the holder checks
+    the mark before and after its write and drops its copy if it is set.
+    The patched feed keeps the expiry of the original, so it is still
+    fully rebuilt every UPCOMING_FEED_TTL seconds.
+    """
+    if not cache.add(FEED_LOCK_KEY, True, timeout=FEED_LOCK_TIMEOUT):
+        # Mark first: the holder deletes its copy if it sees the mark after
+        # writing, and otherwise the delete below runs after its write
+        cache.set(FEED_DIRTY_KEY, True, timeout=FEED_LOCK_TIMEOUT * 2)
+        cache.delete(FEED_KEY)
+        return
+    try:
+        feed = cache.get(FEED_KEY)
+        if feed is None:
+            return
+        ttl = current_app.config.get('UPCOMING_FEED_TTL', 60)
+        remaining = int(feed['built_at'] + ttl - time.time())
+        if remaining <= 0:
+            cache.delete(FEED_KEY)
+            return
+
+        rows = [row for row in feed['events'] if row['id'] not in changed and row['id'] not in deleted]
+        last = _sort_key(feed['events'][-1]) if feed['events'] else None
+        now = datetime.now()
+        for row in changed.values():
+            # An incomplete feed only covers events up to its last one
+            if row['date_time'] >= now and (feed['complete'] or _sort_key(row) <= last):
+                insort(rows, row, key=_sort_key)
+
+        size = current_app.config.get('UPCOMING_FEED_SIZE', 100)
+        complete = feed['complete'] and len(rows) <= size
+        if cache.get(FEED_DIRTY_KEY):
+            _drop_dirty_feed()
+            return
+        cache.set(FEED_KEY, dict(feed, events=rows[:size], complete=complete), timeout=remaining)
+        if cache.get(FEED_DIRTY_KEY):
+            _drop_dirty_feed()
+    finally:
+        cache.delete(FEED_LOCK_KEY)
+
+
+def add_seat_changes(session, event_ids):
+    """Mark the seats of events changed when the session commits.
+
+    For the seat counters that bookings update with Core statements. The
+    feed itself is left alone, so bookings never take FEED_LOCK_KEY.
+    """
+    session.info.setdefault('feed_seats', set()).update(event_ids)
+
+
+def _drop_dirty_feed():
+    cache.delete(FEED_KEY)
+    cache.delete(FEED_DIRTY_KEY)
+
+
+# Collect the events written in a transaction and patch the feed once it commits
+@event.listens_for(Session, 'after_flush')
+def _collect_feed_changes(session, flush_context):
+    for instance in session.new | session.dirty:
+        if isinstance(instance, Event):
+            session.info.setdefault('feed_changed', {})[instance.id] = _row(instance)
+    for instance in session.deleted:
+        if isinstance(instance, Event):
+            session.info.setdefault('feed_deleted', set()).add(instance.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _patch_feed(session):
+    changed = session.info.pop('feed_changed', {})
+    deleted = session.info.pop('feed_deleted', set())
+    seats = session.info.pop('feed_seats', set())
+    if not has_app_context():
+        return
+    if changed or deleted:
+        try:
+            apply_changes(changed, deleted)
+        except Exception:
+            logger.exception('Could not patch the upcoming events feed')
+    if seats:
+        ttl = current_app.config.get('UPCOMING_FEED_TTL', 60)
+        try:
+            cache.set_many({SEATS_CHANGED_PREFIX + event_id: True for event_id in seats}, timeout=ttl)
+        except Exception:
+            # Feeds built before the booking show the old seats until they expire
+            logger.exception('Could not mark the seats of events %s', sorted(seats))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_feed_changes(session):
+    session.info.pop('feed_changed', None)
+    session.info.pop('feed_deleted', None)
+    session.info.pop('feed_seats', None)
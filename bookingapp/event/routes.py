@@ -2,8 +2,17 @@
 from flask import Blueprint, request, jsonify
 from bookingapp.models.event import Event
 from bookingapp import db
+from bookingapp.auth.auth_utils import admin_required
+from bookingapp.caching.responses import cached_response
+from bookingapp.db_config.config import get_per_page
+from bookingapp.db_config.routing import read_only
+from bookingapp.errors.handlers import CustomError
+from bookingapp.event.feed import upcoming_page
+from bookingapp.event.search import search_events, autocomplete_event_names
+from bookingapp.mailer.rendering import notify_event_attendees
 from bookingapp.utils.uuid_validation import IdSchema
 from uuid import UUID
+from datetime import datetime
 
 # Create the event blueprint
 event_bp = Blueprint('event', __name__, url_prefix='/api/v1/event')
@@ -11,4 +20,92 @@ event_bp = Blueprint('event', __name__, url_prefix='/api/v1/event')
 # test
 @event_bp.route('/test', methods=['GET'])
 def test():
-    return jsonify({'message': 'Event Blueprint Working'}), 200
\ No newline at end of file
+    return jsonify({'message': 'Event Blueprint Working'}), 200
+
+def _datetime_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise CustomError('Bad Request', 400, f'{name} must be an ISO 8601 date or datetime')
+
+
+def _float_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise CustomError('Bad Request', 400, f'{name} must be a number')
+
+
+# Route to list upcoming events, soonest first
+# Accepts start, end, location, min_price and max_price filters. The
+# unfiltered listing (the landing page) is served from the cached feed.
+@event_bp.route('/upcoming', methods=['GET'])
+@read_only
+def get_upcoming_events():
+    filters = {
+        'start': _datetime_arg('start'),
+        'end': _datetime_arg('end'),
+        'location': request.args.get('location'),
+        'min_price': _float_arg('min_price'),
+        'max_price': _float_arg('max_price'),
+    }
+    cursor = request.args.get('cursor')
+    per_page = request.args.get('per_page')
+
+    page = None
+    if not any(value is not None for value in filters.values()):
+        page = upcoming_page(cursor, per_page)
+    if page is None:
+        page = Event.search(cursor=cursor, per_page=per_page, **filters)
+
+    return jsonify({
+        'data': page['items'],
+        'per_page': page['per_page'],
+        'next_cursor': page['next_cursor'],
+    }), 200
+
+# Route for ranked full-text search over event names, locations and descriptions
+@event_bp.route('/search', methods=['GET'])
+@read_only
+@cached_response(tags=['events'], timeout=60)
+def search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': 'q is required'}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+    except ValueError:
+        raise CustomError('Bad Request', 400, 'page must be an integer')
+    per_page = get_per_page(request.args.get('per_page'))
+
+    results = search_events(query, limit=per_page, offset=(page - 1) * per_page)
+    return jsonify({'data': results, 'page': page, 'per_page': per_page}), 200
+
+# Route suggesting event names while the user types
+@event_bp.route('/autocomplete', methods=['GET'])
+@read_only
+@cached_response(tags=['events'], timeout=60)
+def autocomplete():
+    query = request.args.get('q', '').strip()
+    return jsonify({'data': autocomplete_event_names(query) if query else []}), 200
+
+# Route to email every attendee of an event (e.g. rescheduled or cancelled)
+@event_bp.route('/<event_id>/notify', methods=['POST'])
+@admin_required
+def notify_attendees(user, event_id):
+    data = request.json or {}
+    if 'subject' not in data or 'message' not in data:
+        return jsonify({'message': 'subject and message are required'}), 400
+
+    event = db.session.get(Event, event_id)
+    if not event:
+        return jsonify({'message': 'Event not found'}), 404
+
+    queued = notify_event_attendees(event, data['subject'], data['message'])
+    return jsonify({'message': 'Attendees notified', 'emails_queued': queued}), 202
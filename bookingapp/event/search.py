@@ -0,0 +1,190 @@
+"""
+Ranked full-text search over events
+"""
+from bookingapp import db
+from bookingapp.models.event import Event
+import logging
+import re
+
+
+logger = logging.getLogger(__name__)
+
+# Words of a query; anything else (quotes, operators) is dropped
+TOKEN = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+SQLITE_TABLE = 'events_fts'
+
+# Relative weight of event_name, location and description matches
+WEIGHTS = (10.0, 5.0, 1.0)
+
+# SQLite: an external content FTS5 table over events, kept up to date by
+# triggers so that every insert, update and delete re-indexes one row
+SQLITE_DDL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5(
+        event_name, location, description,
+        content='events', content_rowid='rowid', tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO {SQLITE_TABLE}(rowid, event_name, location, description)
+        VALUES (new.rowid, new.event_name, new.location, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, event_name, location, description)
+        VALUES ('delete', old.rowid, old.event_name, old.location, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF event_name, location, description ON events BEGIN
+        INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}, rowid, event_name, location, description)
+        VALUES ('delete', old.rowid, old.event_name, old.location, old.description);
+        INSERT INTO {SQLITE_TABLE}(rowid, event_name, location, description)
+        VALUES (new.rowid, new.event_name, new.location, new.description);
+    END
+    """,
+)
+
+
+def _backend():
+    return db.engine.dialect.name
+
+
+def ensure_search_index():
+    """Create the SQLite search index of tables made by db.create_all().
+
+    On Postgres the index is a generated column added by the migrations
+    (flask db upgrade), not on boot. Without it or FTS5, search falls
+    back to LIKE scans.
+    """
+    if _backend() != 'sqlite':
+        return
+    try:
+        with db.engine.begin() as connection:
+            exists = connection.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': SQLITE_TABLE}).first()
+            if exists is None:
+                for statement in SQLITE_DDL:
+                    connection.execute(db.text(statement))
+                # Index the events written before the table existed
+                connection.execute(db.text(f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('rebuild')"))
+    except Exception:
+        logger.exception('Could not create the event search index, falling back to LIKE search')
+
+
+def _terms(query):
+    return TOKEN.findall(query.lower())[:MAX_TERMS]
+
+
+def _sqlite_match(terms, column=None):
+    # Every term must match; the last one also matches as a prefix
+    expression = ' '.join(f'"{term}"' for term in terms) + '*'
+    return f'{column} : ({expression})' if column else expression
+
+
+def _postgres_tsquery(terms, weight=''):
+    lexemes = [f'{term}:{weight}' if weight else term for term in terms[:-1]]
+    lexemes.append(f'{terms[-1]}:*{weight}')
+    return ' & '.join(lexemes)
+
+
+# Engines known to have the full-text index
+_indexed = set()
+
+
+def _fts_available():
+    url = str(db.engine.url)
+    if url in _indexed:
+        return True
+    backend = _backend()
+    if backend == 'postgresql':
+        # Added by migration b7a41c9e2d53; missing until it has run
+        stmt = db.text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'events' AND column_name = 'search_vector'")
+        found = db.session.execute(stmt).first()
+    elif backend == 'sqlite':
+        stmt = db.text("SELECT 1 FROM sqlite_master WHERE name = :name")
+        found = db.session.execute(stmt, {'name': SQLITE_TABLE}).first()
+    else:
+        return False
+    if found is None:
+        return False
+    _indexed.add(url)
+    return True
+
+
+def _ranked(terms, column=None):
+    """Return (statement, score) matching Event rows against the index.
+
+    The score is lower for better matches on both backends, so results
+    are ordered on it ascending.
+    """
+    if _backend() == 'postgresql':
+        vector = db.literal_column('events.search_vector')
+        tsquery = db.func.to_tsquery('english', _postgres_tsquery(terms, 'A' if column else ''))
+        score = -db.func.ts_rank_cd(vector, tsquery)
+        return db.select(Event).where(vector.op('@@')(tsquery)), score
+
+    index = db.table(SQLITE_TABLE, db.column('rowid'))
+    score = db.func.bm25(db.literal_column(SQLITE_TABLE), *WEIGHTS)
+    stmt = (
+        db.select(Event)
+        .join(index, index.c.rowid == db.literal_column('events.rowid'))
+        .where(db.literal_column(SQLITE_TABLE).op('MATCH')(_sqlite_match(terms, column)))
+    )
+    return stmt, score
+
+
+def _like(terms, columns):
+    """Fallback filter: every term appears in one of the columns"""
+    return db.and_(*[
+        db.or_(*[column.ilike(f'%{term}%') for column in columns]) for term in terms
+    ])
+
+
+def search_events(query, limit=10, offset=0):
+    """Return the events best matching a free text query.
+
+    Args:
+        query (str): Words to look for in the name, location and description.
+        limit, offset: The slice of ranked results to return.
+
+    Returns:
+        list: listing_columns dicts, best match first.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    columns = Event.listing_columns()
+    if _fts_available():
+        stmt, score = _ranked(terms)
+        stmt = stmt.with_only_columns(*columns).order_by(score, Event.date_time)
+    else:
+        stmt = (
+            db.select(*columns)
+            .where(_like(terms, (Event.event_name, Event.location, Event.description)))
+            .order_by(Event.date_time)
+        )
+    rows = db.session.execute(stmt.limit(limit).offset(offset)).mappings()
+    return [dict(row) for row in rows]
+
+
+def autocomplete_event_names(prefix, limit=10):
+    """Suggest event names for what a user has typed so far"""
+    terms = _terms(prefix)
+    if not terms:
+        return []
+    if _fts_available():
+        stmt, score = _ranked(terms, column='event_name')
+        stmt = stmt.with_only_columns(Event.event_name).order_by(score, Event.event_name)
+    else:
+        stmt = db.select(Event.event_name).where(_like(terms, (Event.event_name,))).order_by(Event.event_name)
+    # Several events can share a name; bm25() cannot be grouped on, so
+    # read a few extra rows and drop duplicates here
+    names = db.session.scalars(stmt.limit(limit * 5))
+    return list(dict.fromkeys(names))[:limit]
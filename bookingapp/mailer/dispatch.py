@@ -0,0 +1,195 @@
+"""
+Background delivery of outgoing emails
+"""
+from bookingapp import mail
+from bookingapp.metrics.registry import metrics
+from queue import Queue, Empty, Full
+from threading import Lock, Thread, Timer
+import atexit
+import logging
+import os
+import smtplib
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the SMTP connection can no longer be used
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+class MailDispatcher:
+    """Queue of messages delivered by a pool of worker threads.
+
+    Each worker takes up to MAIL_BATCH_SIZE queued messages and sends them
+    over one SMTP connection. Failed messages are retried with exponential
+    backoff, except for permanent (5xx) SMTP rejections. The queue holds
+    at most MAIL_QUEUE_SIZE jobs; when it is full, new messages are
+    dropped and logged rather than blocking the request thread, and
+    counted in bookingapp_mail_dropped_total. With MAIL_ASYNC disabled,
+    send() delivers inline as before.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = Queue()
+        self._threads = []
+        self._pid = None
+        self._lock = Lock()
+        self.dropped = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read the dispatcher settings from the app config"""
+        self.app = app
+        self.enabled = app.config.get('MAIL_ASYNC', True)
+        self.workers = app.config.get('MAIL_WORKERS', 2)
+        self.batch_size = app.config.get('MAIL_BATCH_SIZE', 20)
+        self.batch_wait = app.config.get('MAIL_BATCH_WAIT', 0.5)
+        self.max_retries = app.config.get('MAIL_MAX_RETRIES', 5)
+        self.retry_delay = app.config.get('MAIL_RETRY_DELAY', 2)
+        self._queue = Queue(app.config.get('MAIL_QUEUE_SIZE', 10000))
+        app.extensions['mail_dispatcher'] = self
+
+    def send(self, message):
+        """Queue a message for delivery, or send it now if not async"""
+        self.send_many([message])
+
+    def send_many(self, messages):
+        """Queue several messages, which workers will batch together"""
+        if not self.enabled:
+            with mail.connect() as connection:
+                for message in messages:
+                    connection.send(message)
+            return
+        self._ensure_started()
+        for message in messages:
+            self._enqueue(message, 1)
+
+    def send_bulk(self, messages):
+        """Queue messages that one worker sends together over one connection"""
+        if not self.enabled:
+            self.send_many(messages)
+            return
+        self._ensure_started()
+        messages = list(messages)
+        self._enqueue(messages, len(messages))
+
+    def _enqueue(self, job, count):
+        try:
+            self._queue.put_nowait((job, 0))
+        except Full:
+            self.dropped += count
+            metrics.inc('bookingapp_mail_dropped_total', value=count)
+            logger.error('Mail queue is full, dropped %d message(s)', count)
+
+    def pending(self):
+        """Number of messages waiting for a worker"""
+        return self._queue.qsize()
+
+    def flush(self, timeout=10):
+        """Wait until the queue is drained or the timeout expires"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._queue.unfinished_tasks == 0
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so every gunicorn worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = []
+            for index in range(self.workers):
+                thread = Thread(target=self._work, name=f'mail-dispatch-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+            atexit.register(self.flush)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            # Bulk jobs are a list of messages sharing the batch's connection
+            messages = []
+            for message, attempt in batch:
+                if isinstance(message, list):
+                    messages.extend((item, attempt) for item in message)
+                else:
+                    messages.append((message, attempt))
+            try:
+                with self.app.app_context():
+                    self._deliver(messages)
+            except Exception:
+                logger.exception('Mail worker failed on a batch of %d messages', len(messages))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        try:
+            connection = mail.connect()
+            connection.__enter__()
+        except CONNECTION_ERRORS as e:
+            logger.warning('Could not connect to the mail server: %s', e)
+            for message, attempt in batch:
+                self._retry(message, attempt)
+            return
+
+        try:
+            for index, (message, attempt) in enumerate(batch):
+                try:
+                    connection.send(message)
+                except smtplib.SMTPResponseException as e:
+                    if e.smtp_code >= 500:
+                        logger.error('Mail to %s rejected: %s', message.recipients, e)
+                    else:
+                        self._retry(message, attempt)
+                except CONNECTION_ERRORS as e:
+                    logger.warning('Mail connection lost: %s', e)
+                    for message, attempt in batch[index:]:
+                        self._retry(message, attempt)
+                    connection.host = None
+                    return
+                except Exception:
+                    logger.exception('Mail to %s could not be sent', message.recipients)
+        finally:
+            try:
+                connection.__exit__(None, None, None)
+            except CONNECTION_ERRORS:
+                pass
+
+    def _retry(self, message, attempt):
+        if attempt >= self.max_retries:
+            logger.error('Giving up on mail to %s after %d attempts', message.recipients, attempt + 1)
+            return
+        delay = self.retry_delay * 2 ** attempt
+        # The timer re-queues the message; unfinished_tasks counts it until then
+        with self._queue.mutex:
+            self._queue.unfinished_tasks += 1
+        timer = Timer(delay, self._requeue, args=(message, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, message, attempt):
+        self._queue.put((message, attempt))
+        self._queue.task_done()
+
+
+mail_dispatcher = MailDispatcher()
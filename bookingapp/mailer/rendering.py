@@ -0,0 +1,95 @@
+"""
+Email rendering from templates compiled once per process
+"""
+from flask_mail import Message
+from bookingapp import db
+from bookingapp.mailer.dispatch import mail_dispatcher
+from bookingapp.models.booking import Booking
+from bookingapp.models.user import User
+
+# Email templates compiled when the app starts
+EMAIL_TEMPLATES = ('email_otp.html', 'email_event_update.html')
+
+APP_NAME = "Booking App"
+SENDER = "noreply@app.com"
+REPLY_TO = "bookingapp@gmail.com"
+
+# Attendees fetched per round-trip when notifying an event
+ATTENDEE_CHUNK_SIZE = 500
+
+
+class MailRenderer:
+    """Keeps the compiled email templates of the app.
+
+    ``render_template`` looks templates up and fires Flask's template
+    signals on every call; emails only need the compiled template, so they
+    are compiled at startup and rendered directly.
+    """
+
+    def __init__(self, app=None):
+        self._templates = {}
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Compile every email template of the app"""
+        self.app = app
+        self._templates = {name: app.jinja_env.get_template(name) for name in EMAIL_TEMPLATES}
+
+    def render(self, name, **context):
+        """Render a compiled template with the given context"""
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.app.jinja_env.get_template(name)
+        return template.render(**context)
+
+    def message(self, subject, recipient, template, **context):
+        """Build a Message whose HTML body is the rendered template"""
+        msg = Message(subject, sender=SENDER, recipients=[recipient])
+        msg.body = ""
+        msg.reply_to = REPLY_TO
+        msg.html = self.render(template, **context)
+        return msg
+
+
+mail_renderer = MailRenderer()
+
+
+def notify_event_attendees(event, subject, body):
+    """Email everyone who booked an event, e.g. after a reschedule.
+
+    Attendees are read a chunk at a time with only the needed columns, and
+    every chunk is queued as a single bulk job that a mail worker sends over
+    one SMTP connection.
+
+    Returns:
+        int: The number of emails queued.
+    """
+    stmt = (
+        db.select(User.email, User.first_name, User.last_name)
+        .join(Booking, Booking.user_id == User.id)
+        .where(Booking.event_id == event.id, User.is_active.is_(True))
+        .distinct()
+        .execution_options(yield_per=ATTENDEE_CHUNK_SIZE)
+    )
+    data = {
+        'app_name': APP_NAME,
+        'title': subject,
+        'body': body,
+        'event_name': event.event_name,
+        'location': event.location,
+        'date_time': event.date_time,
+    }
+
+    queued = 0
+    for rows in db.session.execute(stmt).partitions():
+        messages = [
+            mail_renderer.message(
+                subject, email, 'email_event_update.html',
+                data=dict(data, name=f"{first_name} {last_name or ''}".strip()))
+            for email, first_name, last_name in rows
+        ]
+        mail_dispatcher.send_bulk(messages)
+        queued += len(messages)
+    return queued
@@ -0,0 +1,105 @@
+"""
+Per-request timing, SQL statement counts and cache hit rates
+"""
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from bookingapp.metrics.registry import metrics
+import time
+
+
+class RequestMetrics:
+    """Records the latency, SQL statements and payload sizes of requests.
+
+    Samples are labelled with the endpoint rather than the path, so
+    ``/api/v1/event/<event_id>`` is one series whatever the id. With
+    SERVER_TIMING enabled every response also carries a ``Server-Timing``
+    header with the time spent in the view and in SQL, which browser
+    devtools display next to the request.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Hook into the app's requests when METRICS_ENABLED or SERVER_TIMING is set"""
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        self.server_timing = app.config.get('SERVER_TIMING', True)
+        app.extensions['request_metrics'] = self
+        if self.enabled:
+            metrics.configure(app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 1.0))
+        if not (self.enabled or self.server_timing):
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.cache_lookups = []
+
+    def _finish(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        sql_count = g.pop('sql_count', 0)
+        sql_time = g.pop('sql_time', 0.0)
+
+        if self.enabled:
+            # Unmatched URLs share one series instead of one per scanned path
+            labels = (request.endpoint or 'unmatched', request.method)
+            metrics.inc('bookingapp_http_requests_total', labels + (response.status_code,))
+            metrics.observe('bookingapp_http_request_duration_seconds', elapsed, labels)
+            metrics.observe('bookingapp_db_queries_per_request', sql_count, labels)
+            metrics.observe('bookingapp_db_seconds_per_request', sql_time, labels)
+            if request.content_length:
+                metrics.observe('bookingapp_http_request_size_bytes', request.content_length, labels)
+            # Streamed responses have no length until they are sent
+            if response.content_length is not None:
+                metrics.observe('bookingapp_http_response_size_bytes', response.content_length, labels)
+
+        if self.server_timing:
+            timings = [f'app;dur={elapsed * 1000:.1f}',
+                       f'db;dur={sql_time * 1000:.1f};desc="{sql_count} queries"']
+            lookups = g.pop('cache_lookups', [])
+            if lookups:
+                timings.append(f'cache;desc="{" ".join(lookups)}"')
+            response.headers.add('Server-Timing', ', '.join(timings))
+
+        if self.enabled:
+            metrics.maybe_flush()
+        return response
+
+
+request_metrics = RequestMetrics()
+
+
+def record_cache(name, hit):
+    """Count a lookup in one of the app's caches, e.g. ``record_cache('user', True)``"""
+    result = 'hit' if hit else 'miss'
+    metrics.inc('bookingapp_cache_requests_total', (name, result))
+    if has_request_context() and 'cache_lookups' in g:
+        g.cache_lookups.append(f'{name}:{result}')
+
+
+# Time every statement on every engine (primary and replicas). The start
+# time lives on the execution context, so a failed statement leaves
+# nothing behind.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None or not has_request_context() or 'sql_count' not in g:
+        return
+    g.sql_count += 1
+    g.sql_time += time.perf_counter() - start
@@ -0,0 +1,275 @@
+"""
+Counters and histograms shared by the gunicorn workers
+"""
+from threading import Lock
+import atexit
+import glob
+import json
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers run a single process
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Every metric the app records: name -> (type, help, label names, buckets)
+METRICS = {
+    'bookingapp_http_requests_total': (
+        'counter', 'HTTP requests served', ('endpoint', 'method', 'status'), None),
+    'bookingapp_http_request_duration_seconds': (
+        'histogram', 'Time spent serving a request', ('endpoint', 'method'), LATENCY_BUCKETS),
+    'bookingapp_http_request_size_bytes': (
+        'histogram', 'Size of the request bodies', ('endpoint', 'method'), SIZE_BUCKETS),
+    'bookingapp_http_response_size_bytes': (
+        'histogram', 'Size of the response bodies', ('endpoint', 'method'), SIZE_BUCKETS),
+    'bookingapp_db_queries_per_request': (
+        'histogram', 'SQL statements executed by a request', ('endpoint', 'method'), QUERY_COUNT_BUCKETS),
+    'bookingapp_db_seconds_per_request': (
+        'histogram', 'Time a request spent in SQL statements', ('endpoint', 'method'), LATENCY_BUCKETS),
+    'bookingapp_cache_requests_total': (
+        'counter', 'Cache lookups by cache and result', ('cache', 'result'), None),
+    'bookingapp_log_records_dropped_total': (
+        'counter', 'Log records dropped because the log queue was full', (), None),
+}
+
+# File folding the metrics of the workers that exited
+ARCHIVE = 'archive.json'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Metrics of the current process, written to a file per process.
+
+    Each worker records into memory and writes a JSON snapshot of its
+    totals to METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds;
+    ``/metrics`` adds the snapshots of every worker up. Snapshots of
+    exited workers are folded into one archive so counters do not go
+    backwards when gunicorn recycles a worker. The directory is meant for
+    the workers of one host and is cleared when gunicorn starts.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.flush_interval = 1.0
+        self._lock = Lock()
+        self._registered = False
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._histograms = {}
+        self._flushed = 0.0
+        self._dirty = False
+
+    def _check_pid(self):
+        # Forked workers start from zero instead of the master's totals
+        if self._pid != os.getpid():
+            self._reset()
+
+    def configure(self, directory, flush_interval=1.0):
+        """Set where the per-process snapshots are written"""
+        self.directory = directory
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        if not self._registered:
+            atexit.register(self.flush)
+            self._registered = True
+
+    def inc(self, name, labels=(), value=1):
+        """Add ``value`` to a counter"""
+        key = (name, tuple(str(label) for label in labels))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, value, labels=()):
+        """Record one sample of a histogram"""
+        buckets = METRICS[name][3]
+        key = (name, tuple(str(label) for label in labels))
+        with self._lock:
+            self._check_pid()
+            entry = self._histograms.get(key)
+            if entry is None:
+                # One count per bucket plus +Inf, then the sum
+                entry = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            entry[0][index] += 1
+            entry[1] += value
+            self._dirty = True
+
+    def maybe_flush(self):
+        """Write the snapshot if the last one is older than the interval"""
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshot to the metrics directory"""
+        if self.directory is None:
+            return
+        # Written under the lock so an older snapshot never replaces a newer one
+        with self._lock:
+            self._check_pid()
+            self._flushed = time.monotonic()
+            if not self._dirty:
+                return
+            path = os.path.join(self.directory, f'{self._pid}.json')
+            try:
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'w') as file:
+                    json.dump(self._snapshot(), file)
+                os.replace(tmp_path, path)
+                self._dirty = False
+            except OSError:
+                logger.exception('Could not write the metrics snapshot %s', path)
+
+    def _snapshot(self):
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+            'histograms': [[name, list(labels), list(counts), total]
+                           for (name, labels), (counts, total) in self._histograms.items()],
+        }
+
+    def _merge(self, snapshot):
+        """Add a snapshot read from disk to this registry's totals"""
+        for name, labels, value in snapshot.get('counters', ()):
+            key = (name, tuple(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+        for name, labels, counts, total in snapshot.get('histograms', ()):
+            key = (name, tuple(labels))
+            entry = self._histograms.setdefault(key, [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+
+    def collect(self):
+        """Add up the snapshots of every worker, current and exited"""
+        self.flush()
+        totals = MetricsRegistry()
+        with self._directory_lock():
+            self._archive_exited()
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                snapshot = self._read(path)
+                if snapshot is not None:
+                    totals._merge(snapshot)
+        return totals._counters, totals._histograms
+
+    def _archive_exited(self):
+        """Fold the snapshots of exited workers into the archive"""
+        archive_path = os.path.join(self.directory, ARCHIVE)
+        exited = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            stem = os.path.basename(path)[:-len('.json')]
+            if stem.isdigit() and not _pid_alive(int(stem)):
+                exited.append(path)
+        if not exited:
+            return
+
+        archive = MetricsRegistry()
+        for path in [archive_path] + exited:
+            snapshot = self._read(path)
+            if snapshot is not None:
+                archive._merge(snapshot)
+        tmp_path = f'{archive_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(archive._snapshot(), file)
+        os.replace(tmp_path, archive_path)
+        for path in exited:
+            os.remove(path)
+
+    def _directory_lock(self):
+        return _FileLock(os.path.join(self.directory, '.lock'))
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning('Skipping unreadable metrics snapshot %s', path)
+            return None
+
+    def render(self):
+        """Return the metrics of every worker in the Prometheus text format"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text, label_names, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(label_names, labels)} {value}')
+                continue
+            for (metric, labels), (counts, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(label_names, labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(label_names, labels)} {total}')
+                lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+class _FileLock:
+    """Exclusive lock on a file, held across processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def reset_metrics_dir(directory):
+    """Remove the snapshots left by a previous run, e.g. in gunicorn's on_starting"""
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+metrics = MetricsRegistry()
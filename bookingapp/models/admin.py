@@ -2,7 +2,7 @@
 """Admin Entity model"""
 from bookingapp.models.base import BaseModel
 from bookingapp import db
-import bcrypt
+from bookingapp.auth.hashing import hash_admin_password, verify_admin_password, admin_needs_rehash
 
 
 class Admin(BaseModel):
@@ -76,13 +76,19 @@ class Admin(BaseModel):
     @password.setter
     def password(self, password):
         """Sets the hashed password"""
-        self._password = bcrypt.hashpw(
-            password.encode('utf-8'), bcrypt.gensalt())
+        self._password = hash_admin_password(password)
 
     def check_password(self, password):
-        """Verifies if the provided password matches the hashed password"""
-        return bcrypt.checkpw(
-            password.encode('utf-8'), self._password.encode('utf-8'))
+        """Verifies if the provided password matches the hashed password.
+
+        A matching password hashed with outdated BCRYPT_ROUNDS is rehashed;
+        the caller's next commit stores the new hash.
+        """
+        if not verify_admin_password(self._password, password):
+            return False
+        if admin_needs_rehash(self._password):
+            self.password = password
+        return True
 
     def format(self):
         """Format the Admin object's attributes as a dictionary"""
@@ -2,15 +2,61 @@
 Base template for the Event driven application
 """
 from bookingapp import db
+from bookingapp.caching.responses import add_cache_tags
+from contextlib import contextmanager
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.orm.util import identity_key
 from uuid import uuid4
 from datetime import datetime
 
 
+# Rows sent per statement by the bulk helpers
+BULK_CHUNK_SIZE = 500
+
+
 def get_uuid():
     """Generate a unique id using uuid4()"""
     return uuid4().hex
 
 
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@contextmanager
+def unit_of_work():
+    """Group writes into one transaction committed when the block exits.
+
+    Inside the block BaseModel.insert/update/delete and the bulk helpers
+    do not commit; the whole block is committed once at the end or rolled
+    back if it raises. Nested blocks join the outermost one.
+
+    Usage:
+        with unit_of_work():
+            Booking.bulk_insert(rows)
+            event.update()
+    """
+    info = db.session.info
+    info['uow_depth'] = info.get('uow_depth', 0) + 1
+    try:
+        yield db.session
+        if info['uow_depth'] == 1:
+            db.session.commit()
+    except Exception:
+        if info['uow_depth'] == 1:
+            db.session.rollback()
+        raise
+    finally:
+        info['uow_depth'] -= 1
+
+
+def commit():
+    """Commit the session, unless a unit_of_work will commit it later"""
+    if not db.session.info.get('uow_depth'):
+        db.session.commit()
+
+
 # Create a base model class that will contain common functionality
 class BaseModel(db.Model):
     """BaseClass for all models"""
@@ -34,17 +80,137 @@ class BaseModel(db.Model):
     def insert(self):
         """Insert the current object into the database"""
         db.session.add(self)
-        db.session.commit()
+        commit()
 
     def update(self):
         """Update the current object in the database"""
         self.updatedAt = datetime.now()
-        db.session.commit()
+        commit()
 
     def delete(self):
         """Delete the current object from the database"""
         db.session.delete(self)
-        db.session.commit()
+        commit()
+
+    @classmethod
+    def _row_tags(cls, rows):
+        """Collect the cache tags of rows given as column dicts"""
+        # Attributes of a bare instance only work once the mappers are set
+        # up, which a worker that has not queried anything yet has not done
+        configure_mappers()
+        tags = set()
+        for row in rows:
+            instance = cls.__mapper__.class_manager.new_instance()
+            for key, value in row.items():
+                setattr(instance, key, value)
+            tags.update(instance.cache_tags())
+        return tags
+
+    @classmethod
+    def _current_rows(cls, ids):
+        """Read the stored columns of some rows without loading objects"""
+        return db.session.execute(db.select(*cls.__table__.columns).where(cls.id.in_(ids))).mappings().all()
+
+    @classmethod
+    def bulk_insert(cls, rows, chunk_size=BULK_CHUNK_SIZE):
+        """Insert many rows with one multi-row INSERT per chunk and one commit.
+
+        Args:
+            rows (list): Column dicts; id, createdAt and updatedAt are
+                filled in when missing.
+            chunk_size (int): Rows per INSERT statement.
+
+        Returns:
+            list: The ids of the inserted rows.
+        """
+        now = datetime.now()
+        rows = [{'id': get_uuid(), 'createdAt': now, 'updatedAt': now, **row} for row in rows]
+        for chunk in _chunks(rows, chunk_size):
+            db.session.execute(db.insert(cls).values(chunk))
+        add_cache_tags(db.session, cls._row_tags(rows))
+        commit()
+        return [row['id'] for row in rows]
+
+    @classmethod
+    def bulk_update(cls, rows, chunk_size=BULK_CHUNK_SIZE):
+        """Update many rows by primary key with one executemany per chunk.
+
+        Args:
+            rows (list): Column dicts, each with the id of the row to
+                change; updatedAt is set to now.
+            chunk_size (int): Rows per statement.
+
+        Returns:
+            int: The number of rows given.
+        """
+        now = datetime.now()
+        rows = [{'updatedAt': now, **row} for row in rows]
+        tags = set()
+        for chunk in _chunks(rows, chunk_size):
+            ids = [row['id'] for row in chunk]
+            # Tags of the old values, e.g. the event a booking moves away from
+            tags.update(cls._row_tags(cls._current_rows(ids)))
+            db.session.execute(db.update(cls), chunk)
+            # Bulk updates by primary key leave loaded objects stale
+            for row_id in ids:
+                instance = db.session.identity_map.get(identity_key(cls, row_id))
+                if instance is not None:
+                    db.session.expire(instance)
+        add_cache_tags(db.session, tags | cls._row_tags(rows))
+        commit()
+        return len(rows)
+
+    @classmethod
+    def bulk_delete(cls, ids, chunk_size=BULK_CHUNK_SIZE):
+        """Delete many rows by id with one DELETE per chunk and one commit.
+
+        Returns:
+            int: The number of rows deleted.
+        """
+        ids = list(ids)
+        deleted = 0
+        tags = set()
+        for chunk in _chunks(ids, chunk_size):
+            tags.update(cls._row_tags(cls._current_rows(chunk)))
+            deleted += db.session.execute(db.delete(cls).where(cls.id.in_(chunk))).rowcount
+        add_cache_tags(db.session, tags)
+        commit()
+        return deleted
+
+    @classmethod
+    def loading_profiles(cls):
+        """Return the model's named sets of loader options.
+
+        Relationships are lazy, so a listing that touches one fires a
+        query per row. Subclasses name the relationships each kind of view
+        renders, loaded up front, and raise on any other lazy load; the
+        base profile only raises. sql_only lets relationships already in
+        the session through, as those cost no query.
+        """
+        return {
+            'list': (db.raiseload('*', sql_only=True),),
+        }
+
+    @classmethod
+    def loading(cls, profile):
+        """Return the loader options of a profile, for ``query.options(*...)``
+
+        Usage:
+            Booking.query.options(*Booking.loading('with_event')).all()
+        """
+        profiles = cls.loading_profiles()
+        if profile not in profiles:
+            raise ValueError(f"Unknown loading profile {profile!r} for {cls.__name__}. "
+                             f"Expected one of {sorted(profiles)}")
+        return profiles[profile]
+
+    def cache_tags(self):
+        """Return the response cache tags invalidated when this row changes.
+
+        Committing an insert, update or delete of the object invalidates
+        these tags (see bookingapp.caching.responses).
+        """
+        return [f"{self.__tablename__}:{self.id}"]
 
     def format(self):
         """Format the object's attributes as a dictionary"""
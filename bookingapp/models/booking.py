@@ -4,29 +4,188 @@ from bookingapp.models.base import BaseModel
 from bookingapp import db
 from bookingapp.models.user import User
 from bookingapp.models.event import Event
+from bookingapp.db_config.transactions import run_with_retry
+from bookingapp.errors.handlers import CustomError
+from bookingapp.models.base import unit_of_work, BULK_CHUNK_SIZE
 from datetime import datetime
 
 class Booking(BaseModel):
     '''Booking model class'''
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Bookings of an event in creation order (listings, exports)
+        db.Index('ix_bookings_event_id_createdAt', 'event_id', 'createdAt'),
+        # A user's bookings by date
+        db.Index('ix_bookings_user_id_booking_date', 'user_id', 'booking_date'),
+    )
 
     user_id = db.Column(db.String(255), db.ForeignKey('users.id'), nullable=False)
     event_id = db.Column(db.String(255), db.ForeignKey('events.id'), nullable=False)
     booking_date = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # Price paid, summed into the event's revenue
+    amount = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
     user = db.relationship('User', backref=db.backref('bookings', lazy=True))
     event = db.relationship('Event', backref=db.backref('bookings', lazy=True))
 
-    def __init__(self, user_id, event_id, booking_date):
+    def __init__(self, user_id, event_id, booking_date, amount=0):
         """Initialize the Booking object"""
         super().__init__()
         self.user_id = user_id
         self.event_id = event_id
         self.booking_date = booking_date
+        self.amount = amount
 
     def __repr__(self):
         """Return a string representation of the Booking object"""
-        return f"Booking ID: {self.id}, User: {self.user.username}, Event: {self.event.event_name}, Booking Date: {self.booking_date}"
+        # Ids only: loading the user and event here would query on every log line
+        return f"Booking ID: {self.id}, User: {self.user_id}, Event: {self.event_id}, Booking Date: {self.booking_date}"
+
+    @classmethod
+    def loading_profiles(cls):
+        """Bookings with their user and/or event, each fetched in the same query"""
+        raise_others = db.raiseload('*', sql_only=True)
+        return {
+            'list': (raise_others,),
+            'with_user': (db.joinedload(cls.user), raise_others),
+            'with_event': (db.joinedload(cls.event), raise_others),
+            'detail': (db.joinedload(cls.user), db.joinedload(cls.event), raise_others),
+        }
+
+    def cache_tags(self):
+        """Invalidate the booking, its event and its user"""
+        return [f"booking:{self.id}", f"event:{self.event_id}", f"user:{self.user_id}"]
+
+    @classmethod
+    def _unavailable(cls, event_id):
+        """The error for an event that could not give up its seats"""
+        if db.session.get(Event, event_id) is None:
+            return CustomError('Not Found', 404, 'Event not found')
+        return CustomError('Conflict', 409, 'Event is sold out')
+
+    @classmethod
+    def reserve(cls, user_id, event_id):
+        """Book a seat of an event for a user.
+
+        The booking is inserted with insert(), which takes its seat, and
+        the transaction is retried on write conflicts.
+
+        Raises:
+            CustomError: 404 if the event does not exist, 409 if it is sold out.
+        """
+        def attempt():
+            booking = cls(user_id, event_id, datetime.now())
+            booking.insert()
+            return booking
+
+        return run_with_retry(attempt)
+
+    @classmethod
+    def reserve_many(cls, user_id, items):
+        """Book seats of several events for a user in one transaction.
+
+        Seats are taken item by item, so one sold out event does not fail
+        the others, and all the bookings are then written with bulk_insert
+        and one commit. Events are updated in id order so that concurrent
+        group orders cannot deadlock on each other.
+
+        Args:
+            user_id (str): The user booking the seats.
+            items (list): (event_id, seats) pairs.
+
+        Returns:
+            list: One result dict per item, in the order of ``items``.
+        """
+        event_ids = {event_id for event_id, _ in items}
+
+        def attempt():
+            with unit_of_work():
+                existing = set(db.session.scalars(db.select(Event.id).where(Event.id.in_(event_ids))))
+                results = [None] * len(items)
+                rows, booked = [], []
+                now = datetime.now()
+                for index in sorted(range(len(items)), key=lambda i: items[i][0]):
+                    event_id, seats = items[index]
+                    price = Event.reserve_seats(event_id, seats) if event_id in existing else None
+                    if event_id not in existing:
+                        results[index] = {'event_id': event_id, 'status': 'not_found'}
+                    elif price is None:
+                        results[index] = {'event_id': event_id, 'status': 'sold_out'}
+                    else:
+                        rows.extend({'user_id': user_id, 'event_id': event_id, 'booking_date': now, 'amount': price}
+                                    for _ in range(seats))
+                        booked.append((index, seats))
+                        results[index] = {'event_id': event_id, 'status': 'booked'}
+                # Multi-row INSERTs, committed together with the seat updates;
+                # the seats are already taken, so the plain model insert is used
+                ids = super(Booking, cls).bulk_insert(rows) if rows else []
+                for index, seats in booked:
+                    results[index]['booking_ids'], ids = ids[:seats], ids[seats:]
+                return results
+
+        return run_with_retry(attempt)
+
+    def insert(self):
+        """Insert the booking and take its seat from the event.
+
+        The booking's amount is set to the price the event charged, which
+        is what delete() later takes off the revenue.
+
+        Raises:
+            CustomError: 404 if the event does not exist, 409 if it is sold out.
+        """
+        with unit_of_work():
+            price = Event.reserve_seats(self.event_id)
+            if price is None:
+                raise self._unavailable(self.event_id)
+            self.amount = price
+            super().insert()
+
+    @classmethod
+    def bulk_insert(cls, rows, chunk_size=BULK_CHUNK_SIZE):
+        """Insert many bookings and take their seats from their events.
+
+        All or nothing: if any event is missing or has too few seats left,
+        nothing is inserted. Use reserve_many to book what is available.
+
+        Raises:
+            CustomError: 404 if an event does not exist, 409 if one is sold out.
+        """
+        rows = [dict(row) for row in rows]
+        by_event = {}
+        for row in rows:
+            by_event.setdefault(row['event_id'], []).append(row)
+        with unit_of_work():
+            # In id order, like reserve_many, so concurrent inserts cannot deadlock
+            for event_id in sorted(by_event):
+                price = Event.reserve_seats(event_id, len(by_event[event_id]))
+                if price is None:
+                    raise cls._unavailable(event_id)
+                for row in by_event[event_id]:
+                    row['amount'] = price
+            return super().bulk_insert(rows, chunk_size)
+
+    def delete(self):
+        """Delete the booking and give its seat back to the event"""
+        with unit_of_work():
+            Event.release_seats(self.event_id, 1, self.amount or 0)
+            super().delete()
+
+    @classmethod
+    def bulk_delete(cls, ids, chunk_size=BULK_CHUNK_SIZE):
+        """Delete many bookings and give their seats back to their events"""
+        ids = list(ids)
+        with unit_of_work():
+            for start in range(0, len(ids), chunk_size):
+                stmt = (
+                    db.select(cls.event_id, db.func.count(), db.func.coalesce(db.func.sum(cls.amount), 0))
+                    .where(cls.id.in_(ids[start:start + chunk_size]))
+                    .group_by(cls.event_id)
+                    .order_by(cls.event_id)
+                )
+                for event_id, seats, amount in db.session.execute(stmt).all():
+                    Event.release_seats(event_id, seats, amount)
+            return super().bulk_delete(ids, chunk_size)
 
     def format(self):
         """Return a dictionary representation of the Booking object"""
@@ -34,5 +193,6 @@ class Booking(BaseModel):
             "id": self.id,
             "user_id": self.user_id,
             "event_id": self.event_id,
-            "booking_date": self.booking_date
+            "booking_date": self.booking_date,
+            "amount": self.amount
         }
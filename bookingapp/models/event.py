@@ -2,20 +2,37 @@
 """Event Entity Module"""
 from bookingapp.models.base import BaseModel
 from bookingapp import db
+from bookingapp.caching.responses import add_cache_tags
 from bookingapp.models.user import User
+from bookingapp.db_config.config import query_keyset
 from datetime import datetime
 
 
 class Event(BaseModel):
     '''Event model class'''
     __tablename__ = "events"
+    __table_args__ = (
+        # Upcoming / date range queries, with id as keyset tie-breaker
+        db.Index('ix_events_date_time_id', 'date_time', 'id'),
+        db.Index('ix_events_creator_id', 'creator_id'),
+        db.Index('ix_events_createdAt_id', 'createdAt', 'id'),
+        db.CheckConstraint('seats_remaining >= 0', name='ck_events_seats_remaining'),
+    )
 
     event_name = db.Column(db.String(100), nullable=False)
     location = db.Column(db.String(100), nullable=False)
     date_time = db.Column(db.DateTime, nullable=False)
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Float, nullable=True)
-    creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    creator_id = db.Column(db.String(255), db.ForeignKey('users.id'), nullable=False)
+    # Seats on sale; NULL means unlimited. seats_remaining is only changed
+    # through reserve_seats/release_seats so that it cannot oversell.
+    capacity = db.Column(db.Integer, nullable=True)
+    seats_remaining = db.Column(db.Integer, nullable=True)
+    # Maintained with the seats by reserve_seats/release_seats, repaired by
+    # `flask reconcile-event-counters`
+    bookings_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    revenue = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
 
     creator = db.relationship('User', backref=db.backref('created_events', lazy=True))
@@ -24,14 +41,33 @@ class Event(BaseModel):
 #         'User', secondary='event_attendees', backref=db.backref(
 #             'attended_events', lazy='dynamic'))
 
-    def __init__(self, event_name, location, date_time, description, admin_id):
+    def __init__(self, event_name, location, date_time, description, admin_id, capacity=None):
         """Initialize the Event object"""
         super().__init__()
         self.event_name = event_name
         self.location = location
         self.date_time = date_time
         self.description = description
-        self.admin_id = admin_id
+        self.creator_id = admin_id
+        self.capacity = capacity
+        self.seats_remaining = capacity
+        self.bookings_count = 0
+        self.revenue = 0
+
+    @classmethod
+    def loading_profiles(cls):
+        """Events with their creator (joined) or bookings (one extra IN query)"""
+        raise_others = db.raiseload('*', sql_only=True)
+        return {
+            'list': (raise_others,),
+            'with_creator': (db.joinedload(cls.creator), raise_others),
+            'with_bookings': (db.selectinload(cls.bookings), raise_others),
+            'detail': (db.joinedload(cls.creator), db.selectinload(cls.bookings), raise_others),
+        }
+
+    def cache_tags(self):
+        """Invalidate the event and the event listings"""
+        return [f"event:{self.id}", "events"]
 
     def format(self):
         """Return a dictionary representation of the Event object"""
@@ -41,9 +77,84 @@ class Event(BaseModel):
             "location": self.location,
             "date_time": self.date_time,
             "description": self.description,
-            "admin_id": self.admin_id
+            "admin_id": self.creator_id,
+            "capacity": self.capacity,
+            "seats_remaining": self.seats_remaining,
+            "bookings_count": self.bookings_count,
+            "revenue": round(self.revenue or 0, 2)
         }
 
+    @classmethod
+    def reserve_seats(cls, event_id, seats=1):
+        """Take seats from an event in the current transaction.
+
+        A single conditional UPDATE decrements the counter only if enough
+        seats are left, so concurrent bookings can never oversell: the
+        database serialises the updates of the row and re-checks the
+        condition for each one. Events without a capacity always succeed.
+        The same statement adds the seats to bookings_count and revenue.
+        Only the event's own cached responses and its seats in the
+        upcoming feed are refreshed when the transaction commits.
+
+        Returns:
+            float: The price paid per seat (0.0 for free events), or None
+            if the event is sold out or does not exist.
+        """
+        stmt = (
+            db.update(cls)
+            .where(cls.id == event_id)
+            .where(db.or_(cls.seats_remaining.is_(None), cls.seats_remaining >= seats))
+            .values(
+                seats_remaining=cls.seats_remaining - seats,
+                bookings_count=cls.bookings_count + seats,
+                revenue=cls.revenue + db.func.coalesce(cls.price, 0) * seats,
+            )
+            .returning(cls.price)
+            .execution_options(synchronize_session=False)
+        )
+        row = db.session.execute(stmt).mappings().first()
+        if row is None:
+            return None
+        cls._counters_written(event_id)
+        return row['price'] or 0.0
+
+    @classmethod
+    def release_seats(cls, event_id, seats=1, amount=0):
+        """Give seats back to an event in the current transaction.
+
+        Args:
+            seats (int): Bookings removed.
+            amount (float): What they were paid, taken off the revenue.
+        """
+        stmt = (
+            db.update(cls)
+            .where(cls.id == event_id)
+            .values(
+                seats_remaining=db.case(
+                    (cls.seats_remaining + seats > cls.capacity, cls.capacity),
+                    else_=cls.seats_remaining + seats),
+                bookings_count=cls.bookings_count - seats,
+                revenue=cls.revenue - amount,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.execute(stmt).rowcount:
+            cls._counters_written(event_id)
+
+    @classmethod
+    def _counters_written(cls, event_id):
+        """Refresh what shows the seats of an event updated with Core.
+
+        The ORM events that do it for flushed objects do not see UPDATE
+        statements. Bookings are frequent, so only the event's own tag and
+        its seats in the feed are refreshed: the global ``events`` tag
+        would drop every cached search, whose seat counts are allowed to
+        be a minute old instead.
+        """
+        from bookingapp.event.feed import add_seat_changes
+        add_cache_tags(db.session, [f"event:{event_id}"])
+        add_seat_changes(db.session, [event_id])
+
     @classmethod
     def get_events_by_user_id(cls, user_id):
         """Retrieve events associated with a specific user"""
@@ -51,10 +162,52 @@ class Event(BaseModel):
 
     @classmethod
     def get_upcoming_events(cls):
-        """Retrieve upcoming events"""
-        return cls.query.filter(
-            db.and_(cls.date >= datetime.today()
-                    .date(), cls.time >= datetime.now().time())).all()
+        """Retrieve upcoming events, soonest first"""
+        return (
+            cls.query.options(*cls.loading('list'))
+            .filter(cls.date_time >= datetime.now())
+            .order_by(cls.date_time, cls.id)
+            .all()
+        )
+
+    @classmethod
+    def listing_columns(cls):
+        """Columns selected by the event listings and the upcoming feed"""
+        return (
+            cls.id, cls.event_name, cls.location, cls.date_time, cls.price,
+            cls.capacity, cls.seats_remaining, cls.bookings_count
+        )
+
+    @classmethod
+    def search(cls, start=None, end=None, location=None, min_price=None, max_price=None,
+               cursor=None, per_page=None):
+        """Page through events in a date range, soonest first.
+
+        Rows are walked in (date_time, id) order with keyset pagination,
+        which the ix_events_date_time_id index serves directly.
+
+        Args:
+            start: Earliest date_time, now by default (upcoming events).
+            end: Exclusive upper bound of date_time.
+            location: Exact location, compared case-insensitively.
+            min_price, max_price: Inclusive price bounds.
+            cursor, per_page: As for query_keyset.
+
+        Returns:
+            dict: A query_keyset page of listing_columns dicts.
+        """
+        filters = [cls.date_time >= (start or datetime.now())]
+        if end is not None:
+            filters.append(cls.date_time < end)
+        if location:
+            filters.append(db.func.lower(cls.location) == location.lower())
+        if min_price is not None:
+            filters.append(cls.price >= min_price)
+        if max_price is not None:
+            filters.append(cls.price <= max_price)
+        return query_keyset(
+            cls, cursor=cursor, per_page=per_page, keys=(cls.date_time, cls.id), descending=False,
+            columns=cls.listing_columns(), filters=filters)
 
     @classmethod
     def get_event_details(cls, event_id):
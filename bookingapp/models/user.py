@@ -2,6 +2,7 @@
 """User Entity Module"""
 from bookingapp.models.base import BaseModel
 from bookingapp import db
+from datetime import timedelta
 
 
 class User(BaseModel):
@@ -9,6 +10,10 @@ class User(BaseModel):
 
     # Use the default behavior for the table name
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset order of the admin listings
+        db.Index('ix_users_createdAt_id', 'createdAt', 'id'),
+    )
 
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=True)
@@ -21,6 +26,9 @@ class User(BaseModel):
     is_admin = db.Column(db.Boolean, nullable=False, default=False)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
 
+    # How long an OTP stays valid after it is issued
+    OTP_VALIDITY = timedelta(minutes=10)
+
 
     def __init__(self, first_name, last_name, email, password, avatar='deault.jpg', is_verified=False, is_admin=False, is_active=True):
         """Initialize the User object"""
@@ -40,9 +48,39 @@ class User(BaseModel):
     def __repr__(self):
         """Return a string representation of the User object"""
         return (
-            f"Name: {self.name}, Email: {self.email}"
+            f"Name: {self.first_name} {self.last_name or ''}, Email: {self.email}"
             )
 
+    @classmethod
+    def loading_profiles(cls):
+        """Users with their bookings or created events, each in one extra IN query"""
+        raise_others = db.raiseload('*', sql_only=True)
+        return {
+            'list': (raise_others,),
+            'with_bookings': (db.selectinload(cls.bookings), raise_others),
+            'with_events': (db.selectinload(cls.created_events), raise_others),
+        }
+
+    @property
+    def otp_expiry(self):
+        """Returns when the current OTP expires"""
+        if self.otp_created_at is None:
+            return None
+        return self.otp_created_at + self.OTP_VALIDITY
+
+    @classmethod
+    def listing_columns(cls):
+        """Columns selected by the admin listings, matching format() plus id"""
+        return (
+            cls.id, cls.first_name, cls.last_name, cls.email, cls.avatar,
+            cls.is_verified, cls.is_admin, cls.is_active, cls.createdAt,
+            cls.updatedAt
+        )
+
+    def cache_tags(self):
+        """Invalidate the user and the user listings"""
+        return [f"user:{self.id}", "users"]
+
     # Override the format method to return user attributes as a dictionary
     def format(self):
         """Return a dictionary representation of the User object"""
@@ -0,0 +1,87 @@
+"""
+Swagger spec loading and API docs mounted on first use
+"""
+from flask import Blueprint, Response, current_app, request
+from threading import Lock
+import json
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# URLs served by flasgger with its default configuration
+DOCS_ROUTES = ('/apidocs/', '/apidocs/index.html', '/apispec_1.json', '/oauth2-redirect.html',
+               '/flasgger_static/<path:filename>')
+
+
+def load_swagger_template(path, cache_path=None):
+    """Load the Swagger template, through a JSON copy of the YAML file.
+
+    The JSON copy is rewritten whenever the YAML file changes, so workers
+    normally skip YAML parsing (and importing yaml) altogether.
+    """
+    if cache_path:
+        try:
+            if os.path.getmtime(cache_path) >= os.path.getmtime(path):
+                with open(cache_path, 'r') as file:
+                    return json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    import yaml
+    with open(path, 'r') as file:
+        template = yaml.safe_load(file)
+
+    if cache_path:
+        try:
+            tmp_path = f'{cache_path}.{os.getpid()}'
+            with open(tmp_path, 'w') as file:
+                json.dump(template, file, default=str)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            logger.warning('Could not write the Swagger template cache %s', cache_path)
+    return template
+
+
+def register_docs(app, template_path):
+    """Serve flasgger's API docs right away (the default startup mode)"""
+    from flasgger import Swagger
+    Swagger(app, template=load_swagger_template(template_path, app.config.get('SWAGGER_CACHE')))
+
+
+def register_lazy_docs(app, template_path):
+    """Serve the API docs without importing flasgger at startup.
+
+    Importing flasgger takes a good part of create_app, for pages that
+    are rarely requested in production. The docs URLs are answered by a
+    small Flask app built on the first docs request: it holds flasgger and
+    a copy of this app's routes, which flasgger reads to build the spec.
+    """
+    state = {'app': None}
+    lock = Lock()
+
+    def docs_app():
+        with lock:
+            if state['app'] is None:
+                from flask import Flask
+                from flasgger import Swagger
+
+                docs = Flask(app.import_name)
+                docs.config.update(app.config)
+                Swagger(docs, template=load_swagger_template(template_path, app.config.get('SWAGGER_CACHE')))
+                for rule in current_app.url_map.iter_rules():
+                    if rule.endpoint == 'static' or rule.endpoint.startswith('docs.'):
+                        continue
+                    docs.add_url_rule(rule.rule, endpoint=rule.endpoint, methods=rule.methods,
+                                      view_func=current_app.view_functions[rule.endpoint])
+                state['app'] = docs
+        return state['app']
+
+    def serve(**kwargs):
+        return Response.from_app(docs_app().wsgi_app, request.environ)
+
+    blueprint = Blueprint('docs', __name__)
+    for index, route in enumerate(DOCS_ROUTES):
+        blueprint.add_url_rule(route, f'docs_{index}', serve)
+    app.register_blueprint(blueprint)
@@ -0,0 +1,310 @@
+"""
+Application logging: JSON records, a background writer, rotation and request ids
+"""
+from flask import Config, g, has_request_context, request
+from flask.logging import default_handler
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from uuid import uuid4
+from bookingapp.metrics.registry import metrics
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers run a single process
+    fcntl = None
+
+
+# Attributes every LogRecord has; anything else was passed with extra=
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+TEXT_FORMAT = '[%(asctime)s] [%(process)d] [%(levelname)s] [%(request_id)s] %(name)s: %(message)s'
+
+# Incoming X-Request-ID values kept as they are (e.g. from the load balancer)
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, starting with an ISO 8601 UTC timestamp"""
+
+    def format(self, record):
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES:
+                payload[name] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc_info'] = record.exc_text
+        if record.stack_info:
+            payload['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(payload, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """TEXT_FORMAT lines stamped in UTC with an explicit +0000.
+
+    Local times without an offset would shift the /logs time windows on
+    hosts that do not run in UTC.
+    """
+
+    converter = time.gmtime
+    default_msec_format = '%s,%03d +0000'
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the id of the request being served, or '-'"""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+
+class _InterProcessRollover:
+    """Rotation that is safe with several gunicorn workers on one file.
+
+    Writes and rollovers happen under an exclusive lock on ``<file>.lock``,
+    and a worker whose file was rotated by another one reopens the new
+    file instead of rotating it again. The lock file stays open for the
+    life of the handler.
+    """
+
+    _lock_file = None
+    _lock_pid = None
+
+    def _lock(self):
+        # flock() locks are per open file, which a forked worker would
+        # share with its parent, so each process opens its own
+        if self._lock_pid != os.getpid():
+            self._lock_file = open(f'{self.baseFilename}.lock', 'a')
+            self._lock_pid = os.getpid()
+        return self._lock_file
+
+    def emit(self, record):
+        if fcntl is None:
+            return super().emit(record)
+        lock = self._lock()
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if self._rotated_elsewhere():
+                self._reopen()
+            super().emit(record)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._lock_file is not None and self._lock_pid == os.getpid():
+            self._lock_file.close()
+        self._lock_file = self._lock_pid = None
+        super().close()
+
+    def _rotated_elsewhere(self):
+        if self.stream is None:
+            return False
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _reopen(self):
+        self.stream.close()
+        self.stream = self._open()
+
+
+class ProcessSafeRotatingFileHandler(_InterProcessRollover, RotatingFileHandler):
+    """Rotates the log file at LOG_MAX_BYTES"""
+
+
+class ProcessSafeTimedRotatingFileHandler(_InterProcessRollover, TimedRotatingFileHandler):
+    """Rotates the log file on a schedule (LOG_ROTATE_WHEN)"""
+
+    def _reopen(self):
+        super()._reopen()
+        # The other worker rotated, so the next rollover is one period away
+        self.rolloverAt = self.computeRollover(int(datetime.now().timestamp()))
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Hands records to a listener thread that does the formatting and I/O.
+
+    The listener is started lazily in each process, since threads do not
+    survive gunicorn forking its workers. When the queue is full, records
+    are dropped rather than blocking the request thread; they are counted
+    in bookingapp_log_records_dropped_total and reported on stop().
+    """
+
+    def __init__(self, handlers, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        self.acquire()
+        try:
+            if self._pid == os.getpid():
+                return
+            # The parent's queue may hold records its listener still owns
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+        finally:
+            self.release()
+
+    def prepare(self, record):
+        # Keep the message and traceback as separate fields for JsonFormatter
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc('bookingapp_log_records_dropped_total')
+
+    def stop(self):
+        """Write out the queued records and stop the listener"""
+        if self.listener is None or self._pid != os.getpid():
+            return
+        self.listener.stop()
+        self.listener = None
+        self._pid = None
+        if self.dropped:
+            # The listener is gone, so this one goes straight to the handlers
+            record = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING', 'request_id': '-',
+                'msg': 'Dropped %d log records because the log queue was full', 'args': (self.dropped,)})
+            for handler in self.handlers:
+                handler.handle(record)
+            self.dropped = 0
+
+
+_handler = None
+
+
+def _file_handler(config, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if config.get('LOG_ROTATE_WHEN'):
+        return ProcessSafeTimedRotatingFileHandler(
+            path, when=config['LOG_ROTATE_WHEN'], backupCount=config['LOG_BACKUP_COUNT'], utc=True, delay=True)
+    return ProcessSafeRotatingFileHandler(
+        path, maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+
+
+def configure_logging(app):
+    """Send the app's logs through a background queue to LOG_FILE and stderr.
+
+    Request threads only put records on a queue; a listener thread per
+    process formats them (JSON or text, see LOG_FORMAT) and writes them.
+    """
+    global _handler
+    formatter = JsonFormatter() if app.config['LOG_FORMAT'] == 'json' else TextFormatter()
+    handlers = []
+    if app.config.get('LOG_FILE'):
+        handlers.append(_file_handler(app.config, app.config['LOG_FILE']))
+    if app.config.get('LOG_TO_STDERR', True):
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    # create_app may run more than once in a process (scripts, benchmarks)
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _handler.stop()
+    _handler = BackgroundQueueHandler(handlers, app.config.get('LOG_QUEUE_SIZE', 10000))
+    _handler.addFilter(RequestIdFilter())
+    root.addHandler(_handler)
+    root.setLevel(app.config['LOG_LEVEL'])
+    # Records reach the root handler; Flask's own would print them twice
+    app.logger.removeHandler(default_handler)
+
+    app.before_request(_assign_request_id)
+    app.after_request(_send_request_id)
+
+
+def gunicorn_logconfig_dict(config_object, loglevel='info'):
+    """gunicorn's logconfig_dict: its access and error logs, rotated like LOG_FILE.
+
+    gunicorn's own file handlers never rotate, and renaming their files
+    from outside leaves every worker writing to the old file. These go to
+    ACCESS_LOG_PATH and ERROR_LOG_PATH (the files /logs serves) and rotate
+    at LOG_MAX_BYTES or on LOG_ROTATE_WHEN, safely across the workers.
+    With LOG_TO_STDERR they are also printed, as gunicorn does by default.
+
+    Args:
+        config_object: The app's config class, e.g. bookingapp.config.Config.
+        loglevel (str): gunicorn's loglevel setting, for its error log.
+    """
+    config = Config('.')
+    config.from_object(config_object)
+    console = ['access_console', 'error_console'] if config.get('LOG_TO_STDERR', True) else []
+    handlers = {
+        'access_file': {'()': _file_handler, 'config': config, 'path': config['ACCESS_LOG_PATH'],
+                        'formatter': 'access'},
+        'error_file': {'()': _file_handler, 'config': config, 'path': config['ERROR_LOG_PATH'],
+                       'formatter': 'error'},
+        'access_console': {'class': 'logging.StreamHandler', 'formatter': 'access', 'stream': 'ext://sys.stdout'},
+        'error_console': {'class': 'logging.StreamHandler', 'formatter': 'error', 'stream': 'ext://sys.stderr'},
+    }
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        # The app adds its own root handler when it is loaded
+        'root': {'level': config['LOG_LEVEL'], 'handlers': []},
+        'loggers': {
+            'gunicorn.access': {'level': 'INFO', 'propagate': False,
+                                'handlers': ['access_file'] + console[:1]},
+            'gunicorn.error': {'level': loglevel.upper(), 'propagate': False,
+                               'handlers': ['error_file'] + console[1:]},
+        },
+        'handlers': handlers,
+        'formatters': {
+            # gunicorn formats access lines itself (access_log_format)
+            'access': {'format': '%(message)s'},
+            'error': {'format': '%(asctime)s [%(process)d] [%(levelname)s] %(message)s',
+                      'datefmt': '[%Y-%m-%d %H:%M:%S %z]'},
+        },
+    }
+
+
+def _assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid4().hex
+
+
+def _send_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
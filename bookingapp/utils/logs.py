@@ -0,0 +1,174 @@
+"""
+Streaming reads of the log files: tails, time windows and gzip
+"""
+from datetime import datetime, timezone
+import os
+import re
+import zlib
+
+
+# Bytes read from disk and sent per chunk
+CHUNK_SIZE = 64 * 1024
+
+# Only the start of a line is searched, so dates inside messages are ignored
+TIMESTAMP_PREFIX = 120
+
+# gunicorn access log: [18/Oct/2026:11:12:25 +0000]
+ACCESS_TIMESTAMP = re.compile(rb'\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4})\]')
+# gunicorn error log, logging's asctime and JSON records: 2026-10-18 11:12:25,123 +0000
+ISO_TIMESTAMP = re.compile(
+    rb'(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:[.,]\d+)?\s?(Z|[+-]\d{2}:?\d{2})?')
+
+
+def naive_utc(value):
+    # Aware times are compared in UTC; naive ones are taken to be UTC
+    # already, as every log line carries an offset and /logs arguments
+    # without one are UTC
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_timestamp(line):
+    """Return the time a log line starts with, or None for e.g. traceback lines"""
+    head = line[:TIMESTAMP_PREFIX]
+    match = ACCESS_TIMESTAMP.search(head)
+    try:
+        if match:
+            return naive_utc(datetime.strptime(match.group(1).decode(), '%d/%b/%Y:%H:%M:%S %z'))
+        match = ISO_TIMESTAMP.search(head)
+        if match:
+            date, time, offset = (part.decode() if part else '' for part in match.groups())
+            offset = '+00:00' if offset == 'Z' else offset
+            return naive_utc(datetime.fromisoformat(f'{date}T{time}{offset}'))
+    except ValueError:
+        return None
+    return None
+
+
+def tail_offset(file, lines, chunk_size=CHUNK_SIZE):
+    """Return the offset where the last ``lines`` lines of a binary file start.
+
+    Reads blocks backwards from the end, so the cost depends on the lines
+    asked for and not on the size of the file.
+    """
+    end = file.seek(0, os.SEEK_END)
+    if lines <= 0:
+        return end
+    position = end
+    # A final newline ends the last line rather than starting a new one
+    if end:
+        file.seek(end - 1)
+        if file.read(1) == b'\n':
+            position -= 1
+    found = 0
+    while position > 0:
+        start = max(0, position - chunk_size)
+        file.seek(start)
+        block = file.read(position - start)
+        index = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index == -1:
+                break
+            found += 1
+            if found == lines:
+                return start + index + 1
+        position = start
+    return 0
+
+
+def _timestamp_after(file, offset, limit=CHUNK_SIZE):
+    """Return the timestamp of the first timestamped line starting after offset"""
+    file.seek(offset)
+    if offset:
+        file.readline()
+    read = 0
+    while read < limit:
+        line = file.readline()
+        if not line:
+            return None
+        read += len(line)
+        timestamp = parse_timestamp(line)
+        if timestamp is not None:
+            return timestamp
+    return None
+
+
+def time_offset(file, since, start=0, end=None, chunk_size=CHUNK_SIZE):
+    """Return an offset at or before the first line logged at ``since`` or later.
+
+    Log files are written in time order, so the offset is found by binary
+    search over the file instead of reading it from the start.
+    """
+    low = start
+    high = file.seek(0, os.SEEK_END) if end is None else end
+    while high - low > chunk_size:
+        middle = (low + high) // 2
+        timestamp = _timestamp_after(file, middle)
+        if timestamp is None or timestamp >= since:
+            high = middle
+        else:
+            low = middle
+    if low == start:
+        return start
+    # Start on the line after ``low``, which was logged before ``since``
+    file.seek(low)
+    file.readline()
+    return file.tell()
+
+
+def read_chunks(path, start=0, end=None, since=None, until=None, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of a log file from ``start`` in chunks.
+
+    With ``since``/``until`` only the lines logged in that window are
+    kept; lines without a timestamp (tracebacks) go with the line above.
+    Reading stops at the first line logged after ``until``.
+    """
+    with open(path, 'rb') as file:
+        end = file.seek(0, os.SEEK_END) if end is None else end
+        if since is not None:
+            start = time_offset(file, since, start, end, chunk_size)
+        file.seek(start)
+        position = start
+
+        if since is None and until is None:
+            while position < end:
+                chunk = file.read(min(chunk_size, end - position))
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+            return
+
+        buffer = []
+        buffered = 0
+        timestamp = None
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            timestamp = parse_timestamp(line) or timestamp
+            if timestamp is not None:
+                if until is not None and timestamp > until:
+                    break
+                if since is not None and timestamp < since:
+                    continue
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= chunk_size:
+                yield b''.join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of chunks into one gzip stream as it is sent"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,11 +1,19 @@
-from flask import Blueprint, jsonify, send_file, request, url_for, send_from_directory, current_app
+from flask import Blueprint, Response, jsonify, send_file, request, url_for, send_from_directory, current_app
 from werkzeug.utils import secure_filename
-from bookingapp.auth.auth_utils import login_required
+from bookingapp.auth.auth_utils import login_required, admin_required
+from bookingapp.db_config.pool import pool_stats
+from bookingapp.errors.handlers import CustomError
+from bookingapp.metrics.registry import metrics
+from bookingapp.utils.logs import read_chunks, tail_offset, gzip_chunks, naive_utc
+from bookingapp.db_config.routing import read_only
+from bookingapp.auth.user_cache import invalidate_user
+import hmac
+import ipaddress
 import os
 from bookingapp import db
 from dotenv import load_dotenv
-import cloudinary.uploader
 from bookingapp.models.user import User
+from datetime import datetime
 
 
 load_dotenv(".env")
@@ -13,37 +21,120 @@ load_dotenv(".env")
 
 util_bp = Blueprint('util', __name__)
 
+def _datetime_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return naive_utc(datetime.fromisoformat(value))
+    except ValueError:
+        raise CustomError('Bad Request', 400, f'{name} must be an ISO 8601 date or datetime')
+
+
+# Route to download the logs, streamed in chunks however large they are
+# file: access, error, app (LOG_FILE) or all (default, the access and
+# error logs one after the other)
+# tail: keep the last N lines of each file, read backwards from the end
+# since/until: keep the lines logged in that window (ISO 8601, UTC unless
+# an offset is given)
+# gzip=true downloads a .gz file; Accept-Encoding: gzip compresses the
+# response on the fly. A single unfiltered file also answers Range requests.
 @util_bp.route('/logs')
 def get_logs():
-    try:
-        access_log_path = 'access_log.log'
-        error_log_path = 'error_log.log'
-
-        access_content = ''
-        error_content = ''
-
-        with open(access_log_path, 'r') as access_file:
-            access_content = access_file.read()
-
-        with open(error_log_path, 'r') as error_file:
-            error_content = error_file.read()
-
-        combined_content = f'Access Log:\n\n{access_content}\n\nError Log:\n\n{error_content}'
-
-        return combined_content, 200, {'Content-Type': 'text/plain', 'Content-Disposition': 'attachment; filename=combined_logs.txt'}
-    except FileNotFoundError:
+    log_files = {
+        'access': ('Access Log', current_app.config['ACCESS_LOG_PATH']),
+        'error': ('Error Log', current_app.config['ERROR_LOG_PATH']),
+        'app': ('App Log', current_app.config['LOG_FILE']),
+    }
+    selected = request.args.get('file', 'all')
+    if selected != 'all' and selected not in log_files:
+        raise CustomError('Bad Request', 400, 'file must be access, error, app or all')
+    names = ['access', 'error'] if selected == 'all' else [selected]
+    tail = request.args.get('tail')
+    if tail is not None and (not tail.isdigit() or int(tail) <= 0):
+        raise CustomError('Bad Request', 400, 'tail must be a positive number of lines')
+    since, until = _datetime_arg('since'), _datetime_arg('until')
+    as_gzip_file = request.args.get('gzip', 'false').lower() == 'true'
+    chunk_size = current_app.config['LOG_CHUNK_SIZE']
+
+    if not all(os.path.isfile(log_files[name][1]) for name in names):
         return "Log files not found", 404
-    except Exception as e:
-        return str(e), 500
+
+    filename = 'combined_logs.txt' if selected == 'all' else f'{selected}_log.txt'
+    if len(names) == 1 and tail is None and since is None and until is None and not as_gzip_file:
+        # Werkzeug streams the file and handles Range/If-Range itself
+        return send_file(os.path.abspath(log_files[selected][1]), mimetype='text/plain',
+                         as_attachment=True, download_name=filename, conditional=True, etag=False)
+
+    # Offsets are taken now, so lines appended while streaming are left out
+    sections = []
+    for name in names:
+        title, path = log_files[name]
+        with open(path, 'rb') as file:
+            end = file.seek(0, os.SEEK_END)
+            start = tail_offset(file, int(tail), chunk_size) if tail is not None else 0
+        sections.append((title, path, start, end))
+
+    def generate():
+        for index, (title, path, start, end) in enumerate(sections):
+            if len(sections) > 1:
+                # Same layout as the original combined download
+                yield (b'' if index == 0 else b'\n\n') + f'{title}:\n\n'.encode()
+            yield from read_chunks(path, start, end, since, until, chunk_size)
+
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    body = generate()
+    if as_gzip_file:
+        headers['Content-Disposition'] = f'attachment; filename={filename}.gz'
+        return Response(gzip_chunks(body), mimetype='application/gzip', headers=headers)
+    if request.accept_encodings['gzip']:
+        headers.update({'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+        body = gzip_chunks(body)
+    return Response(body, mimetype='text/plain', headers=headers)
 
 # Route for cron job
 @util_bp.route('/cron', methods=['GET'])
+@read_only
 def cron_job():
     # Query the first user
     user = User.query.first()
     response = {'message': 'Everything is working fine', 'data': user.format()}
     return jsonify(response)
 
+def _metrics_enabled():
+    if not current_app.config.get('METRICS_ENABLED'):
+        raise CustomError('Not Found', 404, 'Metrics are disabled')
+
+
+def _metrics_allowed():
+    """True when the request has METRICS_TOKEN or comes from METRICS_ALLOWED_IPS"""
+    token = current_app.config.get('METRICS_TOKEN')
+    allowed_ips = current_app.config.get('METRICS_ALLOWED_IPS', [])
+    if not token and not allowed_ips:
+        return True
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in allowed_ips)
+
+# Route for connection pool metrics of the worker serving the request
+@util_bp.route('/metrics/pool', methods=['GET'])
+@admin_required
+def get_pool_metrics(user):
+    _metrics_enabled()
+    return jsonify({'pid': os.getpid(), 'pools': pool_stats()}), 200
+
+# Route for Prometheus, with the metrics of every worker added up
+@util_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    _metrics_enabled()
+    if not _metrics_allowed():
+        raise CustomError('Unauthorized', 401, 'A metrics token or an allowed address is required')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @util_bp.route("/upload", methods=["PATCH"])
 @login_required
 def upload_profile(user):
@@ -66,10 +157,12 @@ def upload_profile(user):
         return jsonify({"error": "File Too Large", "message": f"Maximum file size is {max_file_size_kb} KB"}), 413
 
     try:
-        current_app.logger.info('in upload route')
+        # Imported here so that workers do not load cloudinary at startup
+        import cloudinary.uploader
         cloudinary.config(cloud_name=os.getenv('CLOUD_NAME'), api_key=os.getenv('API_KEY'), api_secret=os.getenv('API_SECRET'))
         upload_result = cloudinary.uploader.upload(file_to_upload)
-        current_app.logger.info(upload_result)
+        current_app.logger.info('Uploaded profile picture for user %s', user.id,
+                                extra={'public_id': upload_result.get('public_id')})
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -77,5 +170,6 @@ def upload_profile(user):
 
     user.avarar = picture_url
     db.session.commit()
+    invalidate_user(user.id)
 
     return jsonify({"picture_url": picture_url, "message": "Profile picture uploaded and stored successfully"}), 200
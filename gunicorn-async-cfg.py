@@ -0,0 +1,71 @@
+# High concurrency profile for I/O bound traffic (DB, SMTP, Cloudinary):
+#   gunicorn --config gunicorn-async-cfg.py run:app
+# gunicorn-cfg.py keeps the original sync profile.
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5005")
+
+# gthread (built in) or gevent (pip install gevent psycogreen)
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# Threads/greenlets do the waiting, so one process per core is enough
+workers = int(os.getenv("GUNICORN_WORKERS", max(2, multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", 8))  # gthread only
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))  # gevent only
+
+# Keep client connections open between requests behind the load balancer
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+# Load the app once in the master so workers share its memory pages
+preload_app = True
+
+accesslog = "-"
+# Default access log line plus the request id the app sent back and the duration
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %({x-request-id}o)s %(M)sms'
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+if worker_class == "gevent":
+    # Patch before the app is preloaded so its sockets and locks cooperate
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+# Access and error logs go to ACCESS_LOG_PATH and ERROR_LOG_PATH (served
+# by /logs) and rotate like the app's LOG_FILE. Imported after the gevent
+# patching, which has to come first.
+from bookingapp.config import Config
+from bookingapp.utils.log_config import gunicorn_logconfig_dict
+logconfig_dict = gunicorn_logconfig_dict(Config, loglevel)
+
+
+def on_starting(server):
+    """Start /metrics from zero instead of the totals of the last run"""
+    from bookingapp.config import Config
+    from bookingapp.metrics.registry import reset_metrics_dir
+    reset_metrics_dir(Config.METRICS_DIR)
+
+
+def post_fork(server, worker):
+    """Give each worker its own DB connections.
+
+    Connections opened by the master while preloading would otherwise be
+    shared by every forked worker; close=False leaves the master's sockets
+    alone and only starts a fresh pool in the child.
+    """
+    from run import app
+    from bookingapp import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -1,6 +1,22 @@
+import os
+from bookingapp.config import Config
+from bookingapp.utils.log_config import gunicorn_logconfig_dict
+
 bind = "0.0.0.0:5005"
 workers = 4
 accesslog = "-"
-loglevel = "debug"
+# Default access log line plus the request id the app sent back and the duration
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %({x-request-id}o)s %(M)sms'
+# The app logs through its own background writer (see LOG_LEVEL)
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+# Access and error logs go to ACCESS_LOG_PATH and ERROR_LOG_PATH (served
+# by /logs) and rotate like the app's LOG_FILE
+logconfig_dict = gunicorn_logconfig_dict(Config, loglevel)
 capture_output = True
 enable_stdio_inheritance = True
+
+
+def on_starting(server):
+    """Start /metrics from zero instead of the totals of the last run"""
+    from bookingapp.metrics.registry import reset_metrics_dir
+    reset_metrics_dir(Config.METRICS_DIR)
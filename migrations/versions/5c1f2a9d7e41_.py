@@ -0,0 +1,34 @@
+"""add indexes for booking and event lookups
+
+Revision ID: 5c1f2a9d7e41
+Revises: e98b9587ec39
+Create Date: 2026-10-18 10:50:12.418233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f2a9d7e41'
+down_revision = 'e98b9587ec39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_bookings_event_id_createdAt', 'bookings', ['event_id', 'createdAt'], unique=False)
+    op.create_index('ix_bookings_user_id_booking_date', 'bookings', ['user_id', 'booking_date'], unique=False)
+    op.create_index('ix_events_date_time_id', 'events', ['date_time', 'id'], unique=False)
+    op.create_index('ix_events_creator_id', 'events', ['creator_id'], unique=False)
+    op.create_index('ix_events_createdAt_id', 'events', ['createdAt', 'id'], unique=False)
+    op.create_index('ix_users_createdAt_id', 'users', ['createdAt', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_createdAt_id', table_name='users')
+    op.drop_index('ix_events_createdAt_id', table_name='events')
+    op.drop_index('ix_events_creator_id', table_name='events')
+    op.drop_index('ix_events_date_time_id', table_name='events')
+    op.drop_index('ix_bookings_user_id_booking_date', table_name='bookings')
+    op.drop_index('ix_bookings_event_id_createdAt', table_name='bookings')
@@ -0,0 +1,41 @@
+"""add event capacity and remaining seats
+
+Revision ID: 8d3e6b0f4a27
+Revises: 5c1f2a9d7e41
+Create Date: 2026-10-18 11:02:37.551908
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3e6b0f4a27'
+down_revision = '5c1f2a9d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        # Events are created with the admin's user id, a string UUID
+        batch_op.alter_column('creator_id',
+               existing_type=sa.Integer(),
+               type_=sa.String(length=255),
+               existing_nullable=False,
+               postgresql_using='creator_id::varchar')
+        batch_op.add_column(sa.Column('capacity', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('seats_remaining', sa.Integer(), nullable=True))
+        batch_op.create_check_constraint('ck_events_seats_remaining', 'seats_remaining >= 0')
+
+
+def downgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_events_seats_remaining', type_='check')
+        batch_op.drop_column('seats_remaining')
+        batch_op.drop_column('capacity')
+        batch_op.alter_column('creator_id',
+               existing_type=sa.String(length=255),
+               type_=sa.Integer(),
+               existing_nullable=False,
+               postgresql_using='creator_id::integer')
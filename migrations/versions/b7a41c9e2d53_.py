@@ -0,0 +1,71 @@
+"""add full-text search index on events
+
+Revision ID: b7a41c9e2d53
+Revises: 8d3e6b0f4a27
+Create Date: 2026-10-18 11:24:09.130562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7a41c9e2d53'
+down_revision = '8d3e6b0f4a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # IF NOT EXISTS: databases made by db.create_all() may already have
+    # the SQLite index, and earlier builds of the app added the Postgres column on boot
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("""
+            ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(event_name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(location, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'C')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+                event_name, location, description,
+                content='events', content_rowid='rowid', tokenize='porter unicode61'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+                INSERT INTO events_fts(rowid, event_name, location, description)
+                VALUES (new.rowid, new.event_name, new.location, new.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, event_name, location, description)
+                VALUES ('delete', old.rowid, old.event_name, old.location, old.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF event_name, location, description ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, event_name, location, description)
+                VALUES ('delete', old.rowid, old.event_name, old.location, old.description);
+                INSERT INTO events_fts(rowid, event_name, location, description)
+                VALUES (new.rowid, new.event_name, new.location, new.description);
+            END
+        """)
+        op.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_events_search_vector', table_name='events', postgresql_using='gin')
+        op.drop_column('events', 'search_vector')
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS events_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS events_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS events_fts_insert")
+        op.execute("DROP TABLE IF EXISTS events_fts")
@@ -0,0 +1,45 @@
+"""add booking counters on events and booking amounts
+
+Revision ID: d2f8c5a1e694
+Revises: b7a41c9e2d53
+Create Date: 2026-10-18 11:41:52.804117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f8c5a1e694'
+down_revision = 'b7a41c9e2d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount', sa.Float(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('bookings_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('revenue', sa.Float(), server_default='0', nullable=False))
+
+    # Existing bookings are assumed to have been paid at the current price
+    op.execute("""
+        UPDATE bookings SET amount = coalesce(
+            (SELECT price FROM events WHERE events.id = bookings.event_id), 0)
+    """)
+    op.execute("""
+        UPDATE events SET
+            bookings_count = (SELECT count(*) FROM bookings WHERE bookings.event_id = events.id),
+            revenue = (SELECT coalesce(sum(amount), 0) FROM bookings WHERE bookings.event_id = events.id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('revenue')
+        batch_op.drop_column('bookings_count')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_column('amount')
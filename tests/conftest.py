@@ -0,0 +1,74 @@
+"""
+Fixtures shared by the tests: an app on an in-memory SQLite database
+"""
+import os
+
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-with-enough-length-for-hs256')
+
+import pytest
+from flask_jwt_extended import create_access_token
+from bookingapp import create_app, db, cache
+from bookingapp.config import DebugConfig
+from bookingapp.models.user import User
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Test settings; tests may subclass or set attributes before `app` is built"""
+    class TestConfig(DebugConfig):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SQLALCHEMY_REPLICA_URIS = []
+        CACHE_BACKEND = 'simple'
+        MAIL_ASYNC = False
+        MAIL_SUPPRESS_SEND = True
+        PASSWORD_HASH_WORKERS = 0
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        BCRYPT_ROUNDS = 4
+        METRICS_DIR = str(tmp_path / 'metrics')
+        LOG_FILE = str(tmp_path / 'app.log')
+        LOG_TO_STDERR = False
+        ACCESS_LOG_PATH = str(tmp_path / 'access_log.log')
+        ERROR_LOG_PATH = str(tmp_path / 'error_log.log')
+        SWAGGER_CACHE = str(tmp_path / 'swagger.json')
+        CACHE_DIR = str(tmp_path / 'cache')
+
+    return TestConfig
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        cache.clear()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Insert a user and return it"""
+    count = [0]
+
+    def make_user(**fields):
+        count[0] += 1
+        user = User(first_name=f'User{count[0]}', last_name='Test',
+                    email=f'user{count[0]}@example.com', password='x', **fields)
+        user.insert()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Return Authorization headers with an access token for a user"""
+    def auth_headers(user):
+        return {'Authorization': 'Bearer ' + create_access_token(identity=user.id)}
+
+    return auth_headers
@@ -0,0 +1,67 @@
+"""
+Streaming exports of an event's bookings
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from bookingapp.booking import routes
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+
+ROWS = 5
+
+
+@pytest.fixture
+def exported(app, make_user, monkeypatch):
+    """An event with ROWS bookings, exported two rows per fetch"""
+    monkeypatch.setattr(routes, 'EXPORT_CHUNK_SIZE', 2)
+    admin = make_user(is_admin=True)
+    event = Event('Concert', 'Lagos', datetime.now() + timedelta(days=1), 'Seeded', admin.id)
+    event.insert()
+    users = [make_user() for _ in range(ROWS)]
+    ids = Booking.bulk_insert([{'user_id': user.id, 'event_id': event.id, 'booking_date': datetime.now()}
+                               for user in users])
+    return admin, event.id, set(ids)
+
+
+def _export(client, headers, event_id, export_format):
+    response = client.get(f'/api/v1/booking/{event_id}/export?format={export_format}',
+                          headers=headers, buffered=False)
+    chunks = [chunk for chunk in response.response if chunk]
+    response.close()
+    return response, b''.join(chunks).decode(), chunks
+
+
+def test_ndjson_export(client, auth_headers, exported):
+    admin, event_id, ids = exported
+    response, body, chunks = _export(client, auth_headers(admin), event_id, 'ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == f'attachment; filename=bookings_{event_id}.ndjson'
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert {row['id'] for row in rows} == ids
+    assert all(list(row) == routes.EXPORT_FIELDS and row['event_id'] == event_id for row in rows)
+    # One chunk per fetch of two rows
+    assert len(chunks) == 3
+
+
+def test_csv_export(client, auth_headers, exported):
+    admin, event_id, ids = exported
+    response, body, chunks = _export(client, auth_headers(admin), event_id, 'csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == routes.EXPORT_FIELDS
+    assert {row[0] for row in rows[1:]} == ids
+    # The header, then one chunk per fetch of two rows
+    assert len(chunks) == 4
+
+
+@pytest.mark.parametrize('export_format, status', [('xml', 400), ('csv', 404)])
+def test_export_errors(client, auth_headers, exported, export_format, status):
+    admin, event_id, _ = exported
+    missing = event_id if status == 400 else '0' * 32
+    response = client.get(f'/api/v1/booking/{missing}/export?format={export_format}', headers=auth_headers(admin))
+    assert response.status_code == status
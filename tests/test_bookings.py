@@ -0,0 +1,142 @@
+"""
+Seat reservations
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Barrier
+import pytest
+from bookingapp import cache, create_app, db
+from bookingapp.event import feed
+from bookingapp.errors.handlers import CustomError
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+from bookingapp.models.user import User
+
+
+@pytest.fixture
+def concert(app, make_user):
+    admin = make_user(is_admin=True)
+    event = Event('Concert', 'Lagos', datetime.now() + timedelta(days=1), 'Seeded', admin.id, capacity=10)
+    event.price = 25.0
+    event.insert()
+    return event.id
+
+
+def _seats_in_feed(client, event_id):
+    rows = client.get('/api/v1/event/upcoming').get_json()['data']
+    return next(row['seats_remaining'] for row in rows if row['id'] == event_id)
+
+
+def _search(client):
+    response = client.get('/api/v1/event/search?q=concert')
+    return response.headers['X-Cache'], response.get_json()['data'][0]['seats_remaining']
+
+
+def _stored_seats(event_id):
+    return next(row['seats_remaining'] for row in cache.get(feed.FEED_KEY)['events'] if row['id'] == event_id)
+
+
+def test_booking_refreshes_the_feed_seats_only(client, make_user, auth_headers, concert):
+    user = make_user()
+    assert _seats_in_feed(client, concert) == 10
+    assert _search(client) == ('MISS', 10)
+
+    response = client.post(f'/api/v1/booking/{concert}', headers=auth_headers(user))
+    assert response.status_code == 201
+    assert _seats_in_feed(client, concert) == 9
+    # The cached feed is not rewritten, its page reads the marked event's seats
+    assert _stored_seats(concert) == 10
+    # Searches keep their cached seat counts until they expire
+    assert _search(client) == ('HIT', 10)
+
+
+def test_bulk_booking_refreshes_the_feed_seats_only(client, make_user, auth_headers, concert):
+    user = make_user()
+    assert _seats_in_feed(client, concert) == 10
+    assert _search(client) == ('MISS', 10)
+
+    response = client.post('/api/v1/booking/bulk', headers=auth_headers(user),
+                           json={'items': [{'event_id': concert, 'seats': 3}]})
+    assert response.status_code == 201
+    assert _seats_in_feed(client, concert) == 7
+    assert _search(client) == ('HIT', 10)
+
+    Booking.bulk_delete(db.session.scalars(db.select(Booking.id)).all())
+    assert _seats_in_feed(client, concert) == 10
+
+
+def _counters(event_id):
+    db.session.expire_all()
+    event = db.session.get(Event, event_id)
+    return event.seats_remaining, event.bookings_count, event.revenue
+
+
+def test_insert_then_delete_restores_the_counters(make_user, concert):
+    user = make_user()
+    before = _counters(concert)
+
+    booking = Booking(user.id, concert, datetime.now())
+    booking.insert()
+    assert booking.amount == 25.0
+    assert _counters(concert) == (9, 1, 25.0)
+    booking.delete()
+    assert _counters(concert) == before
+
+
+def test_bulk_insert_then_bulk_delete_restores_the_counters(make_user, concert):
+    user = make_user()
+    before = _counters(concert)
+
+    ids = Booking.bulk_insert([{'user_id': user.id, 'event_id': concert, 'booking_date': datetime.now()}
+                               for _ in range(4)])
+    assert _counters(concert) == (6, 4, 100.0)
+    Booking.bulk_delete(ids)
+    assert _counters(concert) == before
+
+
+def test_bulk_insert_past_capacity_inserts_nothing(make_user, concert):
+    user = make_user()
+    rows = [{'user_id': user.id, 'event_id': concert, 'booking_date': datetime.now()} for _ in range(11)]
+    with pytest.raises(CustomError) as error:
+        Booking.bulk_insert(rows)
+    assert error.value.code == 409
+    assert _counters(concert) == (10, 0, 0.0)
+    assert db.session.scalar(db.select(db.func.count()).select_from(Booking)) == 0
+
+
+def test_concurrent_reservations_never_oversell(config, tmp_path):
+    # Threads need a database they can all open, not a private in-memory one
+    config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'bookings.db'}"
+    config.DB_RETRY_ATTEMPTS = 100
+    app = create_app(config)
+    with app.app_context():
+        admin = User(first_name='Admin', last_name='Test', email='admin@example.com', password='x', is_admin=True)
+        admin.insert()
+        event = Event('Concert', 'Lagos', datetime.now() + timedelta(days=1), 'Seeded', admin.id, capacity=5)
+        event.insert()
+        event_id = event.id
+        user_ids = User.bulk_insert([{'first_name': f'Fan{i}', 'last_name': 'Test', 'email': f'fan{i}@example.com',
+                                      'password': 'x', 'avatar': ''} for i in range(20)])
+
+    start = Barrier(len(user_ids))
+
+    def book(user_id):
+        with app.app_context():
+            start.wait()
+            try:
+                Booking.reserve(user_id, event_id)
+                return 201
+            except CustomError as error:
+                return error.code
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        statuses = list(pool.map(book, user_ids))
+
+    assert statuses.count(201) == 5
+    assert statuses.count(409) == 15
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        assert (event.seats_remaining, event.bookings_count) == (0, 5)
+        assert db.session.scalar(db.select(db.func.count()).select_from(Booking)) == 5
@@ -0,0 +1,94 @@
+"""
+Two-level cache: near copies are dropped when another worker writes
+"""
+import time
+from flask_caching.backends.filesystemcache import FileSystemCache
+import pytest
+from bookingapp.caching.backends import (
+    CLEAR_ALL, FileInvalidationBus, InvalidationBus, RedisInvalidationBus, TwoLevelCache,
+)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two caches standing in for two workers sharing a filesystem cache"""
+    def worker():
+        return TwoLevelCache(FileSystemCache(str(tmp_path / 'cache')),
+                             bus=FileInvalidationBus(str(tmp_path / 'invalidations.log')), near_timeout=60)
+
+    return worker(), worker()
+
+
+def test_set_on_one_worker_drops_the_others_near_copy(workers):
+    first, second = workers
+    first.set('event:1', 'v1')
+    assert second.get('event:1') == 'v1'
+    assert second.near.get('event:1') == 'v1'
+
+    first.set('event:1', 'v2')
+    assert second.get('event:1') == 'v2'
+
+
+def test_delete_on_one_worker_drops_the_others_near_copy(workers):
+    first, second = workers
+    first.set('event:1', 'v1')
+    assert second.get('event:1') == 'v1'
+    first.delete('event:1')
+    assert second.get('event:1') is None
+
+
+def test_a_worker_skips_its_own_messages(tmp_path):
+    bus = FileInvalidationBus(str(tmp_path / 'invalidations.log'))
+    received = []
+    bus.subscribe(received.append)
+    bus.publish('event:1')
+    bus.poll()
+    assert received == ['event:1']
+
+
+def test_replaced_log_clears_every_near_cache(tmp_path):
+    path = str(tmp_path / 'invalidations.log')
+    publisher, listener = FileInvalidationBus(path, max_size=200), FileInvalidationBus(path)
+    received = []
+    listener.subscribe(received.append)
+    publisher.publish('event:0')
+    listener.poll()
+    assert received == ['event:0']
+
+    # Replaced several times, so the current file is as long as the one
+    # the listener last read and may even have the same inode
+    for index in range(1, 11):
+        publisher.publish(f'event:{index}')
+    listener.poll()
+    assert CLEAR_ALL in received
+    assert received[-1] == 'event:10'
+
+
+def test_failing_subscriber_does_not_stop_the_others():
+    bus = InvalidationBus()
+    received = []
+    bus.subscribe(lambda key: 1 / 0)
+    bus.subscribe(received.append)
+    bus.publish('event:1')
+    assert received == ['event:1']
+
+
+def test_redis_bus_reaches_other_workers():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    first = RedisInvalidationBus(fakeredis.FakeRedis(server=server), 'invalidate')
+    second = RedisInvalidationBus(fakeredis.FakeRedis(server=server), 'invalidate')
+    received = []
+    second.subscribe(received.append)
+    second.ensure_listening()
+    first.ensure_listening()
+    try:
+        # Subscriptions are made by the listener threads
+        deadline = time.monotonic() + 5
+        while 'event:1' not in received and time.monotonic() < deadline:
+            first.publish('event:1')
+            time.sleep(0.05)
+        assert 'event:1' in received
+    finally:
+        first._thread.stop()
+        second._thread.stop()
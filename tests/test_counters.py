@@ -0,0 +1,59 @@
+"""
+Repair of drifted event counters
+"""
+from datetime import datetime, timedelta
+import pytest
+from bookingapp import db
+from bookingapp.event.counters import find_drift, reconcile_event_counters
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+
+
+@pytest.fixture
+def drifted(app, make_user):
+    """An event with two bookings whose counters were then overwritten"""
+    admin, user = make_user(is_admin=True), make_user()
+    event = Event('Concert', 'Lagos', datetime.now() + timedelta(days=1), 'Seeded', admin.id, capacity=10)
+    event.price = 25.0
+    event.insert()
+    Booking.bulk_insert([{'user_id': user.id, 'event_id': event.id, 'booking_date': datetime.now()}
+                         for _ in range(2)])
+    db.session.execute(db.update(Event).where(Event.id == event.id)
+                       .values(bookings_count=5, revenue=0, seats_remaining=3))
+    db.session.commit()
+    return event.id
+
+
+def _counters(event_id):
+    db.session.expire_all()
+    event = db.session.get(Event, event_id)
+    return event.bookings_count, event.revenue, event.seats_remaining
+
+
+def test_find_drift_reports_stored_and_actual_values(drifted):
+    assert [tuple(row) for row in find_drift()] == [(drifted, 5, 2, 0.0, 50.0, 3, 8)]
+
+
+def test_reconcile_repairs_every_counter(drifted):
+    assert len(reconcile_event_counters()) == 1
+    assert _counters(drifted) == (2, 50.0, 8)
+    assert find_drift() == []
+
+
+def test_seats_left_never_go_below_zero(app, drifted):
+    db.session.execute(db.update(Event).where(Event.id == drifted).values(capacity=1))
+    db.session.commit()
+    reconcile_event_counters()
+    assert _counters(drifted) == (2, 50.0, 0)
+
+
+def test_cli_dry_run_only_reports(app, drifted):
+    result = app.test_cli_runner().invoke(args=['reconcile-event-counters', '--dry-run'])
+    assert result.exit_code == 0, result.output
+    assert f'{drifted}: bookings 5 -> 2, revenue 0.00 -> 50.00, seats remaining 3 -> 8' in result.output
+    assert '1 events found with drifted counters' in result.output
+    assert _counters(drifted) == (5, 0.0, 3)
+
+    result = app.test_cli_runner().invoke(args=['reconcile-event-counters'])
+    assert '1 events repaired with drifted counters' in result.output
+    assert _counters(drifted) == (2, 50.0, 8)
@@ -0,0 +1,74 @@
+"""
+Cached feed of upcoming events: patches, concurrent writers and cursors
+"""
+from datetime import datetime, timedelta
+import pytest
+from bookingapp import db, cache
+from bookingapp.db_config.config import encode_cursor
+from bookingapp.errors.handlers import CustomError
+from bookingapp.event import feed
+from bookingapp.models.event import Event
+
+
+def _add_event(admin, name, days):
+    """Insert an event with Core, which the feed listeners do not see"""
+    event_id, = Event.bulk_insert([{
+        'event_name': name, 'location': 'Lagos', 'creator_id': admin.id,
+        'date_time': datetime.now() + timedelta(days=days)}])
+    stmt = db.select(*Event.listing_columns()).where(Event.id == event_id)
+    return {event_id: dict(db.session.execute(stmt).mappings().one())}
+
+
+def _feed_ids():
+    return [row['id'] for row in feed.upcoming_page(per_page=50)['items']]
+
+
+def test_patch_adds_new_event(app, make_user):
+    admin = make_user(is_admin=True)
+    _add_event(admin, 'first', 1)
+    feed.build_feed()
+    second = _add_event(admin, 'second', 2)
+
+    feed.apply_changes(second, set())
+
+    assert cache.get(feed.FEED_KEY) is not None
+    assert list(second) == _feed_ids()[1:]
+
+
+def test_concurrent_writers_do_not_lose_updates(app, make_user, monkeypatch):
+    admin = make_user(is_admin=True)
+    _add_event(admin, 'first', 1)
+    feed.build_feed()
+    holder_change = _add_event(admin, 'holder', 2)
+    loser_change = _add_event(admin, 'loser', 3)
+
+    # The second writer commits while the first one holds the lock and
+    # has already read the feed it is about to write back
+    get = cache.get
+    interleaved = []
+
+    def get_then_interleave(key):
+        value = get(key)
+        if key == feed.FEED_KEY and not interleaved:
+            interleaved.append(True)
+            feed.apply_changes(loser_change, set())
+        return value
+
+    monkeypatch.setattr(cache, 'get', get_then_interleave)
+    feed.apply_changes(holder_change, set())
+    monkeypatch.undo()
+
+    assert interleaved
+    ids = _feed_ids()
+    assert list(holder_change)[0] in ids
+    assert list(loser_change)[0] in ids
+    assert cache.get(feed.FEED_LOCK_KEY) is None
+
+
+@pytest.mark.parametrize('values', [[1, 'x'], [datetime(2026, 10, 18), 5]])
+def test_cursor_with_wrong_key_types_is_a_bad_request(app, client, values):
+    with pytest.raises(CustomError) as error:
+        feed.upcoming_page(encode_cursor(values))
+    assert error.value.code == 400
+    response = client.get(f'/api/v1/event/upcoming?cursor={encode_cursor(values)}')
+    assert response.status_code == 400
@@ -0,0 +1,51 @@
+"""
+Event search and autocomplete, with and without the full-text index
+"""
+from datetime import datetime, timedelta
+import pytest
+from bookingapp import db
+from bookingapp.event import search
+from bookingapp.models.event import Event
+
+
+@pytest.fixture
+def events(app, make_user):
+    admin = make_user(is_admin=True)
+    soon = datetime.now() + timedelta(days=1)
+    for name, location, description in (
+        ('Jazz Night', 'Lagos', 'Live jazz by the lagoon'),
+        ('Jazz Brunch', 'Abuja', 'Pancakes and a quartet'),
+        ('Rock Festival', 'Lagos', 'Three stages of guitars'),
+    ):
+        Event(name, location, soon, description, admin.id).insert()
+    yield
+    search._indexed.clear()
+
+
+@pytest.fixture
+def without_index(app, events):
+    """Drop the FTS5 table, as on a database without the search migration"""
+    search._indexed.clear()
+    with db.engine.begin() as connection:
+        for trigger in ('events_fts_insert', 'events_fts_delete', 'events_fts_update'):
+            connection.execute(db.text(f'DROP TRIGGER {trigger}'))
+        connection.execute(db.text(f'DROP TABLE {search.SQLITE_TABLE}'))
+
+
+def test_search_uses_the_index(events):
+    assert search._fts_available()
+    names = [row['event_name'] for row in search.search_events('jazz')]
+    assert sorted(names) == ['Jazz Brunch', 'Jazz Night']
+
+
+def test_search_falls_back_to_like(client, without_index):
+    assert not search._fts_available()
+    response = client.get('/api/v1/event/search?q=lagos jazz')
+    assert response.status_code == 200
+    assert [row['event_name'] for row in response.get_json()['data']] == ['Jazz Night']
+
+
+def test_autocomplete_falls_back_to_like(client, without_index):
+    response = client.get('/api/v1/event/autocomplete?q=ja')
+    assert response.status_code == 200
+    assert response.get_json()['data'] == ['Jazz Brunch', 'Jazz Night']
@@ -0,0 +1,55 @@
+"""
+Password hashing: the pool holds slots until the job is done, and rehash checks
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Event
+import os
+import pytest
+from bookingapp.auth import hashing
+from bookingapp.errors.handlers import CustomError
+
+
+@pytest.fixture
+def pool(app, monkeypatch):
+    """A one-slot pool of threads standing in for the hashing processes"""
+    app.config['PASSWORD_HASH_WORKERS'] = 1
+    app.config['PASSWORD_HASH_TIMEOUT'] = 0.1
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(hashing, '_pool', executor)
+    monkeypatch.setattr(hashing, '_slots', BoundedSemaphore(1))
+    monkeypatch.setattr(hashing, '_pid', os.getpid())
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_slot_is_released_when_the_job_finishes(pool):
+    assert hashing._run(pow, 2, 10) == 1024
+    assert hashing._slots.acquire(blocking=False)
+
+
+def test_timed_out_job_keeps_its_slot(pool):
+    release = Event()
+    try:
+        with pytest.raises(CustomError) as error:
+            hashing._run(release.wait)
+        assert error.value.code == 503
+        # Still hashing, so a new request finds no free slot
+        assert not hashing._slots.acquire(blocking=False)
+    finally:
+        release.set()
+    pool.submit(lambda: None).result()
+    assert hashing._slots.acquire(blocking=False)
+
+
+@pytest.mark.parametrize('method', ['scrypt', 'pbkdf2:sha256:1000'])
+def test_fresh_hash_needs_no_rehash(app, method):
+    # A shorthand setting matches the parameters werkzeug fills in
+    app.config['PASSWORD_HASH_METHOD'] = method
+    assert not hashing.needs_rehash(hashing.hash_password('secret'))
+
+
+def test_hash_with_other_parameters_needs_rehash(app):
+    old = hashing.hash_password('secret')
+    app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+    assert old.startswith('pbkdf2:sha256:1000$')
+    assert hashing.needs_rehash(old)
@@ -0,0 +1,82 @@
+"""
+The listing, filter and keyset queries are served by the indexes, not table scans
+"""
+from datetime import datetime, timedelta
+import re
+import pytest
+from sqlalchemy import event
+from bookingapp import db
+from bookingapp.db_config.config import encode_cursor, query_keyset
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+from bookingapp.models.user import User
+
+
+# A full table scan; "SCAN users USING INDEX ..." walks an index in order
+TABLE_SCAN = re.compile(r'^SCAN \w+$')
+
+
+@pytest.fixture
+def query_plans(app):
+    """Run a callable and return the EXPLAIN QUERY PLAN of each SELECT it ran"""
+    def query_plans(run):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            run()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        connection = db.session.connection()
+        return [
+            [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+            for statement, parameters in statements
+        ]
+
+    return query_plans
+
+
+def assert_uses_index(plans, index):
+    assert plans, 'no query was run'
+    details = [detail for plan in plans for detail in plan]
+    assert any(f'USING INDEX {index}' in detail for detail in details), details
+    assert not any(TABLE_SCAN.match(detail) for detail in details), details
+    assert not any('TEMP B-TREE' in detail for detail in details), details
+
+
+def test_bookings_of_an_event(query_plans):
+    plans = query_plans(lambda: Booking.query.options(*Booking.loading('list')).filter_by(event_id='e').all())
+    assert_uses_index(plans[:1], 'ix_bookings_event_id_createdAt')
+
+
+def test_bookings_of_a_user(query_plans):
+    stmt = db.select(Booking).where(Booking.user_id == 'u').order_by(Booking.booking_date)
+    assert_uses_index(query_plans(lambda: db.session.scalars(stmt).all()), 'ix_bookings_user_id_booking_date')
+
+
+def test_events_of_a_creator(query_plans):
+    plans = query_plans(lambda: db.session.scalars(db.select(Event).where(Event.creator_id == 'u')).all())
+    assert_uses_index(plans, 'ix_events_creator_id')
+
+
+def test_upcoming_events(query_plans):
+    assert_uses_index(query_plans(Event.get_upcoming_events), 'ix_events_date_time_id')
+
+
+@pytest.mark.parametrize('filters', [
+    {'end': datetime.now() + timedelta(days=7)},
+    {'location': 'Lagos', 'min_price': 10},
+    {'cursor': encode_cursor([datetime.now(), 'e'])},
+])
+def test_event_filters(query_plans, filters):
+    assert_uses_index(query_plans(lambda: Event.search(**filters)), 'ix_events_date_time_id')
+
+
+@pytest.mark.parametrize('cursor', [None, encode_cursor([datetime.now(), 'u'])])
+def test_user_keyset_pages(query_plans, cursor):
+    plans = query_plans(lambda: query_keyset(User, cursor=cursor, columns=User.listing_columns()))
+    assert_uses_index(plans, 'ix_users_createdAt_id')
@@ -0,0 +1,134 @@
+"""
+Application logging: the file handlers, the background queue, request ids and gunicorn's logs
+"""
+from datetime import datetime, timezone
+import json
+import logging
+import logging.config
+import os
+import re
+import time
+import pytest
+from bookingapp.metrics.registry import metrics
+from bookingapp.utils import log_config
+from bookingapp.utils.log_config import BackgroundQueueHandler, ProcessSafeRotatingFileHandler
+from bookingapp.utils.logs import parse_timestamp
+
+
+def _record(message):
+    return logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'})
+
+
+def test_file_handler_keeps_one_lock_file_open(tmp_path):
+    handler = ProcessSafeRotatingFileHandler(str(tmp_path / 'app.log'), maxBytes=64, backupCount=2)
+    handler.emit(_record('first'))
+    lock = handler._lock_file
+    for index in range(10):
+        handler.emit(_record(f'line {index}'))
+    assert handler._lock_file is lock and not lock.closed
+    assert os.path.exists(tmp_path / 'app.log.1')
+    handler.close()
+    assert lock.closed
+
+
+def test_full_queue_drops_and_reports():
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    handler = BackgroundQueueHandler([Collect()], maxsize=1)
+    handler._ensure_started()
+    # Pause the listener thread so the queue fills up
+    handler.listener.stop()
+    before = metrics._counters.get(('bookingapp_log_records_dropped_total', ()), 0)
+
+    for index in range(3):
+        handler.emit(_record(f'record {index}'))
+    assert handler.dropped == 2
+    assert metrics._counters[('bookingapp_log_records_dropped_total', ())] == before + 2
+
+    handler.listener.start()
+    handler.stop()
+    assert records[0] == 'record 0'
+    assert records[-1] == 'Dropped 2 log records because the log queue was full'
+
+
+def test_request_id_is_generated(client):
+    response = client.get('/api/v1/event/test')
+    assert re.fullmatch(r'[0-9a-f]{32}', response.headers['X-Request-ID'])
+    assert client.get('/api/v1/event/test').headers['X-Request-ID'] != response.headers['X-Request-ID']
+
+
+def test_incoming_request_id_is_kept(client):
+    response = client.get('/api/v1/event/test', headers={'X-Request-ID': 'lb-1234:abc.def'})
+    assert response.headers['X-Request-ID'] == 'lb-1234:abc.def'
+
+
+@pytest.mark.parametrize('incoming', ['has spaces', 'x' * 129, 'a/b;c', ''])
+def test_unsafe_request_id_is_replaced(client, incoming):
+    response = client.get('/api/v1/event/test', headers={'X-Request-ID': incoming})
+    assert re.fullmatch(r'[0-9a-f]{32}', response.headers['X-Request-ID'])
+
+
+def test_records_carry_the_request_id(app, client):
+    @app.route('/log-something')
+    def log_something():
+        app.logger.warning('inside the request', extra={'order': 7})
+        return 'ok'
+
+    client.get('/log-something', headers={'X-Request-ID': 'trace-42'})
+    # Stopping the handler writes out what the listener thread still holds
+    log_config._handler.stop()
+    with open(app.config['LOG_FILE']) as file:
+        records = [json.loads(line) for line in file]
+    record = next(record for record in records if record['message'] == 'inside the request')
+    assert record['request_id'] == 'trace-42'
+    assert record['order'] == 7 and record['level'] == 'WARNING'
+
+
+def test_gunicorn_logs_rotate(config, tmp_path):
+    config.LOG_MAX_BYTES = 200
+    config.LOG_BACKUP_COUNT = 2
+    config.LOG_TO_STDERR = False
+    root = logging.getLogger()
+    root_handlers, root_level = root.handlers[:], root.level
+    logging.config.dictConfig(log_config.gunicorn_logconfig_dict(config, 'info'))
+    access = logging.getLogger('gunicorn.access')
+    try:
+        for index in range(10):
+            access.info('127.0.0.1 - - [18/Oct/2026:11:00:00 +0000] "GET /%d HTTP/1.1" 200 2', index)
+        logging.getLogger('gunicorn.error').info('Booting worker')
+    finally:
+        for name in ('gunicorn.access', 'gunicorn.error'):
+            for handler in logging.getLogger(name).handlers:
+                handler.close()
+            logging.getLogger(name).handlers = []
+        root.handlers, root.level = root_handlers, root_level
+
+    assert os.path.exists(config.ACCESS_LOG_PATH + '.1')
+    with open(config.ACCESS_LOG_PATH) as file:
+        assert file.read().endswith('"GET /9 HTTP/1.1" 200 2\n')
+    with open(config.ERROR_LOG_PATH) as file:
+        assert re.fullmatch(r'\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d [+-]\d{4}\] \[\d+\] \[INFO\] Booting worker\n', file.read())
+
+
+def test_text_lines_are_stamped_in_utc():
+    record = _record('hello')
+    record.created = datetime(2026, 10, 18, 11, 0, 0, tzinfo=timezone.utc).timestamp()
+    record.msecs, record.request_id = 250, '-'
+    tz = os.environ.get('TZ')
+    # A host an hour ahead of UTC
+    os.environ['TZ'] = 'Africa/Lagos'
+    time.tzset()
+    try:
+        line = log_config.TextFormatter().format(record)
+    finally:
+        if tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = tz
+        time.tzset()
+    assert line.startswith('[2026-10-18 11:00:00,250 +0000] [')
+    assert parse_timestamp(line.encode()) == datetime(2026, 10, 18, 11, 0, 0)
@@ -0,0 +1,111 @@
+"""
+Streaming /logs: ranges, tails and time windows
+"""
+from datetime import datetime, timedelta
+import gzip
+import io
+import pytest
+from bookingapp.utils.logs import read_chunks, tail_offset, time_offset
+
+
+START = datetime(2026, 10, 18, 11, 0, 0)
+
+
+def access_line(minute):
+    stamp = (START + timedelta(minutes=minute)).strftime('%d/%b/%Y:%H:%M:%S +0000')
+    return f'127.0.0.1 - - [{stamp}] "GET /api/v1/event/upcoming HTTP/1.1" 200 512 "-" "curl"\n'
+
+
+def error_line(minute, message):
+    stamp = (START + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S,000 +0000')
+    return f'[{stamp}] [42] [ERROR] [-] bookingapp: {message}\n'
+
+
+@pytest.fixture
+def logs(app):
+    access = ''.join(access_line(minute) for minute in range(60))
+    error = (error_line(0, 'first') + error_line(10, 'boom') + 'Traceback (most recent call last):\n'
+             + '  File "app.py", line 1\n' + error_line(20, 'last'))
+    with open(app.config['ACCESS_LOG_PATH'], 'w') as file:
+        file.write(access)
+    with open(app.config['ERROR_LOG_PATH'], 'w') as file:
+        file.write(error)
+    return access, error
+
+
+def test_single_file_answers_range_requests(client, logs):
+    access, _ = logs
+    response = client.get('/logs?file=access', headers={'Range': 'bytes=10-29'})
+    assert response.status_code == 206
+    assert response.data == access.encode()[10:30]
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_tail_keeps_the_last_lines_of_each_file(client, logs):
+    access, error = logs
+    response = client.get('/logs?tail=2')
+    assert response.status_code == 200
+    body = response.data.decode()
+    assert body == ('Access Log:\n\n' + ''.join(access.splitlines(True)[-2:])
+                    + '\n\nError Log:\n\n' + ''.join(error.splitlines(True)[-2:]))
+
+
+def test_time_window_keeps_tracebacks_with_their_line(client, logs):
+    since, until = (START + timedelta(minutes=5)).isoformat(), (START + timedelta(minutes=15)).isoformat()
+    response = client.get(f'/logs?file=error&since={since}&until={until}')
+    assert response.data.decode() == (error_line(10, 'boom') + 'Traceback (most recent call last):\n'
+                                      + '  File "app.py", line 1\n')
+
+    response = client.get(f'/logs?file=access&since={since}Z&until={until}%2B00:00')
+    assert response.data.decode() == ''.join(access_line(minute) for minute in range(5, 16))
+
+
+def test_gzip_download_and_encoding(client, logs):
+    access, _ = logs
+    response = client.get('/logs?file=access&gzip=true')
+    assert response.mimetype == 'application/gzip'
+    assert gzip.decompress(response.data).decode() == access
+
+    response = client.get('/logs?file=access&tail=3', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == ''.join(access.splitlines(True)[-3:])
+
+
+@pytest.mark.parametrize('query', ['tail=0', 'tail=x', 'since=yesterday', 'file=debug'])
+def test_bad_arguments(client, logs, query):
+    assert client.get(f'/logs?{query}').status_code == 400
+
+
+def test_tail_offset_across_blocks():
+    lines = [f'line {index}\n'.encode() for index in range(100)]
+    data = b''.join(lines)
+    for chunk_size in (7, 64, 4096):
+        file = io.BytesIO(data)
+        assert data[tail_offset(file, 3, chunk_size):] == b''.join(lines[-3:])
+        assert tail_offset(file, 500, chunk_size) == 0
+    # Without a final newline the last line still counts as one
+    assert data[:-1][tail_offset(io.BytesIO(data[:-1]), 1, 7):] == b'line 99'
+
+
+def test_time_offset_bisects_to_the_window(tmp_path):
+    path = tmp_path / 'access.log'
+    path.write_text(''.join(access_line(minute) for minute in range(2000)))
+    since = START + timedelta(minutes=1500)
+    with open(path, 'rb') as file:
+        offset = time_offset(file, since, chunk_size=256)
+        file.seek(offset)
+        # At or before the first line of the window, and close to it
+        skipped = file.read(1024).split(b'\n')
+    assert access_line(1500).encode().rstrip(b'\n') in skipped
+    chunks = list(read_chunks(str(path), since=since, until=START + timedelta(minutes=1501), chunk_size=256))
+    assert b''.join(chunks).decode() == access_line(1500) + access_line(1501)
+
+
+def test_app_log_is_served_on_its_own(app, client, logs):
+    with open(app.config['LOG_FILE'], 'w') as file:
+        file.write(error_line(0, 'from the app'))
+    response = client.get('/logs?file=app')
+    assert response.status_code == 200
+    assert response.data.decode() == error_line(0, 'from the app')
+    # all stays the access and error logs, as gunicorn writes them
+    assert b'from the app' not in client.get('/logs').data
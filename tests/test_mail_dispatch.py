@@ -0,0 +1,116 @@
+"""
+Background mail delivery: batching, retries and a full queue
+"""
+import logging
+import smtplib
+import threading
+from flask_mail import Message
+import pytest
+from bookingapp import mail
+from bookingapp.mailer.dispatch import MailDispatcher
+from bookingapp.metrics.registry import metrics
+
+
+class FakeSMTP:
+    """Stands in for mail.connect(); ``failures`` maps a subject to the errors its sends raise in turn"""
+
+    def __init__(self):
+        self.connections = 0
+        self.sent = []
+        self.failures = {}
+        self.lock = threading.Lock()
+
+    def connect(self):
+        with self.lock:
+            self.connections += 1
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def send(self, message):
+        errors = self.failures.get(message.subject)
+        if errors:
+            raise errors.pop(0)
+        with self.lock:
+            self.sent.append(message.subject)
+
+
+@pytest.fixture
+def config(config):
+    config.MAIL_ASYNC = True
+    config.MAIL_WORKERS = 1
+    config.MAIL_BATCH_WAIT = 0.2
+    config.MAIL_RETRY_DELAY = 0.01
+    return config
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    smtp = FakeSMTP()
+    monkeypatch.setattr(mail, 'connect', smtp.connect)
+    return smtp
+
+
+def message(subject):
+    return Message(subject, sender='noreply@example.com', recipients=[f'{subject}@example.com'])
+
+
+def test_a_batch_shares_one_connection(app, smtp):
+    dispatcher = MailDispatcher(app)
+    dispatcher.send_many([message(f'otp{index}') for index in range(5)])
+    assert dispatcher.flush()
+    assert smtp.connections == 1
+    assert smtp.sent == [f'otp{index}' for index in range(5)]
+
+
+def test_transient_failure_is_retried(app, smtp):
+    smtp.failures['otp'] = [smtplib.SMTPResponseException(451, b'Try again later')]
+    dispatcher = MailDispatcher(app)
+    dispatcher.send(message('otp'))
+    assert dispatcher.flush()
+    assert smtp.sent == ['otp']
+    assert smtp.connections == 2
+
+
+def test_permanent_failure_is_dropped_and_logged(app, smtp, caplog):
+    smtp.failures['bounce'] = [smtplib.SMTPResponseException(550, b'No such user')]
+    dispatcher = MailDispatcher(app)
+    with caplog.at_level(logging.ERROR, logger='bookingapp.mailer.dispatch'):
+        dispatcher.send_many([message('bounce'), message('otp')])
+        assert dispatcher.flush()
+    assert smtp.sent == ['otp']
+    assert smtp.connections == 1
+    assert "Mail to ['bounce@example.com'] rejected" in caplog.text
+
+
+def test_full_queue_drops_new_mail(app, smtp, caplog, monkeypatch):
+    app.config.update(MAIL_QUEUE_SIZE=2, MAIL_BATCH_SIZE=1)
+    sending, release = threading.Event(), threading.Event()
+
+    def held_connect():
+        # Keep the worker busy on the first message while the queue fills up
+        sending.set()
+        release.wait(5)
+        return smtp.connect()
+
+    monkeypatch.setattr(mail, 'connect', held_connect)
+    dispatcher = MailDispatcher(app)
+    before = metrics._counters.get(('bookingapp_mail_dropped_total', ()), 0)
+    try:
+        dispatcher.send(message('first'))
+        assert sending.wait(5)
+        with caplog.at_level(logging.ERROR, logger='bookingapp.mailer.dispatch'):
+            dispatcher.send_many([message('second'), message('third'), message('fourth')])
+            dispatcher.send_bulk([message('fifth'), message('sixth')])
+    finally:
+        release.set()
+    assert dispatcher.dropped == 3
+    assert metrics._counters[('bookingapp_mail_dropped_total', ())] == before + 3
+    assert 'Mail queue is full, dropped 1 message(s)' in caplog.text
+    assert 'Mail queue is full, dropped 2 message(s)' in caplog.text
+    assert dispatcher.flush()
+    assert smtp.sent == ['first', 'second', 'third']
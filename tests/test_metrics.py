@@ -0,0 +1,95 @@
+"""
+Access to the /metrics endpoints and the Server-Timing header
+"""
+import os
+import re
+from flask_jwt_extended import create_access_token
+import pytest
+from bookingapp import create_app, db
+from bookingapp.db_config.pool import InstrumentedQueuePool
+from bookingapp.models.user import User
+
+
+@pytest.fixture
+def config(config):
+    config.METRICS_ENABLED = True
+    return config
+
+
+def test_metrics_are_opt_in(app, client):
+    app.config['METRICS_ENABLED'] = False
+    assert client.get('/metrics').status_code == 404
+
+
+def test_pool_metrics_are_opt_in(app, client, make_user, auth_headers):
+    admin = make_user(is_admin=True)
+    app.config['METRICS_ENABLED'] = False
+    assert client.get('/metrics/pool', headers=auth_headers(admin)).status_code == 404
+
+
+def test_metrics_render(client):
+    client.get('/api/v1/event/upcoming')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'bookingapp_http_requests_total' in response.data
+
+
+def test_metrics_token(app, client):
+    app.config['METRICS_TOKEN'] = 'scrape-token'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code == 200
+
+
+@pytest.mark.parametrize('allowed, status', [(['127.0.0.0/8'], 200), (['10.0.0.0/8', '::1'], 401)])
+def test_metrics_allowed_ips(app, client, allowed, status):
+    app.config['METRICS_ALLOWED_IPS'] = allowed
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == status
+
+
+def test_server_timing_without_metrics(config):
+    # The defaults: metrics off, Server-Timing on
+    config.METRICS_ENABLED = False
+    config.SERVER_TIMING = True
+    app = create_app(config)
+
+    @app.route('/two-queries')
+    def two_queries():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.execute(db.text('SELECT 2'))
+        return 'ok'
+
+    with app.app_context():
+        response = app.test_client().get('/two-queries')
+        db.session.remove()
+    timing = response.headers['Server-Timing']
+    assert re.search(r'app;dur=[\d.]+', timing)
+    assert re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1) == '2'
+
+
+def test_pool_metrics_report_the_pool(config, tmp_path):
+    # SQLite gets no pool options by default; a file database can use the production pool
+    config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'pool.db'}"
+    config.SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': InstrumentedQueuePool, 'pool_size': 3, 'max_overflow': 2}
+    app = create_app(config)
+    with app.app_context():
+        admin = User(first_name='Admin', last_name='Test', email='admin@example.com', password='x', is_admin=True)
+        admin.insert()
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity=admin.id)}
+        db.session.remove()
+        client = app.test_client()
+        assert client.get('/metrics/pool').status_code == 401
+        # Held across the request, which checks out a second connection
+        with db.engine.connect():
+            response = client.get('/metrics/pool', headers=headers)
+        db.session.remove()
+
+    body = response.get_json()
+    assert response.status_code == 200 and body['pid'] == os.getpid()
+    pool = body['pools']['default']
+    assert pool['pool_class'] == 'InstrumentedQueuePool'
+    assert (pool['size'], pool['max_overflow'], pool['checked_out']) == (3, 2, 2)
+    # Connections opened beyond the pool size; negative while the pool is not full
+    assert pool['overflow'] == pool['checked_out'] + pool['checked_in'] - 3
+    assert pool['saturation'] == 0.4
+    assert pool['checkouts'] >= 2 and pool['wait_ms']['max'] >= 0
@@ -0,0 +1,11 @@
+"""
+BaseModel bulk helpers
+"""
+from bookingapp.models.user import User
+
+
+def test_bulk_insert_before_any_query(app):
+    # A fresh worker's first ORM use may be a bulk write
+    rows = [{'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', 'password': 'x', 'avatar': ''}]
+    ids = User.bulk_insert(rows)
+    assert [user.email for user in User.query.filter(User.id.in_(ids))] == ['ada@example.com']
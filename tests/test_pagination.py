@@ -0,0 +1,77 @@
+"""
+Keyset pagination cursors
+"""
+from datetime import datetime
+import pytest
+from bookingapp import db
+from bookingapp.db_config.config import decode_cursor, encode_cursor, query_keyset
+from bookingapp.errors.handlers import CustomError
+from bookingapp.models.user import User
+
+
+def test_cursor_round_trip():
+    values = [datetime(2026, 10, 18, 11, 12, 25, 123456), 'a1b2c3']
+    cursor = encode_cursor(values)
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert decode_cursor(cursor) == values
+
+
+def test_cursor_keeps_non_datetime_keys():
+    assert decode_cursor(encode_cursor([3.5, 42, None]), size=3) == [3.5, 42, None]
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    encode_cursor(['only one key']),
+    encode_cursor([{'dt': 'not a date'}, 'id']),
+    'e30',  # {}
+])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(CustomError) as error:
+        decode_cursor(cursor)
+    assert error.value.code == 400
+
+
+def test_keyset_pages_cover_every_row_once(app):
+    User.bulk_insert([{'first_name': f'User{i}', 'last_name': 'Test', 'email': f'user{i}@example.com',
+                       'password': 'x', 'avatar': ''} for i in range(25)])
+    # Rows sharing a createdAt are told apart by the id tie-breaker
+    stmt = db.update(User).where(User.first_name.in_([f'User{i}' for i in range(0, 25, 2)]))
+    db.session.execute(stmt.values(createdAt=datetime(2026, 1, 1)).execution_options(synchronize_session=False))
+    db.session.commit()
+    seen, cursor = [], None
+    while True:
+        page = query_keyset(User, cursor=cursor, per_page=4, columns=(User.id, User.createdAt))
+        assert len(page['items']) <= 4
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 25
+    expected = [user.id for user in User.query.order_by(User.createdAt.desc(), User.id.desc())]
+    assert seen == expected
+
+
+def test_admin_user_listing_walks_the_cursor(client, make_user, auth_headers):
+    admin = make_user(is_admin=True)
+    for _ in range(6):
+        make_user(is_verified=True)
+    headers = auth_headers(admin)
+
+    seen, url = [], '/api/v1/auth/users?per_page=3&is_verified=true&count=none'
+    while url:
+        body = client.get(url, headers=headers).get_json()
+        assert body['total'] is None and body['per_page'] == 3
+        seen.extend(row['id'] for row in body['data'])
+        assert 'password' not in body['data'][0]
+        url = body['next_cursor'] and f"/api/v1/auth/users?per_page=3&is_verified=true&count=none&cursor={body['next_cursor']}"
+    assert len(seen) == len(set(seen)) == 6
+    assert admin.id not in seen
+
+    body = client.get('/api/v1/auth/admins', headers=headers).get_json()
+    assert [row['id'] for row in body['data']] == [admin.id] and body['total'] == 1
+
+
+def test_admin_user_listing_rejects_a_bad_cursor(client, make_user, auth_headers):
+    response = client.get('/api/v1/auth/users?cursor=garbage', headers=auth_headers(make_user(is_admin=True)))
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+"""
+The listing endpoints run a fixed number of queries, whatever the number of rows
+"""
+from datetime import datetime, timedelta
+import pytest
+from bookingapp import db
+from bookingapp.db_config.query_budget import query_budget
+from bookingapp.models.booking import Booking
+from bookingapp.models.event import Event
+from bookingapp.models.user import User
+
+
+ROWS = 30
+
+# Listing endpoints, formatted with the seeded event id
+ENDPOINTS = (
+    '/api/v1/booking/{event_id}',
+    '/api/v1/event/upcoming?per_page=20',
+    '/api/v1/event/search?q=concert&per_page=100',
+    '/api/v1/auth/users?per_page=100',
+    '/api/v1/auth/admins?per_page=100',
+)
+
+
+@pytest.fixture
+def config(config):
+    # Far fewer than ROWS, so one query per row goes over the budget
+    config.QUERY_BUDGET = 5
+    config.QUERY_BUDGET_RAISE = True
+    return config
+
+
+@pytest.fixture
+def seeded(app, make_user):
+    admin = make_user(is_admin=True)
+    event = Event('Concert', 'Lagos', datetime.now() + timedelta(days=1), 'Seeded', admin.id)
+    event.insert()
+    user_ids = User.bulk_insert([{'first_name': f'Guest{i}', 'last_name': 'Test', 'email': f'guest{i}@example.com',
+                                  'password': 'x', 'avatar': ''} for i in range(ROWS)])
+    Event.bulk_insert([{'event_name': f'Concert {i}', 'location': 'Abuja', 'creator_id': admin.id,
+                        'date_time': datetime.now() + timedelta(days=2, hours=i)} for i in range(ROWS)])
+    Booking.bulk_insert([{'user_id': user_id, 'event_id': event.id, 'booking_date': datetime.now()}
+                         for user_id in user_ids])
+    return admin, event.id
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_listing_stays_within_the_query_budget(client, auth_headers, seeded, endpoint):
+    admin, event_id = seeded
+    response = client.get(endpoint.format(event_id=event_id), headers=auth_headers(admin))
+    assert response.status_code == 200, response.get_json()
+
+
+def test_n_plus_one_goes_over_the_budget(app, client, seeded):
+    @app.route('/n-plus-one')
+    @query_budget(3)
+    def n_plus_one():
+        # One query for the bookings, then one per booking for its user
+        return {'users': [db.session.get(User, booking.user_id).email for booking in Booking.query.all()]}
+
+    response = client.get('/n-plus-one')
+    assert response.status_code == 500
+    assert response.get_json()['error'] == 'Query Budget Exceeded'
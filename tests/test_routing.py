@@ -0,0 +1,111 @@
+"""
+Read replicas and the read-your-writes window
+"""
+import shutil
+from flask_jwt_extended import create_access_token
+import pytest
+from sqlalchemy import event
+from bookingapp import cache, create_app, db
+from bookingapp.db_config.routing import read_only
+from bookingapp.models.user import User
+
+
+def test_replicas_need_a_shared_cache(config, tmp_path):
+    config.SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{tmp_path / "replica.db"}']
+    with pytest.raises(ValueError, match='shared CACHE_BACKEND'):
+        create_app(config)
+
+
+def test_replicas_start_with_a_shared_cache(config, tmp_path):
+    config.SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{tmp_path / "replica.db"}']
+    config.CACHE_BACKEND = 'filesystem'
+    config.CACHE_DIR = str(tmp_path / 'cache')
+    app = create_app(config)
+    assert app.config['SQLALCHEMY_REPLICA_BINDS'] == ['replica_0']
+
+
+@pytest.fixture
+def routed(config, tmp_path):
+    """An app on a primary SQLite file with a copy of it as the replica.
+
+    Returns the app and the statements each engine ran, as (bind, SQL)
+    pairs in the order they were executed.
+    """
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{primary}'
+    config.SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{replica}']
+    config.CACHE_BACKEND = 'filesystem'
+    config.CACHE_DIR = str(tmp_path / 'cache')
+    config.DB_READ_YOUR_WRITES_WINDOW = 60
+    app = create_app(config)
+
+    @app.route('/routing/read')
+    @read_only
+    def read():
+        return {'users': db.session.scalar(db.select(db.func.count()).select_from(User))}
+
+    @app.route('/routing/read-then-write', methods=['POST'])
+    @read_only
+    def read_then_write():
+        db.session.scalar(db.select(db.func.count()).select_from(User))
+        db.session.scalar(db.select(User.id).limit(1).with_for_update())
+        User(first_name='New', last_name='User', email='new@example.com', password='x').insert()
+        return {'users': db.session.scalar(db.select(db.func.count()).select_from(User))}
+
+    with app.app_context():
+        cache.clear()
+        writer = User(first_name='Writer', last_name='Test', email='writer@example.com', password='x')
+        writer.insert()
+        reader = User(first_name='Reader', last_name='Test', email='reader@example.com', password='x')
+        reader.insert()
+        headers = {user.first_name: {'Authorization': 'Bearer ' + create_access_token(identity=user.id)}
+                   for user in (writer, reader)}
+        db.session.remove()
+        # The replica starts as a snapshot of the primary and then lags behind
+        shutil.copy(primary, replica)
+        statements = []
+        for key, engine in (('primary', db.engines[None]), ('replica', db.engines['replica_0'])):
+            event.listen(engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args, key=key: statements.append((key, statement)))
+    yield app, statements, headers
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _binds(statements, verb):
+    return {key for key, statement in statements if statement.lstrip().upper().startswith(verb)}
+
+
+def test_reads_of_read_only_views_go_to_the_replica(routed):
+    app, statements, headers = routed
+    response = app.test_client().get('/routing/read', headers=headers['Reader'])
+    assert response.get_json() == {'users': 2}
+    assert {key for key, _ in statements} == {'replica'}
+
+
+def test_writes_and_later_reads_stay_on_the_primary(routed):
+    app, statements, headers = routed
+    response = app.test_client().post('/routing/read-then-write', headers=headers['Writer'])
+    # The first read is the replica's; FOR UPDATE, the flush and every
+    # statement after it run on the primary
+    assert response.get_json() == {'users': 3}
+    assert [key for key, _ in statements][0] == 'replica'
+    assert _binds(statements, 'INSERT') == {'primary'}
+    assert [key for key, _ in statements][1:] == ['primary'] * (len(statements) - 1)
+
+
+def test_writer_reads_the_primary_within_the_window(routed):
+    app, statements, headers = routed
+    client = app.test_client()
+    client.post('/routing/read-then-write', headers=headers['Writer'])
+
+    del statements[:]
+    assert client.get('/routing/read', headers=headers['Writer']).get_json() == {'users': 3}
+    assert {key for key, _ in statements} == {'primary'}
+
+    # Other users are not in the window and read the lagging replica
+    del statements[:]
+    assert client.get('/routing/read', headers=headers['Reader']).get_json() == {'users': 2}
+    assert {key for key, _ in statements} == {'replica'}
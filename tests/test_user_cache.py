@@ -0,0 +1,36 @@
+"""
+Cached users are evicted in every worker when they change
+"""
+import pytest
+from bookingapp.auth.user_cache import invalidate_user, load_user, user_cache
+from bookingapp.caching.backends import FileInvalidationBus
+
+
+@pytest.fixture
+def other_worker(app):
+    """The invalidation bus as another worker on the same host sees it"""
+    bus = FileInvalidationBus(app.config['CACHE_DIR'] + '-invalidations.log')
+    received = []
+    bus.subscribe(received.append)
+    return bus, received
+
+
+def test_change_in_another_worker_evicts_the_user(app, make_user, other_worker):
+    # The default, per-process cache backend still gets a bus for users
+    assert app.config['CACHE_BACKEND'] == 'simple'
+    user = make_user()
+    load_user(user.id)
+    assert user_cache.get(user.id) is not None
+
+    bus, _ = other_worker
+    bus.publish(f'auth-user:{user.id}')
+    load_user('someone-else')
+    assert user_cache.get(user.id) is None
+
+
+def test_change_here_reaches_the_other_workers(app, make_user, other_worker):
+    user = make_user()
+    bus, received = other_worker
+    invalidate_user(user.id)
+    bus.poll()
+    assert received == [f'auth-user:{user.id}']
@@ -0,0 +1,27 @@
+"""
+User registration
+"""
+import sqlite3
+from sqlalchemy.exc import IntegrityError
+from bookingapp.models.user import User
+
+
+REGISTRATION = {'email': 'Ada@Example.com', 'password': 'Str0ng!Password',
+                'first_name': 'Ada', 'last_name': 'Lovelace'}
+
+
+def test_register_rejects_a_taken_email(client):
+    assert client.post('/api/v1/auth/register', json=REGISTRATION).status_code == 201
+    response = client.post('/api/v1/auth/register', json=REGISTRATION)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Email already exists'
+
+
+def test_register_reports_other_integrity_errors(client, monkeypatch):
+    def insert(self):
+        orig = sqlite3.IntegrityError('NOT NULL constraint failed: users.first_name')
+        raise IntegrityError('INSERT INTO users ...', {}, orig)
+
+    monkeypatch.setattr(User, 'insert', insert)
+    response = client.post('/api/v1/auth/register', json=REGISTRATION)
+    assert response.status_code == 500